@@ -0,0 +1,197 @@
+import json
+import os
+import sqlite3
+import threading
+
+# Onde mora o estado ao vivo (fila + quadras).
+#
+# - ArmazemMemoria (padrão): o estado vive só na memória deste processo. Rápido, mas cada worker
+#   do uvicorn teria a sua própria fila.
+# - ArmazemSQLite: o log de operações (os mesmos deltas do stream ao vivo) fica num arquivo SQLite
+#   em modo WAL compartilhado por todos os workers da máquina. Cada processo mantém a sua réplica
+#   em memória (leituras continuam sem ir ao disco) e, antes de cada escrita, pega a trava de escrita
+#   do SQLite (BEGIN IMMEDIATE), aplica o que os outros processos gravaram e só então valida e grava
+#   a sua operação. Versões são globais: a versão N é a mesma em todos os workers.
+#
+# Quem usa é o estado.py; a interface é a da classe ArmazemEstado abaixo.
+
+
+class ArmazemEstado:
+    # Interface. Os métodos de escrita são chamados por estado.transacao(): abrir_escrita() antes de pegar
+    # as travas locais (a espera por outro worker não segura nada deste processo), o resto já com elas.
+    compartilhado = False
+
+    def abrir_escrita(self):
+        # Começa uma escrita exclusiva (entre processos)
+        pass
+
+    def confirmar(self, delta, foto):
+        # Grava o delta e encerra a escrita. `foto` é uma função que devolve o estado completo
+        # (para quando o armazém quiser guardar um ponto de partida e descartar deltas antigos).
+        pass
+
+    def fechar_escrita(self):
+        # Encerra uma escrita que não foi confirmada (nada a gravar ou erro no meio)
+        pass
+
+    def versao(self) -> int:
+        return 0
+
+    def novos_deltas(self, versao):
+        # Deltas gravados depois de `versao`, em ordem. None se alguns já foram descartados.
+        return []
+
+    def carregar(self):
+        # (foto ou None, deltas depois da foto)
+        return None, []
+
+    def semear(self, foto):
+        # Grava `foto` como ponto de partida se o armazém ainda estiver vazio
+        pass
+
+    def fechar(self):
+        pass
+
+
+class ArmazemMemoria(ArmazemEstado):
+    # Nada a sincronizar: a memória do processo já é a fonte da verdade
+    pass
+
+
+class ArmazemSQLite(ArmazemEstado):
+    compartilhado = True
+
+    def __init__(self, caminho, foto_a_cada=500, manter_deltas=1024, espera_trava=30.0):
+        self.caminho = caminho
+        self.foto_a_cada = foto_a_cada
+        # Deltas que continuam no log depois de uma foto: um worker atrasado até esse ponto
+        # só aplica a diferença em vez de recarregar tudo
+        self.manter_deltas = manter_deltas
+        self.espera_trava = espera_trava
+        self._local = threading.local()
+        self._conexoes = []
+        self._trava_conexoes = threading.Lock()
+
+        conexao = self._conexao()
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS estado_deltas (versao INTEGER PRIMARY KEY, ops TEXT NOT NULL)"
+        )
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS estado_foto ("
+            "id INTEGER PRIMARY KEY CHECK (id = 1), versao INTEGER NOT NULL, estado TEXT NOT NULL)"
+        )
+
+    def _conexao(self):
+        # Uma conexão por thread (o uvicorn atende cada requisição síncrona numa thread do pool)
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=self.espera_trava, isolation_level=None,
+                                      check_same_thread=False)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+            with self._trava_conexoes:
+                self._conexoes.append(conexao)
+        return conexao
+
+    # --- Escrita ---
+
+    def abrir_escrita(self):
+        # BEGIN IMMEDIATE pega a trava de escrita do arquivo na hora: dois workers nunca
+        # validam em cima do mesmo estado. Os outros esperam até `espera_trava` segundos.
+        self._conexao().execute("BEGIN IMMEDIATE")
+        self._local.escrevendo = True
+
+    def confirmar(self, delta, foto):
+        conexao = self._conexao()
+        conexao.execute(
+            "INSERT INTO estado_deltas (versao, ops) VALUES (?, ?)",
+            (delta["versao"], json.dumps(delta["ops"], separators=(",", ":"))),
+        )
+        if delta["versao"] % self.foto_a_cada == 0:
+            atual = foto()
+            self._gravar_foto(conexao, atual)
+            conexao.execute("DELETE FROM estado_deltas WHERE versao <= ?", (atual["versao"] - self.manter_deltas,))
+        conexao.execute("COMMIT")
+        self._local.escrevendo = False
+
+    def fechar_escrita(self):
+        if getattr(self._local, "escrevendo", False):
+            self._local.escrevendo = False
+            self._conexao().execute("ROLLBACK")
+
+    def _gravar_foto(self, conexao, foto):
+        conexao.execute(
+            "INSERT INTO estado_foto (id, versao, estado) VALUES (1, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET versao = excluded.versao, estado = excluded.estado",
+            (foto["versao"], json.dumps({"fila": foto["fila"], "jogos": foto["jogos"]}, separators=(",", ":"))),
+        )
+
+    def semear(self, foto):
+        conexao = self._conexao()
+        conexao.execute("BEGIN IMMEDIATE")
+        try:
+            vazio = (conexao.execute("SELECT 1 FROM estado_foto").fetchone() is None
+                     and conexao.execute("SELECT 1 FROM estado_deltas LIMIT 1").fetchone() is None)
+            if vazio:
+                self._gravar_foto(conexao, foto)
+            conexao.execute("COMMIT")
+        except BaseException:
+            conexao.execute("ROLLBACK")
+            raise
+
+    # --- Leitura ---
+
+    def versao(self) -> int:
+        conexao = self._conexao()
+        ultima = conexao.execute("SELECT max(versao) FROM estado_deltas").fetchone()[0]
+        if ultima is not None:
+            return ultima
+        linha = conexao.execute("SELECT versao FROM estado_foto").fetchone()
+        return linha[0] if linha else 0
+
+    def novos_deltas(self, versao):
+        linhas = self._conexao().execute(
+            "SELECT versao, ops FROM estado_deltas WHERE versao > ? ORDER BY versao", (versao,)
+        ).fetchall()
+        if not linhas:
+            return [] if self.versao() <= versao else None
+        if linhas[0][0] != versao + 1:
+            return None # O pedaço que faltava já virou foto
+        return [{"versao": v, "ops": json.loads(ops)} for v, ops in linhas]
+
+    def carregar(self):
+        conexao = self._conexao()
+        linha = conexao.execute("SELECT versao, estado FROM estado_foto").fetchone()
+        foto = None
+        versao = 0
+        if linha:
+            versao = linha[0]
+            foto = {"versao": versao, **json.loads(linha[1])}
+            # JSON só tem chaves texto; as quadras voltam a ser números
+            foto["jogos"] = {int(quadra_id): jogo for quadra_id, jogo in foto["jogos"].items()}
+        linhas = conexao.execute(
+            "SELECT versao, ops FROM estado_deltas WHERE versao > ? ORDER BY versao", (versao,)
+        ).fetchall()
+        return foto, [{"versao": v, "ops": json.loads(ops)} for v, ops in linhas]
+
+    def fechar(self):
+        with self._trava_conexoes:
+            for conexao in self._conexoes:
+                conexao.close()
+            self._conexoes.clear()
+        self._local = threading.local()
+
+
+def armazem_do_ambiente():
+    # VOLEIFLOW_ESTADO=memoria (padrão) ou sqlite. Com sqlite, todos os workers apontam
+    # para o mesmo arquivo em VOLEIFLOW_ESTADO_SQLITE.
+    tipo = os.getenv("VOLEIFLOW_ESTADO", "memoria")
+    if tipo == "memoria":
+        return ArmazemMemoria()
+    if tipo == "sqlite":
+        return ArmazemSQLite(
+            os.getenv("VOLEIFLOW_ESTADO_SQLITE", "./estado_compartilhado.db"),
+            foto_a_cada=int(os.getenv("VOLEIFLOW_ESTADO_FOTO_A_CADA", "500")),
+        )
+    raise ValueError(f"VOLEIFLOW_ESTADO inválido: {tipo}. Use 'memoria' ou 'sqlite'.")
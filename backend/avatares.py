@@ -0,0 +1,56 @@
+import base64
+import binascii
+import hashlib
+from sqlalchemy import select
+import models
+
+# Avatares endereçados pelo conteúdo: a imagem fica na tabela avatares com o sha256 como chave e
+# é servida em /avatares/<hash> com cache longo (o conteúdo de uma URL nunca muda; trocar de foto
+# gera outra URL). No jogador fica só a URL, então o elenco não carrega imagem nenhuma.
+# Emojis continuam direto no campo avatar, como sempre foram.
+
+PREFIXO_URL = "/avatares/"
+LIMITE_BYTES = 256 * 1024
+TIPOS = {"image/png", "image/jpeg", "image/webp", "image/gif"}
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class AvatarInvalido(ValueError):
+    pass
+
+
+def url(hash_):
+    return PREFIXO_URL + hash_
+
+
+async def guardar(db, conteudo, tipo):
+    # Devolve o hash; a mesma imagem enviada de novo não ocupa espaço outra vez. Quem chama faz o commit.
+    if tipo not in TIPOS:
+        raise AvatarInvalido(f"Tipo de imagem não aceito: {tipo}. Use: {', '.join(sorted(TIPOS))}.")
+    if not conteudo:
+        raise AvatarInvalido("Imagem vazia.")
+    if len(conteudo) > LIMITE_BYTES:
+        raise AvatarInvalido(f"Imagem maior que {LIMITE_BYTES // 1024} KB.")
+    hash_ = hashlib.sha256(conteudo).hexdigest()
+    if await db.get(models.Avatar, hash_) is None:
+        db.add(models.Avatar(hash=hash_, tipo=tipo, conteudo=conteudo))
+        await db.flush()
+    return hash_
+
+
+async def normalizar(db, avatar):
+    # Imagem em data URL (data:image/png;base64,...) vai para a tabela e vira a URL dela; o resto fica igual
+    if not avatar or not avatar.startswith("data:"):
+        return avatar
+    cabecalho, _, dados = avatar.partition(",")
+    if not cabecalho.endswith(";base64"):
+        raise AvatarInvalido("O avatar em data URL precisa estar em base64.")
+    try:
+        conteudo = base64.b64decode(dados, validate=True)
+    except (binascii.Error, ValueError) as erro:
+        raise AvatarInvalido("Base64 inválido no avatar.") from erro
+    return url(await guardar(db, conteudo, cabecalho[len("data:"):-len(";base64")]))
+
+
+async def buscar(db, hash_):
+    return (await db.execute(select(models.Avatar.tipo, models.Avatar.conteudo).where(models.Avatar.hash == hash_))).first()
@@ -0,0 +1,172 @@
+# Vazão de leituras no banco com muitos clientes ao mesmo tempo: endpoints async (AsyncSession + aiosqlite,
+# os de main.py) contra as mesmas consultas em endpoints síncronos com SessionLocal (como eram antes),
+# que ocupam uma thread do threadpool (40 por padrão) enquanto esperam o banco.
+# Cada lado roda num uvicorn de verdade (1 worker), sobre o mesmo banco populado numa pasta temporária.
+# Rodar de dentro da pasta backend:  python -m benchmarks.bench_async
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+import httpx
+from fastapi import Depends, FastAPI, Query
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+from database import SessionLocal
+import historico
+import models
+import schemas
+
+PORTA = 8766
+URL = f"http://127.0.0.1:{PORTA}"
+PASTA_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOGADORES = 400
+PARTIDAS = 20_000
+CONCORRENCIA = [20, 100]
+DURACAO = 8.0 # segundos por rodada
+TEMPO_LIMITE = 10.0 # resposta que demora mais que isso conta como erro
+
+
+# --- O caminho síncrono de antes, com as mesmas consultas ---
+
+app_sincrono = FastAPI()
+
+
+def _get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@app_sincrono.get("/")
+def _raiz():
+    return {"status": "Online"}
+
+
+@app_sincrono.get("/jogadores/{jogador_id}/estatisticas", response_model=schemas.EstatisticaJogadorResponse)
+def _estatisticas(jogador_id: str, db: Session = Depends(_get_db)):
+    return db.get(models.EstatisticaJogador, jogador_id)
+
+
+@app_sincrono.get("/partidas", response_model=schemas.PaginaPartidasResponse)
+def _partidas(limite: int = Query(20), db: Session = Depends(_get_db)):
+    return historico.pagina(db, limite)
+
+
+@app_sincrono.get("/ranking")
+def _ranking(limite: int = Query(50), db: Session = Depends(_get_db)):
+    linhas = (db.query(models.RatingJogador, models.Jogador.nome)
+              .outerjoin(models.Jogador, models.Jogador.id == models.RatingJogador.jogador_id)
+              .order_by(models.RatingJogador.rating.desc()).limit(limite).all())
+    return [{"jogador_id": r.jogador_id, "nome": nome, "rating": r.rating, "partidas": r.partidas} for r, nome in linhas]
+
+
+# --- Banco e servidores ---
+
+def _popular(pasta):
+    sorteio = random.Random(1)
+    engine = create_engine(f"sqlite:///{os.path.join(pasta, 'voleiflow.db')}")
+    models.Base.metadata.create_all(bind=engine)
+    jogadores = [f"j{i}" for i in range(JOGADORES)]
+    inicio = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    partidas, historico = [], []
+    for i in range(PARTIDAS):
+        partida_id = models.generate_uuid()
+        momento = inicio + timedelta(minutes=15 * i)
+        partidas.append({"id": partida_id, "quadra_id": i % 2 + 1, "inicio": momento, "fim": momento,
+                         "placar_a": 21, "placar_b": 17, "vencedor": "A", "motivo_fim": "Pontuacao"})
+        for n, jogador_id in enumerate(sorteio.sample(jogadores, 8)):
+            historico.append({"id": models.generate_uuid(), "partida_id": partida_id, "jogador_id": jogador_id,
+                              "time": "A" if n < 4 else "B", "resultado": "Vitoria" if n < 4 else "Derrota"})
+    with engine.begin() as conexao:
+        conexao.execute(insert(models.Jogador), [{"id": j, "nome": f"Jogador {j}", "sexo": "M"} for j in jogadores])
+        conexao.execute(insert(models.Partida), partidas)
+        conexao.execute(insert(models.PartidaHistorico), historico)
+        conexao.execute(insert(models.EstatisticaJogador), [
+            {"jogador_id": j, "partidas": 10, "vitorias": 5, "derrotas": 5, "empates": 0, "pontos_pro": 200, "pontos_contra": 190}
+            for j in jogadores])
+        conexao.execute(insert(models.RatingJogador), [
+            {"jogador_id": j, "rating": sorteio.gauss(1500, 150), "partidas": 10} for j in jogadores])
+    engine.dispose()
+
+
+def _subir(aplicacao, pasta):
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", aplicacao, "--app-dir", PASTA_BACKEND, "--port", str(PORTA),
+         "--log-level", "critical"],
+        cwd=pasta, env=dict(os.environ, VOLEIFLOW_DIARIO="", PYTHONPATH=PASTA_BACKEND),
+    )
+    for _ in range(100):
+        if processo.poll() is not None:
+            raise RuntimeError("uvicorn saiu antes de responder")
+        try:
+            httpx.get(URL + "/", timeout=0.5)
+            return processo
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError("uvicorn não respondeu a tempo")
+
+
+async def _carga(concorrencia):
+    caminhos = [f"/jogadores/j{i}/estatisticas" for i in range(0, JOGADORES, 7)] + ["/partidas?limite=20", "/ranking?limite=50"]
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+    feitas, erros, latencias = 0, 0, []
+    fim = time.perf_counter() + DURACAO
+
+    async with httpx.AsyncClient(base_url=URL, limits=limites, timeout=TEMPO_LIMITE) as http:
+        async def cliente(numero):
+            nonlocal feitas, erros
+            sorteio = random.Random(numero)
+            while time.perf_counter() < fim:
+                inicio = time.perf_counter()
+                try:
+                    resp = await http.get(sorteio.choice(caminhos))
+                except httpx.TimeoutException:
+                    erros += 1
+                    continue
+                if resp.status_code != 200:
+                    erros += 1 # Ex.: 500 por esgotar o pool de conexões do SQLAlchemy
+                    continue
+                latencias.append(time.perf_counter() - inicio)
+                feitas += 1
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente(n) for n in range(concorrencia)))
+        duracao = time.perf_counter() - inicio
+    latencias.sort()
+    if not latencias:
+        return feitas / duracao, erros, None, None
+    return feitas / duracao, erros, latencias[len(latencias) // 2], latencias[int(len(latencias) * 0.99)]
+
+
+def _ms(segundos):
+    return f"{segundos * 1000:6.1f}ms" if segundos is not None else "     -  "
+
+
+def medir(nome, aplicacao, pasta):
+    for concorrencia in CONCORRENCIA:
+        # Um servidor novo por rodada: se o caminho síncrono travar numa rodada, não contamina a próxima
+        processo = _subir(aplicacao, pasta)
+        try:
+            vazao, erros, p50, p99 = asyncio.run(_carga(concorrencia))
+            print(f"{nome:<6} {concorrencia:>4} clientes: {vazao:7.0f} req/s  erros={erros:<5} p50={_ms(p50)}  p99={_ms(p99)}")
+        finally:
+            processo.terminate()
+            try:
+                processo.wait(10)
+            except subprocess.TimeoutExpired:
+                # Threadpool travado (requisições presas esperando conexão): não sai sozinho
+                processo.kill()
+                processo.wait()
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as pasta:
+        _popular(pasta)
+        medir("sync", "benchmarks.bench_async:app_sincrono", pasta)
+        medir("async", "main:app", pasta)
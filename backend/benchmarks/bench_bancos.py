@@ -0,0 +1,117 @@
+# Vazão dos perfis de banco (database.py) no caminho de gravação e de leitura:
+#   - sqlite padrão: arquivo sem os PRAGMAs (journal DELETE, synchronous FULL), como era antes
+#   - sqlite:        perfil VOLEIFLOW_BANCO=sqlite (WAL, synchronous=NORMAL, cache de 64 MB)
+#   - postgres:      perfil VOLEIFLOW_BANCO=postgres, só se VOLEIFLOW_BENCH_POSTGRES_URL estiver definida.
+#                    ATENÇÃO: as tabelas desse banco são apagadas e recriadas; use um banco descartável.
+# Gravação: partidas 4x4 gravadas uma por transação com persistencia.gravar_resultados (o pior caso
+# do gravador em segundo plano, quando chega uma partida por vez). Leitura: LEITORES threads lendo
+# páginas do histórico e estatísticas enquanto uma thread grava partidas sem parar.
+# Rodar de dentro da pasta backend:  python -m benchmarks.bench_bancos
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import database
+import historico
+import models
+import persistencia
+
+JOGADORES = 200
+PARTIDAS_GRAVACAO = 500
+LEITORES = 8
+DURACAO_LEITURA = 5.0 # segundos
+
+
+def _engine(perfil, pasta):
+    if perfil == "sqlite padrão":
+        return create_engine(f"sqlite:///{os.path.join(pasta, 'padrao.db')}", connect_args={"check_same_thread": False})
+    if perfil == "sqlite":
+        os.environ.update(VOLEIFLOW_BANCO="sqlite", VOLEIFLOW_SQLITE=os.path.join(pasta, "perfil.db"))
+    else:
+        os.environ.update(VOLEIFLOW_BANCO="postgres", VOLEIFLOW_POSTGRES_URL=os.environ["VOLEIFLOW_BENCH_POSTGRES_URL"])
+    url, _url_async, opcoes, _opcoes_async = database.perfil_do_ambiente()
+    engine = create_engine(url, **opcoes)
+    database._ligar_pragmas(engine)
+    return engine
+
+
+def _resultado(sorteio, jogadores):
+    escolhidos = sorteio.sample(jogadores, 8)
+    jogo = {"inicio": datetime.now(timezone.utc).isoformat(), "placar": {"A": 21, "B": 17},
+            "timeA": escolhidos[:4], "timeB": escolhidos[4:]}
+    return persistencia.montar_resultado(1, jogo, "A", "Pontuacao")
+
+
+def medir_gravacao(Sessao, jogadores):
+    sorteio = random.Random(1)
+    tempos = []
+    with Sessao() as db:
+        for _ in range(PARTIDAS_GRAVACAO):
+            resultado = _resultado(sorteio, jogadores)
+            inicio = time.perf_counter()
+            persistencia.gravar_resultados(db, [resultado])
+            tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    return len(tempos) / sum(tempos), tempos[len(tempos) // 2], tempos[int(len(tempos) * 0.99)]
+
+
+def medir_leitura(Sessao, jogadores):
+    fim = time.perf_counter() + DURACAO_LEITURA
+    leituras, latencias, trava = 0, [], threading.Lock()
+
+    def gravador():
+        sorteio = random.Random(2)
+        with Sessao() as db:
+            while time.perf_counter() < fim:
+                persistencia.gravar_resultados(db, [_resultado(sorteio, jogadores)])
+
+    def leitor(numero):
+        nonlocal leituras
+        sorteio = random.Random(numero)
+        minhas = []
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            with Sessao() as db:
+                historico.pagina(db, 20)
+                db.get(models.EstatisticaJogador, sorteio.choice(jogadores))
+            minhas.append(time.perf_counter() - inicio)
+        with trava:
+            leituras += len(minhas)
+            latencias.extend(minhas)
+
+    threads = [threading.Thread(target=gravador)] + [threading.Thread(target=leitor, args=(n,)) for n in range(LEITORES)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+    latencias.sort()
+    return leituras / duracao, latencias[len(latencias) // 2], latencias[int(len(latencias) * 0.99)]
+
+
+def medir(perfil, pasta):
+    engine = _engine(perfil, pasta)
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    Sessao = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    jogadores = [f"j{i}" for i in range(JOGADORES)]
+    vazao, p50, p99 = medir_gravacao(Sessao, jogadores)
+    print(f"{perfil:<14} gravação: {vazao:7.0f} partidas/s  p50={p50 * 1000:6.2f}ms  p99={p99 * 1000:6.2f}ms")
+    vazao, p50, p99 = medir_leitura(Sessao, jogadores)
+    print(f"{perfil:<14} leitura:  {vazao:7.0f} leituras/s  p50={p50 * 1000:6.2f}ms  p99={p99 * 1000:6.2f}ms"
+          f"  ({LEITORES} leitores + 1 gravador)")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    perfis = ["sqlite padrão", "sqlite"]
+    if os.getenv("VOLEIFLOW_BENCH_POSTGRES_URL"):
+        perfis.append("postgres")
+    with tempfile.TemporaryDirectory() as pasta:
+        for perfil in perfis:
+            medir(perfil, pasta)
@@ -0,0 +1,64 @@
+# Mede o custo de cada política de fsync do diário e o tempo de recuperação depois de uma noite inteira.
+#   - na trava:  registrar()/compactar(), o que a transação paga com as travas do estado seguras
+#   - resposta:  mais o aguardar() (com fsync="sempre" a resposta espera o delta chegar no disco)
+# Rodar de dentro da pasta backend:  python -m benchmarks.bench_diario
+import tempfile
+import time
+from diario import DiarioEstado, POLITICAS_FSYNC
+import estado
+
+OPERACOES = 5999 # Termina com uma cauda de 999 deltas depois do último snapshot
+JOGADORES = 300
+
+
+def _novo_estado():
+    novo = estado.EstadoMemoria()
+    novo["fila"] = []
+    novo["jogos"] = {1: None, 2: None}
+    return novo
+
+
+def simular_noite(diario):
+    # Entradas, idas pro final e jogos começando/terminando, como numa noite cheia
+    atual = _novo_estado()
+    tempos, respostas = [], []
+    for versao in range(1, OPERACOES + 1):
+        t = estado.Transacao(atual)
+        jogador_id = f"j{versao % JOGADORES}"
+        if jogador_id in atual["fila"]:
+            t.mover_para_final(jogador_id)
+        else:
+            t.entrar_na_fila(jogador_id)
+        if versao % 50 == 0:
+            t.definir_quadra(1, {"status": "JOGANDO", "inicio": "2026-03-01T20:00:00+00:00",
+                                 "placar": {"A": 0, "B": 0}, "timeA": t.retirar_da_fila(4),
+                                 "timeB": t.retirar_da_fila(4), "vitoriasConsecutivas": {"A": 0, "B": 0}})
+        inicio = time.perf_counter()
+        if diario.registrar({"versao": versao, "ops": t.ops}):
+            diario.compactar({"versao": versao, "fila": atual["fila"].como_lista(), "jogos": dict(atual["jogos"])})
+        tempos.append(time.perf_counter() - inicio)
+        diario.aguardar(versao)
+        respostas.append(time.perf_counter() - inicio)
+    diario.fechar()
+    tempos.sort()
+    respostas.sort()
+    return tempos, respostas
+
+
+def main():
+    print(f"{OPERACOES} operações, {JOGADORES} jogadores, snapshot a cada 1000")
+    print(f"{'fsync':>10} | {'na trava p50':>13} {'p99':>10} | {'resposta p50':>13} {'p99':>10} | {'recuperação':>11}")
+    for politica in POLITICAS_FSYNC:
+        with tempfile.TemporaryDirectory() as pasta:
+            tempos, respostas = simular_noite(DiarioEstado(pasta, fsync=politica, snapshot_a_cada=1000))
+            inicio = time.perf_counter()
+            DiarioEstado(pasta).restaurar(_novo_estado())
+            recuperacao = time.perf_counter() - inicio
+        colunas = []
+        for medidas in (tempos, respostas):
+            colunas.append(f"{medidas[len(medidas) // 2] * 1e6:>10.1f} µs {medidas[int(len(medidas) * 0.99)] * 1e6:>7.1f} µs")
+        print(f"{politica:>10} | {colunas[0]} | {colunas[1]} | {recuperacao * 1000:>8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Bytes e tempo para um celular abrir o app e carregar o elenco:
+#   - GET /jogadores: linhas completas, com o avatar em data URL dentro de cada jogador (como ficava antes)
+#   - GET /jogadores/elenco: colunas enxutas, avatar como URL /avatares/<hash>; na reabertura, 304 pelo ETag
+# Rodar de dentro da pasta backend:  python -m benchmarks.bench_elenco
+import base64
+import os
+import tempfile
+import time
+
+PASTA = tempfile.mkdtemp()
+os.environ.update(VOLEIFLOW_BANCO="sqlite", VOLEIFLOW_SQLITE=os.path.join(PASTA, "voleiflow.db"), VOLEIFLOW_DIARIO="")
+
+from fastapi.testclient import TestClient # noqa: E402  (o banco precisa estar escolhido antes do import)
+from sqlalchemy import delete, insert # noqa: E402
+from database import SessionLocal # noqa: E402
+from main import app # noqa: E402
+import models # noqa: E402
+
+TAMANHOS = [100, 500]
+BYTES_AVATAR = 12 * 1024 # Uma foto pequena de perfil
+REPETICOES = 20
+
+
+def _popular(client, quantidade, inline):
+    with SessionLocal() as db:
+        db.execute(delete(models.Jogador))
+        db.commit()
+        if inline:
+            # Direto no banco, como um avatar em data URL ficava antes de ir para /avatares
+            linhas = [{"nome": f"Jogador {i}", "sexo": "M", "whatsapp": f"8599{i:07d}",
+                       "avatar": "data:image/png;base64," + base64.b64encode(os.urandom(BYTES_AVATAR)).decode()}
+                      for i in range(quantidade)]
+            db.execute(insert(models.Jogador), linhas)
+            db.commit()
+            return
+    for i in range(quantidade):
+        avatar = "data:image/png;base64," + base64.b64encode(os.urandom(BYTES_AVATAR)).decode()
+        client.post("/jogadores", json={"nome": f"Jogador {i}", "sexo": "M", "whatsapp": f"8599{i:07d}", "avatar": avatar})
+
+
+def _medir(client, caminho, cabecalhos=None):
+    tempos = []
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        resp = client.get(caminho, headers=cabecalhos or {})
+        tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    return len(resp.content), tempos[len(tempos) // 2] * 1000, resp
+
+
+if __name__ == "__main__":
+    with TestClient(app) as client:
+        for quantidade in TAMANHOS:
+            _popular(client, quantidade, inline=True)
+            tamanho, p50, _ = _medir(client, "/jogadores")
+            print(f"{quantidade:>4} jogadores  /jogadores (avatar inline)   {tamanho:>9} bytes  p50={p50:7.2f}ms")
+
+            _popular(client, quantidade, inline=False)
+            tamanho, p50, resp = _medir(client, "/jogadores")
+            print(f"{quantidade:>4} jogadores  /jogadores (avatar por URL)  {tamanho:>9} bytes  p50={p50:7.2f}ms")
+            tamanho, p50, resp = _medir(client, "/jogadores/elenco")
+            print(f"{quantidade:>4} jogadores  /jogadores/elenco            {tamanho:>9} bytes  p50={p50:7.2f}ms")
+            tamanho, p50, _ = _medir(client, "/jogadores/elenco", {"If-None-Match": resp.headers["etag"]})
+            print(f"{quantidade:>4} jogadores  /jogadores/elenco (304)      {tamanho:>9} bytes  p50={p50:7.2f}ms")
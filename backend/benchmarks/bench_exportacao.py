@@ -0,0 +1,150 @@
+# Exportação do histórico (GET /partidas/exportar) com muitas partidas no banco:
+#   - vazão da exportação em fluxo (linhas/s e MB/s) num uvicorn de verdade
+#   - latência de outras requisições (/jogadores/{id}/estatisticas) parada e durante a exportação
+#   - pico de memória (tracemalloc) do gerador em fluxo contra carregar o histórico inteiro
+# Rodar de dentro da pasta backend:  python -m benchmarks.bench_exportacao
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+import httpx
+from sqlalchemy import create_engine, insert
+import models
+
+PORTA = 8767
+URL = f"http://127.0.0.1:{PORTA}"
+PASTA_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOGADORES = 400
+PARTIDAS = 100_000
+TAMANHO_TIME = 4
+AMOSTRAS = 300
+
+
+def _popular(caminho):
+    sorteio = random.Random(1)
+    engine = create_engine(f"sqlite:///{caminho}")
+    models.Base.metadata.create_all(bind=engine)
+    jogadores = [f"j{i}" for i in range(JOGADORES)]
+    inicio = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with engine.begin() as conexao:
+        conexao.execute(insert(models.Jogador), [{"id": j, "nome": f"Jogador {j}", "sexo": "M"} for j in jogadores])
+        conexao.execute(insert(models.EstatisticaJogador), [
+            {"jogador_id": j, "partidas": 0, "vitorias": 0, "derrotas": 0, "empates": 0, "pontos_pro": 0,
+             "pontos_contra": 0} for j in jogadores])
+        for bloco in range(0, PARTIDAS, 10_000):
+            partidas, historico = [], []
+            for i in range(bloco, min(bloco + 10_000, PARTIDAS)):
+                partida_id = models.generate_uuid()
+                momento = inicio + timedelta(minutes=10 * i)
+                partidas.append({"id": partida_id, "quadra_id": i % 3 + 1, "inicio": momento,
+                                 "fim": momento + timedelta(minutes=9), "placar_a": 21, "placar_b": 17,
+                                 "vencedor": "A", "motivo_fim": "Pontuacao", "sequencia": i + 1})
+                for n, jogador_id in enumerate(sorteio.sample(jogadores, 2 * TAMANHO_TIME)):
+                    historico.append({"id": models.generate_uuid(), "partida_id": partida_id, "jogador_id": jogador_id,
+                                      "time": "A" if n < TAMANHO_TIME else "B",
+                                      "resultado": "Vitoria" if n < TAMANHO_TIME else "Derrota"})
+            conexao.execute(insert(models.Partida), partidas)
+            conexao.execute(insert(models.PartidaHistorico), historico)
+    engine.dispose()
+
+
+def _subir(pasta):
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", PASTA_BACKEND, "--port", str(PORTA),
+         "--log-level", "critical"],
+        cwd=pasta, env=dict(os.environ, VOLEIFLOW_DIARIO="", PYTHONPATH=PASTA_BACKEND),
+    )
+    for _ in range(100):
+        try:
+            httpx.get(URL + "/", timeout=0.5)
+            return processo
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    processo.kill()
+    raise RuntimeError("uvicorn não respondeu a tempo")
+
+
+def _latencias(parar=None):
+    sorteio = random.Random(2)
+    tempos = []
+    with httpx.Client(base_url=URL, timeout=30) as http:
+        while len(tempos) < AMOSTRAS and not (parar and parar.is_set()):
+            inicio = time.perf_counter()
+            http.get(f"/jogadores/j{sorteio.randrange(JOGADORES)}/estatisticas").raise_for_status()
+            tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    return tempos[len(tempos) // 2] * 1000, tempos[int(len(tempos) * 0.99)] * 1000, len(tempos)
+
+
+def medir_api(pasta):
+    processo = _subir(pasta)
+    try:
+        p50, p99, _ = _latencias()
+        print(f"parada:             p50={p50:6.2f}ms  p99={p99:6.2f}ms")
+
+        resultado = {}
+
+        def exportar():
+            inicio = time.perf_counter()
+            linhas = tamanho = 0
+            with httpx.stream("GET", URL + "/partidas/exportar", timeout=None) as resp:
+                for pedaco in resp.iter_bytes():
+                    tamanho += len(pedaco)
+                    linhas += pedaco.count(b"\n")
+            resultado.update(duracao=time.perf_counter() - inicio, linhas=linhas, tamanho=tamanho)
+
+        thread = threading.Thread(target=exportar)
+        thread.start()
+        time.sleep(0.2)
+        p50, p99, amostras = _latencias()
+        thread.join()
+        duracao = resultado["duracao"]
+        print(f"durante exportação: p50={p50:6.2f}ms  p99={p99:6.2f}ms  ({amostras} requisições)")
+        print(f"exportação: {resultado['linhas']} linhas em {duracao:5.1f}s ({resultado['linhas'] / duracao:8.0f} linhas/s, "
+              f"{resultado['tamanho'] / duracao / 1024 / 1024:5.1f} MB/s)")
+    finally:
+        processo.terminate()
+        processo.wait()
+
+
+def medir_memoria(caminho):
+    # Num processo à parte para o banco do perfil apontar para o arquivo populado
+    codigo = f"""
+import asyncio, json, tracemalloc
+import exportacao
+from database import SessionAsync
+
+async def em_fluxo():
+    tamanho = 0
+    async for pedaco in exportacao.em_ndjson(exportacao.consulta_partidas(), exportacao.COLUNAS_PARTIDA):
+        tamanho += len(pedaco)
+
+async def tudo_de_uma_vez():
+    async with SessionAsync() as db:
+        linhas = (await db.execute(exportacao.consulta_partidas())).all()
+    corpo = "".join(json.dumps(dict(zip(exportacao.COLUNAS_PARTIDA, [exportacao._valor_json(v) for v in linha]))) + "\\n"
+                    for linha in linhas)
+
+for nome, corrotina in (("em fluxo", em_fluxo), ("tudo de uma vez", tudo_de_uma_vez)):
+    tracemalloc.start()
+    asyncio.run(corrotina())
+    print(f"pico de memória {{nome}}: {{tracemalloc.get_traced_memory()[1] / 1024 / 1024:7.1f}} MB")
+    tracemalloc.stop()
+"""
+    subprocess.run([sys.executable, "-c", codigo], cwd=PASTA_BACKEND, check=True,
+                   env=dict(os.environ, VOLEIFLOW_BANCO="sqlite", VOLEIFLOW_SQLITE=caminho))
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "voleiflow.db")
+        _popular(caminho)
+        print(f"{PARTIDAS} partidas, {PARTIDAS * 2 * TAMANHO_TIME} linhas de participantes")
+        medir_api(pasta)
+        medir_memoria(caminho)
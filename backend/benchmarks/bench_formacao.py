@@ -0,0 +1,49 @@
+# Latência da montagem dos times (formacao.montar_times) por tamanho de time, e o equilíbrio
+# conseguido comparado com a divisão antiga (embaralha e alterna as mulheres, sem olhar rating).
+# Rodar de dentro da pasta backend:  python -m benchmarks.bench_formacao
+import random
+import statistics
+import time
+import formacao
+
+RODADAS = 300
+
+
+def _divisao_antiga(ids, sexos, tamanho_time):
+    ids = list(ids)
+    random.shuffle(ids)
+    mulheres = [j for j in ids if sexos[j] == "F"]
+    homens = [j for j in ids if sexos[j] != "F"]
+    time_a, time_b = [], []
+    for i, jogadora in enumerate(mulheres):
+        (time_a if i % 2 == 0 else time_b).append(jogadora)
+    for jogador in homens:
+        (time_a if len(time_a) < tamanho_time else time_b).append(jogador)
+    return time_a, time_b
+
+
+def medir(tamanho_time):
+    sorteio = random.Random(tamanho_time)
+    tempos, diferencas, diferencas_antigas = [], [], []
+    for _ in range(RODADAS):
+        ids = [f"j{i}" for i in range(2 * tamanho_time)]
+        ratings = {j: sorteio.gauss(1500, 150) for j in ids}
+        sexos = {j: "F" if sorteio.random() < 0.35 else "M" for j in ids}
+
+        inicio = time.perf_counter()
+        time_a, time_b = formacao.montar_times(ids, ratings, sexos, tamanho_time)
+        tempos.append(time.perf_counter() - inicio)
+        diferencas.append(abs(sum(ratings[j] for j in time_a) - sum(ratings[j] for j in time_b)))
+
+        antigo_a, antigo_b = _divisao_antiga(ids, sexos, tamanho_time)
+        diferencas_antigas.append(abs(sum(ratings[j] for j in antigo_a) - sum(ratings[j] for j in antigo_b)))
+
+    tempos.sort()
+    print(f"{tamanho_time:>2} x {tamanho_time:<2}: p50 {tempos[len(tempos) // 2] * 1000:6.3f}ms | "
+          f"p99 {tempos[int(len(tempos) * 0.99)] * 1000:6.3f}ms | máx {tempos[-1] * 1000:6.3f}ms | "
+          f"diferença média {statistics.mean(diferencas):7.1f} (antes {statistics.mean(diferencas_antigas):7.1f})")
+
+
+if __name__ == "__main__":
+    for tamanho_time in range(2, 13):
+        medir(tamanho_time)
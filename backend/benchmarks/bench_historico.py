@@ -0,0 +1,86 @@
+# Tempo de uma página do histórico (historico.pagina) conforme a tabela de partidas cresce:
+# primeira página, uma página no meio do histórico pelo cursor (keyset) e a mesma página com OFFSET,
+# e a primeira página das partidas de um jogador.
+# Rodar de dentro da pasta backend:  python -m benchmarks.bench_historico
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+import models
+import historico
+
+TAMANHOS = [10_000, 100_000, 300_000]
+JOGADORES = 500
+TAMANHO_TIME = 4
+LIMITE = 20
+REPETICOES = 50
+
+
+def _popular(Sessao, partidas):
+    sorteio = random.Random(partidas)
+    jogadores = [f"j{i}" for i in range(JOGADORES)]
+    inicio = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    with Sessao() as db:
+        db.execute(insert(models.Jogador), [{"id": j, "nome": f"Jogador {j}", "sexo": "M"} for j in jogadores])
+        for bloco in range(0, partidas, 10_000):
+            linhas_partida, linhas_historico = [], []
+            for i in range(bloco, min(bloco + 10_000, partidas)):
+                partida_id = models.generate_uuid()
+                # Duas quadras começando juntas: vários inícios iguais
+                momento = inicio + timedelta(minutes=15 * (i // 2))
+                linhas_partida.append({"id": partida_id, "quadra_id": i % 2 + 1, "inicio": momento, "fim": momento,
+                                       "placar_a": 21, "placar_b": 15, "vencedor": "A", "motivo_fim": "Pontuacao"})
+                for n, jogador_id in enumerate(sorteio.sample(jogadores, 2 * TAMANHO_TIME)):
+                    linhas_historico.append({"id": models.generate_uuid(), "partida_id": partida_id, "jogador_id": jogador_id,
+                                             "time": "A" if n < TAMANHO_TIME else "B",
+                                             "resultado": "Vitoria" if n < TAMANHO_TIME else "Derrota"})
+            db.execute(insert(models.Partida), linhas_partida)
+            db.execute(insert(models.PartidaHistorico), linhas_historico)
+        db.commit()
+
+
+def _cronometrar(funcao):
+    tempos = []
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    return tempos[len(tempos) // 2] * 1000
+
+
+def medir(partidas, pasta):
+    engine = create_engine(f"sqlite:///{os.path.join(pasta, f'historico_{partidas}.db')}")
+    models.Base.metadata.create_all(bind=engine)
+    Sessao = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    _popular(Sessao, partidas)
+
+    with Sessao() as db:
+        # Cursor da página que fica no meio do histórico
+        meio = partidas // 2
+        linha = db.execute(select(models.Partida.inicio, models.Partida.id)
+                           .order_by(models.Partida.inicio.desc(), models.Partida.id.desc())
+                           .offset(meio - 1).limit(1)).one()
+        cursor = historico.codificar_cursor(linha.inicio, linha.id)
+
+        def com_offset():
+            pagina = db.execute(select(models.Partida).order_by(models.Partida.inicio.desc(), models.Partida.id.desc())
+                                .offset(meio).limit(LIMITE)).scalars().all()
+            historico._participantes(db, [p.id for p in pagina])
+
+        primeira = _cronometrar(lambda: historico.pagina(db, LIMITE))
+        no_meio = _cronometrar(lambda: historico.pagina(db, LIMITE, cursor))
+        offset = _cronometrar(com_offset)
+        jogador = _cronometrar(lambda: historico.pagina(db, LIMITE, jogador_id="j7"))
+    engine.dispose()
+    print(f"{partidas:>7} partidas: primeira página {primeira:6.2f}ms | meio por cursor {no_meio:6.2f}ms | "
+          f"meio por OFFSET {offset:7.2f}ms | partidas de um jogador {jogador:6.2f}ms")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as pasta:
+        for partidas in TAMANHOS:
+            medir(partidas, pasta)
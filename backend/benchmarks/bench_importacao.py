@@ -0,0 +1,97 @@
+# Cadastro em massa e backup de jogadores:
+#   - importação: um POST /jogadores por jogador (commit + refresh cada) contra o POST /jogadores/importar
+#     em CSV (validação por linha, INSERT em lote por bloco)
+#   - exportação: pico de memória (tracemalloc) gerando o CSV em fluxo (exportacao.em_csv) contra carregar
+#     todos os jogadores e montar o arquivo inteiro, conforme o cadastro cresce
+# Rodar de dentro da pasta backend:  python -m benchmarks.bench_importacao
+import asyncio
+import csv
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+PASTA = tempfile.mkdtemp()
+os.environ.update(VOLEIFLOW_BANCO="sqlite", VOLEIFLOW_SQLITE=os.path.join(PASTA, "voleiflow.db"), VOLEIFLOW_DIARIO="")
+
+from fastapi.testclient import TestClient # noqa: E402  (o banco precisa estar escolhido antes do import)
+from sqlalchemy import delete, select # noqa: E402
+from database import SessionAsync, SessionLocal # noqa: E402
+from main import app # noqa: E402
+import exportacao # noqa: E402
+import models # noqa: E402
+
+UM_POR_UM = 500
+TAMANHOS = [10_000, 100_000]
+
+
+def _csv(quantidade, inicio=0):
+    linhas = ["nome,sexo,whatsapp,avatar"]
+    linhas += [f"Jogador {i},{'F' if i % 3 == 0 else 'M'},8599{i:07d},🏐" for i in range(inicio, inicio + quantidade)]
+    return "\n".join(linhas).encode()
+
+
+def _limpar():
+    with SessionLocal() as db:
+        db.execute(delete(models.Jogador))
+        db.commit()
+
+
+def medir_importacao(client):
+    _limpar()
+    inicio = time.perf_counter()
+    for i in range(UM_POR_UM):
+        client.post("/jogadores", json={"nome": f"Jogador {i}", "sexo": "M", "whatsapp": f"8599{i:07d}"})
+    por_jogador = (time.perf_counter() - inicio) / UM_POR_UM
+    print(f"um POST por jogador:  {por_jogador * 1000:6.2f} ms/jogador ({1 / por_jogador:8.0f} jogadores/s)")
+    for tamanho in TAMANHOS:
+        _limpar()
+        corpo = _csv(tamanho)
+        inicio = time.perf_counter()
+        relatorio = client.post("/jogadores/importar", content=corpo, headers={"Content-Type": "text/csv"}).json()
+        duracao = time.perf_counter() - inicio
+        print(f"importar {tamanho:>7} em CSV: {duracao * 1000:8.0f} ms ({tamanho / duracao:8.0f} jogadores/s, "
+              f"importados={relatorio['importados']})")
+
+
+async def _exportar_em_fluxo():
+    tamanho = 0
+    async for pedaco in exportacao.em_csv(exportacao.consulta_jogadores(), exportacao.COLUNAS_JOGADOR):
+        tamanho += len(pedaco)
+    return tamanho
+
+
+async def _exportar_tudo_de_uma_vez():
+    # Como seria sem fluxo: todas as linhas na memória e o arquivo montado antes de responder
+    async with SessionAsync() as db:
+        linhas = (await db.execute(exportacao.consulta_jogadores())).all()
+    saida = io.StringIO()
+    escritor = csv.writer(saida, lineterminator="\n")
+    escritor.writerow(exportacao.COLUNAS_JOGADOR)
+    escritor.writerows(linhas)
+    return len(saida.getvalue())
+
+
+def _pico(corrotina):
+    tracemalloc.start()
+    asyncio.run(corrotina())
+    _atual, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pico / 1024 / 1024
+
+
+def medir_exportacao(client):
+    for tamanho in TAMANHOS:
+        _limpar()
+        client.post("/jogadores/importar", content=_csv(tamanho), headers={"Content-Type": "text/csv"})
+        with SessionLocal() as db:
+            assert len(db.scalars(select(models.Jogador.id)).all()) == tamanho
+        print(f"exportar {tamanho:>7}: em fluxo pico {_pico(_exportar_em_fluxo):6.1f} MB | "
+              f"tudo de uma vez pico {_pico(_exportar_tudo_de_uma_vez):6.1f} MB")
+
+
+if __name__ == "__main__":
+    with TestClient(app) as client:
+        medir_importacao(client)
+        medir_exportacao(client)
@@ -0,0 +1,78 @@
+# Custo do esquema na subida da API, num banco que já está em dia (o caso de todo reinício e de cada worker):
+#   - create_all + índices: o que o main.py fazia no import (inspeciona cada tabela e cada índice)
+#   - carimbo:              migracoes.migrar com esquema_versao em dia (uma consulta)
+# O esquema cresce com TABELAS_EXTRAS tabelas de mentira (3 índices cada) para ver quem acompanha o tamanho.
+# No fim, o tempo de "import main" num processo novo (o que cada worker e cada recarga pagam).
+# Postgres também, se VOLEIFLOW_BENCH_POSTGRES_URL estiver definida (ATENÇÃO: as tabelas são apagadas).
+# Rodar de dentro da pasta backend:  python -m benchmarks.bench_inicio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from sqlalchemy import Column, Index, Integer, MetaData, String, Table, create_engine
+import migracoes
+import models
+
+TABELAS_EXTRAS = [0, 25, 100]
+REPETICOES = 20
+
+
+def _esquema(extras):
+    esquema = MetaData()
+    for tabela in models.Base.metadata.sorted_tables:
+        tabela.to_metadata(esquema)
+    for i in range(extras):
+        Table(f"extra_{i}", esquema, Column("id", Integer, primary_key=True), Column("nome", String),
+              Column("valor", Integer), Column("criado", String),
+              Index(f"ix_extra_{i}_nome", "nome"), Index(f"ix_extra_{i}_valor", "valor"), Index(f"ix_extra_{i}_criado", "criado"))
+    return esquema
+
+
+def _create_all(engine, esquema):
+    esquema.create_all(bind=engine)
+    for tabela in esquema.sorted_tables:
+        for indice in tabela.indexes:
+            indice.create(bind=engine, checkfirst=True)
+
+
+def _medir(funcao):
+    tempos = []
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    return tempos[len(tempos) // 2] * 1000
+
+
+def _perfil(nome, engine):
+    for extras in TABELAS_EXTRAS:
+        esquema = _esquema(extras)
+        esquema.drop_all(bind=engine)
+        _create_all(engine, esquema)
+        migracoes.migrar(engine)
+        antigo = _medir(lambda: _create_all(engine, esquema))
+        novo = _medir(lambda: migracoes.migrar(engine))
+        tabelas = len(esquema.tables)
+        print(f"{nome:<9} {tabelas:>4} tabelas  create_all + índices {antigo:8.2f}ms   carimbo {novo:6.2f}ms")
+        esquema.drop_all(bind=engine)
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    pasta = tempfile.mkdtemp()
+    _perfil("sqlite", create_engine(f"sqlite:///{os.path.join(pasta, 'inicio.db')}"))
+    if os.getenv("VOLEIFLOW_BENCH_POSTGRES_URL"):
+        url = "postgresql+psycopg://" + os.environ["VOLEIFLOW_BENCH_POSTGRES_URL"].split("://", 1)[1]
+        _perfil("postgres", create_engine(url))
+
+    # Import do main num processo novo, com um banco já migrado
+    env = dict(os.environ, VOLEIFLOW_BANCO="sqlite", VOLEIFLOW_SQLITE=os.path.join(pasta, "app.db"), VOLEIFLOW_DIARIO="")
+    subprocess.run([sys.executable, "-c", "from database import engine; import migracoes; migracoes.migrar(engine)"], env=env, check=True)
+    tempos = []
+    for _ in range(5):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import main"], env=env, check=True)
+        tempos.append(time.perf_counter() - inicio)
+    print(f"import main (processo novo, melhor de 5): {min(tempos) * 1000:.0f}ms")
@@ -0,0 +1,61 @@
+# Check-in do começo da noite: N jogadores chegando, cada um com PATCH de presença + POST /fila/entrar
+# (que devolve a fila inteira a cada chamada), contra um único POST /fila/lote com as mesmas operações.
+# Mede o tempo total, os bytes de resposta e quantas versões o stream publica.
+# Rodar de dentro da pasta backend:  python -m benchmarks.bench_lote
+import os
+import tempfile
+import time
+
+PASTA = tempfile.mkdtemp()
+os.environ.update(VOLEIFLOW_BANCO="sqlite", VOLEIFLOW_SQLITE=os.path.join(PASTA, "voleiflow.db"), VOLEIFLOW_DIARIO="")
+
+from fastapi.testclient import TestClient # noqa: E402  (o banco precisa estar escolhido antes do import)
+from main import app, ESTADO_MEMORIA # noqa: E402
+import estado # noqa: E402
+
+CHEGADAS = [30, 60]
+RODADAS = 5
+
+
+def _cadastrar(client, quantidade):
+    return [client.post("/jogadores", json={"nome": f"Check-in {i}", "sexo": "M"}).json()["id"] for i in range(quantidade)]
+
+
+def um_por_um(client, ids):
+    bytes_resposta = 0
+    for jogador_id in ids:
+        resp = client.patch(f"/jogadores/{jogador_id}/status", json={"is_presente": True})
+        bytes_resposta += len(resp.content)
+        resp = client.post("/fila/entrar", json={"jogador_id": jogador_id})
+        bytes_resposta += len(resp.content)
+    return bytes_resposta
+
+
+def em_lote(client, ids):
+    operacoes = []
+    for jogador_id in ids:
+        operacoes.append({"op": "presenca", "jogador_id": jogador_id, "presente": True})
+        operacoes.append({"op": "entrar", "jogador_id": jogador_id})
+    return len(client.post("/fila/lote", json={"operacoes": operacoes}).content)
+
+
+def medir(client, checkin, ids):
+    tempos, versoes = [], 0
+    for _ in range(RODADAS):
+        ESTADO_MEMORIA["fila"] = []
+        antes = estado.versao_atual()
+        inicio = time.perf_counter()
+        bytes_resposta = checkin(client, ids)
+        tempos.append(time.perf_counter() - inicio)
+        versoes = estado.versao_atual() - antes
+    tempos.sort()
+    return tempos[len(tempos) // 2], bytes_resposta, versoes
+
+
+if __name__ == "__main__":
+    with TestClient(app) as client:
+        for chegadas in CHEGADAS:
+            ids = _cadastrar(client, chegadas)
+            for nome, checkin in (("um por um", um_por_um), ("lote", em_lote)):
+                duracao, bytes_resposta, versoes = medir(client, checkin, ids)
+                print(f"{chegadas:>3} chegadas  {nome:<10} {duracao * 1000:8.1f} ms  {bytes_resposta:>7} bytes  {versoes:>3} versões")
@@ -0,0 +1,70 @@
+# Custo das métricas (metricas.py) por requisição: o mesmo app chamado direto pelo ASGI (sem rede),
+# com e sem o MiddlewareMetricas e com e sem os eventos de consulta no engine.
+#   - GET /estado:            só memória (mede o middleware sozinho)
+#   - POST /quadras/1/placar: mutação quente, só memória
+#   - GET /jogadores:         uma consulta ao banco (mede também os eventos do engine)
+# Rodar de dentro da pasta backend:  python -m benchmarks.bench_metricas
+import asyncio
+import os
+import tempfile
+import time
+
+PASTA = tempfile.mkdtemp()
+os.environ.update(VOLEIFLOW_BANCO="sqlite", VOLEIFLOW_SQLITE=os.path.join(PASTA, "voleiflow.db"), VOLEIFLOW_DIARIO="")
+
+import httpx # noqa: E402  (o banco precisa estar escolhido antes do import)
+import metricas # noqa: E402
+from database import engine, engine_async # noqa: E402
+from main import app, ESTADO_MEMORIA # noqa: E402
+
+REPETICOES = 3000
+RODADAS = 3
+
+
+def _ligar(ligadas):
+    # O app com ou sem o middleware de fora e os eventos do engine (o Starlette remonta a pilha no 1º uso)
+    app.user_middleware = [m for m in app.user_middleware if m.cls is not metricas.MiddlewareMetricas]
+    app.middleware_stack = None
+    funcao = metricas.ligar_banco if ligadas else metricas.desligar_banco
+    if ligadas:
+        app.add_middleware(metricas.MiddlewareMetricas)
+    for engine_sync in (engine, engine_async.sync_engine):
+        funcao(engine_sync)
+
+
+async def _medir(http, metodo, caminho, **kwargs):
+    melhores = []
+    for _ in range(RODADAS):
+        inicio = time.perf_counter()
+        for _ in range(REPETICOES):
+            await http.request(metodo, caminho, **kwargs)
+        melhores.append((time.perf_counter() - inicio) / REPETICOES)
+    return min(melhores) * 1_000_000
+
+
+async def _rodada():
+    ESTADO_MEMORIA["fila"] = [f"bench-{i}" for i in range(20)]
+    ESTADO_MEMORIA["jogos"] = {1: None, 2: None}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+            await http.post("/quadras/1/iniciar")
+            return {
+                "GET /estado": await _medir(http, "GET", "/estado"),
+                "POST /quadras/1/placar": await _medir(http, "POST", "/quadras/1/placar", json={"time": "A", "delta": 0}),
+                "GET /jogadores": await _medir(http, "GET", "/jogadores"),
+            }
+
+
+if __name__ == "__main__":
+    # Alternando as duas montagens (o ruído da máquina pesa igual nas duas); fica o melhor de cada
+    melhores = {True: {}, False: {}}
+    ligadas = True
+    for _ in range(4):
+        ligadas = not ligadas
+        _ligar(ligadas)
+        for nome, micros in asyncio.run(_rodada()).items():
+            melhores[ligadas][nome] = min(micros, melhores[ligadas].get(nome, micros))
+    sem, com = melhores[False], melhores[True]
+    print(f"{'endpoint':<26} {'sem métricas':>14} {'com métricas':>14} {'custo':>9}")
+    for nome in com:
+        print(f"{nome:<26} {sem[nome]:>11.1f} µs {com[nome]:>11.1f} µs {com[nome] - sem[nome]:>+6.1f} µs")
@@ -0,0 +1,290 @@
+# Carga de uma noite de jogo, reproduzível (mesma semente = mesma sequência de ações):
+#   1. cadastro dos jogadores e check-in em rajada (metade um por um com PATCH de presença + /fila/entrar,
+#      metade pelo /fila/lote)
+#   2. durante DURACAO segundos, ao mesmo tempo:
+#      - CELULARES clientes consultando GET /estado a cada INTERVALO (com If-None-Match; parte com ?desde=)
+#      - um apontador por quadra: inicia a partida, marca pontos, registra a vitória (com a rotação de
+#        desafiantes) e de vez em quando faz uma substituição com alguém da fila
+# Relatório por endpoint (rota com {id}): requisições, erros, vazão e latência p50/p95/p99. O resultado é
+# gravado em JSON (benchmarks/resultados/noite_<commit>_<data>.json) para comparar entre commits com
+# --comparar <arquivo anterior>.
+# Por padrão sobe um uvicorn (1 worker) com banco novo numa pasta temporária; --url usa um servidor já
+# rodando e --em-processo chama o app no mesmo processo (httpx.ASGITransport, sem rede).
+# Rodar de dentro da pasta backend:  python -m benchmarks.bench_noite [--duracao 30] [--celulares 100]
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+import httpx
+
+PORTA = 8768
+PASTA_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA_RESULTADOS = os.path.join(PASTA_BACKEND, "benchmarks", "resultados")
+PONTOS_VITORIA = 21
+TAMANHO_TIME = 4
+TEMPO_LIMITE = 10.0
+
+
+class Medicoes:
+    # Latências por endpoint (rota com {id}, não o caminho real: /quadras/1 e /quadras/2 somam juntas)
+    def __init__(self):
+        self.latencias = {}
+        self.erros = {}
+
+    async def chamar(self, http, metodo, rota, caminho=None, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            resp = await http.request(metodo, caminho or rota, **kwargs)
+        except httpx.HTTPError:
+            self.erros[f"{metodo} {rota}"] = self.erros.get(f"{metodo} {rota}", 0) + 1
+            return None
+        chave = f"{metodo} {rota}"
+        if resp.status_code >= 500:
+            self.erros[chave] = self.erros.get(chave, 0) + 1
+        else:
+            # 4xx faz parte da noite (ex.: substituto que acabou de ser puxado por outra quadra)
+            self.latencias.setdefault(chave, []).append(time.perf_counter() - inicio)
+        return resp
+
+    def relatorio(self, duracao):
+        endpoints = {}
+        for chave in sorted(set(self.latencias) | set(self.erros)):
+            tempos = sorted(self.latencias.get(chave, []))
+            endpoints[chave] = {
+                "requisicoes": len(tempos),
+                "erros": self.erros.get(chave, 0),
+                "vazao": round(len(tempos) / duracao, 1),
+                "p50_ms": _percentil(tempos, 0.50),
+                "p95_ms": _percentil(tempos, 0.95),
+                "p99_ms": _percentil(tempos, 0.99),
+            }
+        return endpoints
+
+
+def _percentil(tempos, fracao):
+    if not tempos:
+        return None
+    return round(tempos[min(len(tempos) - 1, int(len(tempos) * fracao))] * 1000, 2)
+
+
+# --- Fases da noite ---
+
+async def checkin(http, medicoes, jogadores, sorteio):
+    ids = []
+    for i in range(jogadores):
+        resp = await medicoes.chamar(http, "POST", "/jogadores", json={"nome": f"Carga {i}", "sexo": "F" if i % 4 == 0 else "M"})
+        ids.append(resp.json()["id"])
+
+    # Rajada: todo mundo chegando quase junto
+    individuais, em_lote = ids[: len(ids) // 2], ids[len(ids) // 2:]
+
+    async def chegar(jogador_id):
+        await asyncio.sleep(sorteio.random() * 0.5)
+        await medicoes.chamar(http, "PATCH", "/jogadores/{id}/status", f"/jogadores/{jogador_id}/status", json={"is_presente": True})
+        await medicoes.chamar(http, "POST", "/fila/entrar", json={"jogador_id": jogador_id})
+
+    async def lote(parte):
+        operacoes = []
+        for jogador_id in parte:
+            operacoes += [{"op": "presenca", "jogador_id": jogador_id, "presente": True},
+                          {"op": "entrar", "jogador_id": jogador_id}]
+        await medicoes.chamar(http, "POST", "/fila/lote", json={"operacoes": operacoes})
+
+    metade = len(em_lote) // 2
+    await asyncio.gather(*(chegar(j) for j in individuais), lote(em_lote[:metade]), lote(em_lote[metade:]))
+
+
+async def celular(http, medicoes, fim, intervalo, sorteio, usa_desde):
+    etag, versao = None, None
+    await asyncio.sleep(sorteio.random() * intervalo) # Cada celular num momento diferente
+    while time.perf_counter() < fim:
+        if usa_desde and versao is not None:
+            resp = await medicoes.chamar(http, "GET", "/estado?desde", f"/estado?desde={versao}")
+            if resp is not None and resp.status_code == 200:
+                versao = resp.json().get("versao", versao)
+        else:
+            resp = await medicoes.chamar(http, "GET", "/estado", headers={"If-None-Match": etag} if etag else {})
+            if resp is not None and resp.status_code in (200, 304):
+                etag = resp.headers.get("etag", etag)
+                versao = int(resp.headers.get("x-estado-versao", versao or 0))
+        await asyncio.sleep(intervalo * (0.8 + 0.4 * sorteio.random()))
+
+
+async def apontador(http, medicoes, fim, quadra_id, sorteio, contagem):
+    # Uma pessoa com o celular na mão marcando uma quadra
+    jogo = None
+    while time.perf_counter() < fim:
+        if jogo is None:
+            resp = await medicoes.chamar(http, "POST", "/quadras/{id}/iniciar", f"/quadras/{quadra_id}/iniciar")
+            if resp is None or resp.status_code != 200:
+                await asyncio.sleep(0.5) # Fila curta ou outra quadra puxou o pessoal: tenta de novo
+                continue
+            jogo = resp.json()["estado_quadra"]
+            placar = {"A": 0, "B": 0}
+
+        await asyncio.sleep(0.1 + 0.3 * sorteio.random()) # Um rali
+        time_ = sorteio.choice("AB")
+        resp = await medicoes.chamar(http, "POST", "/quadras/{id}/placar", f"/quadras/{quadra_id}/placar",
+                                     json={"time": time_, "delta": 1})
+        if resp is None or resp.status_code != 200:
+            jogo = None
+            continue
+        placar = resp.json()["placar"]
+
+        if sorteio.random() < 0.03:
+            # Alguém se machucou / precisou sair: entra o primeiro da fila
+            foto = await medicoes.chamar(http, "GET", "/estado")
+            if foto is not None and foto.status_code == 200 and foto.json()["fila"]:
+                saindo = sorteio.choice(jogo[f"time{sorteio.choice('AB')}"])
+                resp = await medicoes.chamar(http, "POST", "/quadras/{id}/substituir", f"/quadras/{quadra_id}/substituir",
+                                             json={"id_saindo": saindo, "id_entrando": foto.json()["fila"][0]})
+                if resp is not None and resp.status_code == 200:
+                    jogo = resp.json()["estado_quadra"]
+                    contagem["substituicoes"] += 1
+
+        if max(placar.values()) >= PONTOS_VITORIA:
+            vencedor = "A" if placar["A"] > placar["B"] else "B"
+            resp = await medicoes.chamar(http, "POST", "/quadras/{id}/vitoria", f"/quadras/{quadra_id}/vitoria",
+                                         json={"time_vencedor": vencedor})
+            jogo = resp.json()["estado_quadra"] if resp is not None and resp.status_code == 200 else None
+            contagem["partidas"] += 1
+
+
+async def noite(cliente_http, argumentos):
+    medicoes = Medicoes()
+    sorteio = random.Random(argumentos.semente)
+    contagem = {"partidas": 0, "substituicoes": 0}
+    async with cliente_http as http:
+        await medicoes.chamar(http, "POST", "/configuracoes", json={"chave": "TamanhoTime", "valor": TAMANHO_TIME})
+        await medicoes.chamar(http, "POST", "/configuracoes", json={"chave": "QuantidadeQuadras", "valor": argumentos.quadras})
+
+        inicio = time.perf_counter()
+        await checkin(http, medicoes, argumentos.jogadores, random.Random(sorteio.random()))
+        duracao_checkin = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        fim = inicio + argumentos.duracao
+        tarefas = [celular(http, medicoes, fim, argumentos.intervalo, random.Random(sorteio.random()), usa_desde=n % 4 == 0)
+                   for n in range(argumentos.celulares)]
+        tarefas += [apontador(http, medicoes, fim, quadra_id, random.Random(sorteio.random()), contagem)
+                    for quadra_id in range(1, argumentos.quadras + 1)]
+        await asyncio.gather(*tarefas)
+        duracao = time.perf_counter() - inicio
+    return medicoes.relatorio(duracao), {"checkin_s": round(duracao_checkin, 3), "noite_s": round(duracao, 3), **contagem}
+
+
+# --- Servidor ---
+
+def _subir(pasta):
+    env = dict(os.environ, VOLEIFLOW_BANCO="sqlite", VOLEIFLOW_SQLITE=os.path.join(pasta, "voleiflow.db"),
+               VOLEIFLOW_DIARIO="", PYTHONPATH=PASTA_BACKEND)
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", PASTA_BACKEND, "--port", str(PORTA),
+         "--log-level", "critical"], cwd=pasta, env=env)
+    for _ in range(100):
+        if processo.poll() is not None:
+            raise RuntimeError("uvicorn saiu antes de responder")
+        try:
+            httpx.get(f"http://127.0.0.1:{PORTA}/", timeout=0.5)
+            return processo
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    processo.kill()
+    raise RuntimeError("uvicorn não respondeu a tempo")
+
+
+async def _em_processo(argumentos, pasta):
+    # Banco novo escolhido antes de importar o app (database.py lê o ambiente no import)
+    os.environ.update(VOLEIFLOW_BANCO="sqlite", VOLEIFLOW_SQLITE=os.path.join(pasta, "voleiflow.db"), VOLEIFLOW_DIARIO="")
+    from main import app
+    async with app.router.lifespan_context(app):
+        transporte = httpx.ASGITransport(app=app)
+        return await noite(httpx.AsyncClient(transport=transporte, base_url="http://teste", timeout=TEMPO_LIMITE), argumentos)
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PASTA_BACKEND, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+def _imprimir(endpoints, anterior=None):
+    print(f"{'endpoint':<30} {'req':>6} {'erros':>5} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for chave, dados in endpoints.items():
+        linha = (f"{chave:<30} {dados['requisicoes']:>6} {dados['erros']:>5} {dados['vazao']:>7} "
+                 f"{dados['p50_ms'] or '-':>8} {dados['p95_ms'] or '-':>8} {dados['p99_ms'] or '-':>8}")
+        antes = (anterior or {}).get(chave)
+        if antes and antes.get("p95_ms") and dados["p95_ms"]:
+            linha += f"   p95 {dados['p95_ms'] / antes['p95_ms'] - 1:+.0%} vs anterior"
+        print(linha)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga de uma noite de jogo contra a API.")
+    parser.add_argument("--url", help="servidor já rodando (ex.: http://127.0.0.1:8000); sem isso sobe um uvicorn")
+    parser.add_argument("--em-processo", action="store_true", help="chama o app no mesmo processo, sem rede")
+    parser.add_argument("--duracao", type=float, default=30.0, help="segundos de jogo")
+    parser.add_argument("--celulares", type=int, default=100)
+    parser.add_argument("--intervalo", type=float, default=1.0, help="segundos entre consultas de cada celular")
+    parser.add_argument("--jogadores", type=int, default=40)
+    parser.add_argument("--quadras", type=int, default=2)
+    parser.add_argument("--semente", type=int, default=1)
+    parser.add_argument("--saida", help="arquivo JSON do resultado (padrão: benchmarks/resultados/noite_<commit>_<data>.json)")
+    parser.add_argument("--comparar", help="resultado JSON anterior, para comparar o p95 de cada endpoint")
+    argumentos = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        if argumentos.em_processo:
+            modo = "em-processo"
+            endpoints, resumo = asyncio.run(_em_processo(argumentos, pasta))
+        elif argumentos.url:
+            modo = argumentos.url
+            endpoints, resumo = asyncio.run(noite(httpx.AsyncClient(base_url=argumentos.url, timeout=TEMPO_LIMITE), argumentos))
+        else:
+            modo = "uvicorn"
+            processo = _subir(pasta)
+            try:
+                cliente = httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORTA}", timeout=TEMPO_LIMITE,
+                                            limits=httpx.Limits(max_connections=argumentos.celulares + argumentos.quadras + 10))
+                endpoints, resumo = asyncio.run(noite(cliente, argumentos))
+            finally:
+                processo.terminate()
+                processo.wait()
+
+    commit = _commit()
+    agora = datetime.now(timezone.utc)
+    resultado = {
+        "commit": commit,
+        "data": agora.isoformat(),
+        "modo": modo,
+        "python": platform.python_version(),
+        "parametros": {chave: valor for chave, valor in vars(argumentos).items() if chave not in ("saida", "comparar")},
+        "resumo": resumo,
+        "endpoints": endpoints,
+    }
+    anterior = None
+    if argumentos.comparar:
+        with open(argumentos.comparar, encoding="utf-8") as arquivo:
+            anterior = json.load(arquivo)["endpoints"]
+    _imprimir(endpoints, anterior)
+    print(f"check-in em {resumo['checkin_s']}s; {resumo['partidas']} partidas e {resumo['substituicoes']} substituições "
+          f"em {resumo['noite_s']}s")
+
+    saida = argumentos.saida or os.path.join(PASTA_RESULTADOS, f"noite_{commit}_{agora:%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(saida) or ".", exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"Resultado salvo em {saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Mede o custo de gravar o fim de uma partida no SQLite, antes e depois da gravação em lote.
+# Rodar de dentro da pasta backend:  python -m benchmarks.bench_persistencia
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import models
+import persistencia
+
+TAMANHOS_TIME = [2, 4, 6, 8, 12]
+PARTIDAS_POR_RODADA = 200
+
+
+def _jogo(tamanho_time, n):
+    return {
+        "inicio": datetime.now(timezone.utc).isoformat(),
+        "placar": {"A": 21, "B": 15},
+        "timeA": [f"a{n}_{i}" for i in range(tamanho_time)],
+        "timeB": [f"b{n}_{i}" for i in range(tamanho_time)],
+    }
+
+
+def gravar_antigo(db, jogo):
+    # Caminho anterior do encerrar_partida_manual: um db.add por linha, commit, refresh e outro commit
+    nova_partida = models.Partida(
+        quadra_id=1,
+        inicio=datetime.fromisoformat(jogo["inicio"]),
+        fim=datetime.now(timezone.utc),
+        placar_a=jogo["placar"]["A"],
+        placar_b=jogo["placar"]["B"],
+        vencedor=None,
+        motivo_fim="Cancelada"
+    )
+    db.add(nova_partida)
+    db.commit()
+    db.refresh(nova_partida)
+    for time in ("A", "B"):
+        for j_id in jogo[f"time{time}"]:
+            db.add(models.PartidaHistorico(partida_id=nova_partida.id, jogador_id=j_id, time=time, resultado="Empate"))
+    db.commit()
+
+
+def gravar_novo(db, jogo):
+    persistencia.registrar_resultado(db, 1, jogo, vencedor=None, motivo_fim="Cancelada")
+
+
+def medir(gravar, tamanho_time, caminho_db):
+    engine = create_engine(f"sqlite:///{caminho_db}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    Sessao = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    jogos = [_jogo(tamanho_time, n) for n in range(PARTIDAS_POR_RODADA)]
+    tempos = []
+    with Sessao() as db:
+        for jogo in jogos:
+            inicio = time.perf_counter()
+            gravar(db, jogo)
+            tempos.append(time.perf_counter() - inicio)
+    engine.dispose()
+    tempos.sort()
+    return sum(tempos) / len(tempos) * 1000, tempos[len(tempos) // 2] * 1000
+
+
+def main():
+    print(f"{'tamanho':>8} | {'antigo média':>13} {'p50':>8} | {'novo média':>11} {'p50':>8} | {'ganho':>6}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for tamanho_time in TAMANHOS_TIME:
+            antigo_media, antigo_p50 = medir(gravar_antigo, tamanho_time, os.path.join(pasta, f"antigo_{tamanho_time}.db"))
+            novo_media, novo_p50 = medir(gravar_novo, tamanho_time, os.path.join(pasta, f"novo_{tamanho_time}.db"))
+            print(f"{tamanho_time:>8} | {antigo_media:>10.3f} ms {antigo_p50:>5.3f} ms | "
+                  f"{novo_media:>8.3f} ms {novo_p50:>5.3f} ms | {antigo_media / novo_media:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
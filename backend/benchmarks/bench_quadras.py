@@ -0,0 +1,65 @@
+# Vazão de atualizações de placar conforme o número de quadras cresce.
+# Cada quadra tem 2 "mesários" (threads) marcando pontos ao mesmo tempo. Compara a trava por quadra
+# com o comportamento antigo (uma trava única para tudo), simulado travando todas as quadras.
+# Rodar de dentro da pasta backend:  python -m benchmarks.bench_quadras
+import threading
+import time
+from main import ESTADO_MEMORIA, atualizar_placar, PlacarRequest
+import estado
+
+TOQUES_POR_MESARIO = 2000
+MESARIOS_POR_QUADRA = 2
+QUANTIDADES_QUADRAS = [1, 2, 4, 8]
+
+
+def _jogo():
+    return {"status": "JOGANDO", "inicio": "2026-03-01T20:00:00+00:00", "placar": {"A": 0, "B": 0},
+            "timeA": [], "timeB": [], "vitoriasConsecutivas": {"A": 0, "B": 0}}
+
+
+def rodar(quantidade_quadras, trava_unica):
+    ESTADO_MEMORIA["fila"] = []
+    ESTADO_MEMORIA["jogos"] = {q: _jogo() for q in range(1, quantidade_quadras + 1)}
+    latencias = []
+    largada = threading.Barrier(quantidade_quadras * MESARIOS_POR_QUADRA + 1)
+
+    def mesario(quadra_id):
+        requisicao = PlacarRequest(time="A", delta=1)
+        minhas = []
+        largada.wait()
+        for _ in range(TOQUES_POR_MESARIO):
+            inicio = time.perf_counter()
+            if trava_unica:
+                with estado.transacao():
+                    atualizar_placar(quadra_id, requisicao)
+            else:
+                atualizar_placar(quadra_id, requisicao)
+            minhas.append(time.perf_counter() - inicio)
+        latencias.extend(minhas)
+
+    threads = [threading.Thread(target=mesario, args=(q,))
+               for q in range(1, quantidade_quadras + 1) for _ in range(MESARIOS_POR_QUADRA)]
+    for thread in threads:
+        thread.start()
+    largada.wait()
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+
+    latencias.sort()
+    total = len(latencias)
+    return total / duracao, latencias[int(total * 0.99)] * 1e6
+
+
+def main():
+    print(f"{'quadras':>7} | {'trava única':>12} {'p99':>10} | {'trava por quadra':>16} {'p99':>10}")
+    for quantidade in QUANTIDADES_QUADRAS:
+        unica, unica_p99 = rodar(quantidade, trava_unica=True)
+        por_quadra, por_quadra_p99 = rodar(quantidade, trava_unica=False)
+        print(f"{quantidade:>7} | {unica:>8.0f} op/s {unica_p99:>7.0f} µs | "
+              f"{por_quadra:>12.0f} op/s {por_quadra_p99:>7.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Tempo do recálculo completo do ranking para históricos de vários tamanhos.
+# Compara calcular_ratings() (arrays NumPy; ondas vetorizadas ou laço compacto, conforme a largura das ondas)
+# com ranking.variacoes() partida a partida sobre dicionários, e mede o recalcular() de ponta a ponta
+# (leitura do SQLite + cálculo + troca da tabela).
+# Rodar de dentro da pasta backend:  python -m benchmarks.bench_ranking
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+import models
+import ranking
+
+JOGADORES = 120
+QUADRAS = 2
+TAMANHO_TIME = 4
+PARTIDAS_POR_NOITE = 40 # Por quadra
+NOITES = [50, 250, 1000] # ~1, 5 e 20 anos de terças e quintas
+
+
+def _historico(noites):
+    # Noites de jogo com QUADRAS partidas acontecendo ao mesmo tempo, cada uma com 2 times de TAMANHO_TIME
+    sorteio = random.Random(noites)
+    jogadores = [f"j{i}" for i in range(JOGADORES)]
+    partidas, historico = [], []
+    fim = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    for _ in range(noites):
+        presentes = sorteio.sample(jogadores, 40)
+        for _ in range(PARTIDAS_POR_NOITE):
+            fim += timedelta(minutes=15)
+            elenco = sorteio.sample(presentes, QUADRAS * TAMANHO_TIME * 2)
+            for quadra in range(QUADRAS):
+                partida_id = models.generate_uuid()
+                vencedor = sorteio.choice("AB")
+                partidas.append({"id": partida_id, "quadra_id": quadra + 1, "inicio": fim, "fim": fim,
+                                 "placar_a": 0, "placar_b": 0, "vencedor": vencedor, "motivo_fim": "Pontuacao"})
+                time_a = elenco[quadra * 2 * TAMANHO_TIME:(quadra * 2 + 1) * TAMANHO_TIME]
+                time_b = elenco[(quadra * 2 + 1) * TAMANHO_TIME:(quadra + 1) * 2 * TAMANHO_TIME]
+                for lado, time_ in (("A", time_a), ("B", time_b)):
+                    for jogador_id in time_:
+                        historico.append({"id": models.generate_uuid(), "partida_id": partida_id,
+                                          "jogador_id": jogador_id, "time": lado,
+                                          "resultado": "Vitoria" if lado == vencedor else "Derrota"})
+    return partidas, historico
+
+
+def medir(noites, pasta):
+    partidas, historico = _historico(noites)
+    engine = create_engine(f"sqlite:///{os.path.join(pasta, f'ranking_{noites}.db')}")
+    models.Base.metadata.create_all(bind=engine)
+    Sessao = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with Sessao() as db:
+        db.execute(insert(models.Partida), partidas)
+        db.execute(insert(models.PartidaHistorico), historico)
+        db.commit()
+
+    with Sessao() as db:
+        inicio = time.perf_counter()
+        ranking.recalcular(db)
+        ponta_a_ponta = time.perf_counter() - inicio
+
+        linhas_partida, jogadores, times, vencedores = ranking._carregar_historico(db)
+
+    # Só o cálculo, com os dados já em memória
+    partida_da_linha, primeira = ranking._numerar_partidas(linhas_partida)
+    ids, jogador_da_linha = np.unique(jogadores, return_inverse=True)
+    lado_da_linha = (times == "B").astype(np.int64)
+    vitoria_a = (vencedores[primeira] == "A").astype(np.float64)
+    inicio = time.perf_counter()
+    vetorizado = ranking.calcular_ratings(partida_da_linha, jogador_da_linha, lado_da_linha, vitoria_a, len(ids))
+    tempo_vetorizado = time.perf_counter() - inicio
+
+    por_partida = {}
+    for p, j, lado, v in zip(linhas_partida.tolist(), jogadores.tolist(), times.tolist(), vencedores.tolist()):
+        por_partida.setdefault(p, {"vencedor": v, "A": [], "B": []})[lado].append(j)
+    inicio = time.perf_counter()
+    variacao, _ = ranking.variacoes(list(por_partida.values()), {})
+    tempo_python = time.perf_counter() - inicio
+
+    esperado = np.array([ranking.RATING_INICIAL + variacao.get(j, 0.0) for j in ids.tolist()])
+    assert np.allclose(vetorizado, esperado)
+    engine.dispose()
+    print(f"{len(partidas):>7} partidas ({len(historico):>8} linhas): "
+          f"calcular_ratings {tempo_vetorizado * 1000:8.1f}ms | variacoes {tempo_python * 1000:8.1f}ms | "
+          f"recalcular() completo {ponta_a_ponta:6.2f}s")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as pasta:
+        for noites in NOITES:
+            medir(noites, pasta)
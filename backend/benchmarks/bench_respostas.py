@@ -0,0 +1,87 @@
+# Custo de serializar a resposta de cada endpoint quente, numa noite cheia (60 na fila, 3 quadras 4x4):
+#   - padrão:   dict devolvido ao FastAPI (jsonable_encoder + json da biblioteca padrão, como no JSONResponse)
+#   - orjson:   respostas.RespostaJSON (o dict direto para o orjson)
+#   - compacta: "Prefer: return=minimal" (só {"ok", "versao"}) nas mutações
+#   - /estado:  corpo reaproveitado pelo estado.estado_serializado enquanto a versão não muda
+# Rodar de dentro da pasta backend:  python -m benchmarks.bench_respostas
+import copy
+import timeit
+from datetime import datetime, timezone
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+import estado
+import respostas
+from estado import ESTADO_MEMORIA
+
+NA_FILA = 60
+QUADRAS = 3
+TAMANHO_TIME = 4
+REPETICOES = 2000
+
+
+def _jogo(quadra_id):
+    return {
+        "status": "JOGANDO",
+        "inicio": datetime.now(timezone.utc).isoformat(),
+        "placar": {"A": 17, "B": 15},
+        "timeA": [f"{quadra_id}-a{i}-7f3c2a9e-5b1d-4c8e-9a0f" for i in range(TAMANHO_TIME)],
+        "timeB": [f"{quadra_id}-b{i}-7f3c2a9e-5b1d-4c8e-9a0f" for i in range(TAMANHO_TIME)],
+        "vitoriasConsecutivas": {"A": 1, "B": 0},
+    }
+
+
+def _preparar():
+    ESTADO_MEMORIA["fila"] = [f"fila-{i}-7f3c2a9e-5b1d-4c8e-9a0f" for i in range(NA_FILA)]
+    ESTADO_MEMORIA["jogos"] = {q: None for q in range(1, QUADRAS + 1)}
+    with estado.transacao() as t:
+        for quadra_id in range(1, QUADRAS + 1):
+            t.definir_quadra(quadra_id, _jogo(quadra_id))
+    for i in range(10):
+        with estado.transacao(quadras=[1], fila=False) as t:
+            t.definir_placar(1, {"A": i, "B": 0})
+    return t
+
+
+def _padrao(conteudo):
+    return JSONResponse(jsonable_encoder(conteudo)).body
+
+
+def _medir(funcao, conteudo):
+    corpo = funcao(conteudo)
+    segundos = timeit.timeit(lambda: funcao(conteudo), number=REPETICOES) / REPETICOES
+    return len(corpo), segundos * 1_000_000
+
+
+def main():
+    t = _preparar()
+    foto = estado.snapshot()
+    fila = ESTADO_MEMORIA["fila"].como_lista()
+    jogo = copy.deepcopy(ESTADO_MEMORIA["jogos"][1])
+    ack = {"ok": True, "versao": t.versao}
+    endpoints = [
+        ("GET /estado", foto, None),
+        ("GET /estado?desde", {"versao": foto["versao"], "deltas": estado.deltas_desde(foto["versao"] - 10)}, None),
+        ("POST /fila/entrar", {"mensagem": "Adicionado com sucesso", "fila": fila}, ack),
+        ("POST /quadras/1/encerrar", {"mensagem": "Partida encerrada manualmente e salva no histórico.", "fila": fila}, ack),
+        ("POST /quadras/1/vitoria", {"mensagem": "Vitória registrada", "estado_quadra": jogo}, ack),
+        ("POST /quadras/1/placar", {"mensagem": "Placar atualizado", "placar": jogo["placar"]}, ack),
+    ]
+    print(f"{'endpoint':<26} | {'padrão':>16} | {'orjson':>16} | {'compacta':>16}")
+    for nome, conteudo, compacta in endpoints:
+        colunas = []
+        for funcao, dados in ((_padrao, conteudo), (respostas.dumps, conteudo), (respostas.dumps, compacta)):
+            if dados is None:
+                colunas.append(f"{'-':>16}")
+                continue
+            tamanho, micros = _medir(funcao, dados)
+            colunas.append(f"{tamanho:>6} B {micros:>5.1f} µs")
+        print(f"{nome:<26} | " + " | ".join(colunas))
+
+    # /estado de verdade: só serializa quando a versão muda; as outras leituras pegam os bytes prontos
+    estado.estado_serializado()
+    micros = timeit.timeit(estado.estado_serializado, number=REPETICOES) / REPETICOES * 1_000_000
+    print(f"{'GET /estado (cache)':<26} | {'':>16} | {len(estado.estado_serializado()[1]):>6} B {micros:>5.1f} µs |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Sobe a API de verdade com vários workers do uvicorn apontando para o mesmo armazém SQLite
+# (VOLEIFLOW_ESTADO=sqlite), dispara requisições concorrentes de fila em todos eles e confere
+# no fim que todo worker enxerga a mesma versão e a mesma fila, sem jogador repetido ou perdido.
+# Rodar de dentro da pasta backend:  python -m benchmarks.bench_workers [workers]
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import httpx
+
+PORTA = 8765
+CLIENTES = 16
+JOGADORES_POR_CLIENTE = 50
+URL = f"http://127.0.0.1:{PORTA}"
+
+
+def _esperar_api(processo):
+    for _ in range(100):
+        if processo.poll() is not None:
+            raise RuntimeError("uvicorn saiu antes de responder")
+        try:
+            httpx.get(URL + "/", timeout=0.5)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError("uvicorn não respondeu a tempo")
+
+
+def rodar(workers):
+    pasta = tempfile.mkdtemp(prefix="voleiflow-workers-")
+    ambiente = dict(os.environ,
+                    VOLEIFLOW_ESTADO="sqlite",
+                    VOLEIFLOW_ESTADO_SQLITE=os.path.join(pasta, "estado.db"),
+                    VOLEIFLOW_DIARIO="")
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORTA), "--workers", str(workers),
+         "--log-level", "warning"],
+        env=ambiente,
+    )
+    try:
+        _esperar_api(processo)
+        latencias = []
+
+        def cliente(numero):
+            minhas = []
+            # Uma conexão por cliente (como um celular): o kernel espalha as conexões entre os workers
+            with httpx.Client(base_url=URL) as http:
+                for i in range(JOGADORES_POR_CLIENTE):
+                    jogador_id = f"c{numero}-{i}"
+                    inicio = time.perf_counter()
+                    http.post("/fila/entrar", json={"jogador_id": jogador_id}).raise_for_status()
+                    if i % 4 == 0:
+                        http.post("/fila/final", json={"jogador_id": f"c{numero}-{i // 2}"}).raise_for_status()
+                    minhas.append(time.perf_counter() - inicio)
+            latencias.extend(minhas)
+
+        inicio = time.perf_counter()
+        threads = [threading.Thread(target=cliente, args=(n,)) for n in range(CLIENTES)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+
+        # Vários GETs caem em workers diferentes: todos precisam contar a mesma história
+        sem_reuso = httpx.Limits(max_keepalive_connections=0)
+        with httpx.Client(base_url=URL, limits=sem_reuso) as http:
+            fotos = [http.get("/estado").json() for _ in range(workers * 4)]
+        esperados = sorted(f"c{n}-{i}" for n in range(CLIENTES) for i in range(JOGADORES_POR_CLIENTE))
+        assert all(sorted(foto["fila"]) == esperados for foto in fotos), "fila divergente entre workers"
+        assert len({foto["versao"] for foto in fotos}) == 1, "versões divergentes entre workers"
+
+        latencias.sort()
+        total = CLIENTES * JOGADORES_POR_CLIENTE
+        print(f"workers={workers}: {total / duracao:,.0f} entradas/s  "
+              f"p50={latencias[len(latencias) // 2] * 1000:.1f}ms  "
+              f"p99={latencias[int(len(latencias) * 0.99)] * 1000:.1f}ms  versao={fotos[0]['versao']}")
+    finally:
+        processo.terminate()
+        processo.wait(10)
+
+
+if __name__ == "__main__":
+    rodar(int(sys.argv[1]) if len(sys.argv) > 1 else 4)
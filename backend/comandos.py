@@ -0,0 +1,240 @@
+import random
+from datetime import datetime, timezone
+import persistencia
+import convivencia
+import formacao
+
+# Comandos do motor de quadras e fila.
+# Cada comando recebe uma estado.Transacao já travada (quadra(s) + fila, conforme o caso),
+# valida e altera tudo ali dentro. Como a validação e a alteração acontecem sob a mesma trava,
+# dois toques simultâneos nunca enxergam o mesmo estado "antigo" (nada de jogador duplicado
+# em duas quadras ou sumindo da fila). Os comandos não fazem I/O: nada de banco com a trava segura.
+
+
+class ComandoInvalido(Exception):
+    # Regra de negócio violada: a API devolve 400 com esta mensagem
+    pass
+
+
+class FilaMudou(ComandoInvalido):
+    # A frente da fila mudou entre a escolha dos times e a confirmação (outra quadra puxou gente)
+    pass
+
+
+# Na entrada dos desafiantes, quantos da fila além dos necessários podem ser considerados
+# para evitar repetir duplas (quem fica de fora continua na frente da fila)
+FOLGA_DESAFIANTES = 2
+
+
+def _liberar_quadra(t, quadra_id, config):
+    # Quadra acima da QuantidadeQuadras (a configuração diminuiu com o jogo rolando, estado.ajustar_quadras)
+    # fecha quando o jogo acaba; as outras ficam vazias esperando o próximo
+    if quadra_id > config.quantidade_quadras:
+        t.remover_quadra(quadra_id)
+    else:
+        t.definir_quadra(quadra_id, None)
+
+
+def _jogo_ativo(t, quadra_id):
+    jogo = t.jogo(quadra_id)
+    if not jogo or jogo["status"] != "JOGANDO":
+        raise ComandoInvalido("Nenhum jogo ativo nesta quadra.")
+    return jogo
+
+
+# --- Fila ---
+
+def entrar_na_fila(t, jogador_id):
+    # Regra de Negócio: Não deixa entrar duplicado
+    t.entrar_na_fila(jogador_id)
+
+
+def sair_da_fila(t, jogador_id):
+    t.sair_da_fila(jogador_id)
+
+
+def mover_para_final(t, jogador_id):
+    t.mover_para_final(jogador_id)
+
+
+# Operações aceitas no lote de fila (POST /fila/lote)
+OPERACOES_FILA = {"entrar": entrar_na_fila, "sair": sair_da_fila, "final": mover_para_final}
+
+
+def validar_lote_fila(operacoes):
+    # Confere o lote inteiro antes de aplicar: ou entra tudo, ou nada
+    # (o POST /fila/lote chama antes de gravar as presenças, sem trava nenhuma)
+    for op, _jogador_id in operacoes:
+        if op not in OPERACOES_FILA:
+            raise ComandoInvalido(f"Operação de fila inválida: {op}.")
+
+
+def aplicar_lote_fila(t, operacoes):
+    # (op, jogador_id) na ordem recebida, todos na mesma transação: a noite começa com 30 a 60 check-ins
+    # e o stream publica um delta só (uma versão) em vez de um por pessoa
+    validar_lote_fila(operacoes)
+    for op, jogador_id in operacoes:
+        OPERACOES_FILA[op](t, jogador_id)
+
+
+def embaralhar_fila(t):
+    # Embaralha aqui e publica a fila já embaralhada (quem recebe o delta não sorteia nada)
+    nova_fila = t.fila.como_lista()
+    random.shuffle(nova_fila)
+    t.definir_fila(nova_fila)
+
+
+# --- Quadras ---
+
+def iniciar_partida(t, quadra_id, selecionados, time_a, time_b):
+    # `selecionados` são os primeiros da fila no momento em que os times foram montados.
+    # Se a frente da fila mudou desde então, quem chamou monta os times de novo.
+    if quadra_id not in t.estado["jogos"]:
+        raise ComandoInvalido("Quadra inválida.")
+    jogo_atual = t.estado["jogos"].get(quadra_id)
+    if jogo_atual and jogo_atual.get("status") == "JOGANDO":
+        raise ComandoInvalido("Quadra já está em uso.")
+    if len(t.fila) < len(selecionados) or t.fila.primeiros(len(selecionados)) != selecionados:
+        raise FilaMudou("A fila mudou enquanto os times eram montados.")
+
+    novo_jogo = {
+        "status": "JOGANDO",
+        "inicio": datetime.now(timezone.utc).isoformat(),
+        "placar": {"A": 0, "B": 0},
+        "timeA": time_a,
+        "timeB": time_b,
+        "vitoriasConsecutivas": {"A": 0, "B": 0}
+    }
+    t.retirar_da_fila(len(selecionados))
+    t.definir_quadra(quadra_id, novo_jogo)
+    return novo_jogo
+
+
+def atualizar_placar(t, quadra_id, time, delta):
+    time = time.upper()
+    if time not in ["A", "B"]:
+        raise ComandoInvalido("Time inválido. Use 'A' ou 'B'.")
+    jogo = _jogo_ativo(t, quadra_id)
+
+    placar = jogo["placar"]
+    # Impede placar negativo
+    placar[time] = max(0, placar[time] + delta)
+    t.definir_placar(quadra_id, placar)
+    return placar
+
+
+def encerrar_partida(t, quadra_id, config):
+    jogo = _jogo_ativo(t, quadra_id)
+
+    # 1. Monta a Partida Principal e 2. o Histórico de cada jogador (o seu registro atuarial).
+    # Como foi manual, não tem vencedor formal.
+    resultado = persistencia.montar_resultado(quadra_id, jogo, vencedor=None, motivo_fim="Cancelada")
+
+    # 3. Devolve a galera para a fila em ordem aleatória e 4. Limpa a quadra
+    todos_jogadores = jogo["timeA"] + jogo["timeB"]
+    random.shuffle(todos_jogadores)
+    t.estender_fila(todos_jogadores)
+    _liberar_quadra(t, quadra_id, config)
+    return resultado
+
+
+def registrar_vitoria(t, quadra_id, time_vencedor, placar_a, placar_b, config):
+    jogo = _jogo_ativo(t, quadra_id)
+
+    vencedor = time_vencedor.upper()
+    if vencedor not in ["A", "B"]:
+        raise ComandoInvalido("Vencedor inválido. Use 'A' ou 'B'.")
+    perdedor = "B" if vencedor == "A" else "A"
+
+    # 1. Ajuste final de placar (se o Front enviou correção no modal)
+    if placar_a is not None: jogo["placar"]["A"] = placar_a
+    if placar_b is not None: jogo["placar"]["B"] = placar_b
+
+    # 2. Monta a Partida Principal e 3. o Histórico de cada jogador (gravados depois, em segundo plano)
+    resultado = persistencia.montar_resultado(quadra_id, jogo, vencedor=vencedor, motivo_fim="Pontuacao")
+
+    ids_vencedores = jogo[f"time{vencedor}"]
+    ids_perdedores = jogo[f"time{perdedor}"]
+
+    # 4. Avalia o Limite de Vitórias
+    jogo["vitoriasConsecutivas"][vencedor] += 1
+    jogo["vitoriasConsecutivas"][perdedor] = 0 # Reseta o outro lado
+
+    # 5. Rotaciona os Perdedores (Vão para a fila embaralhados; a ordem sorteada já vai junto no delta).
+    # Eles só entram no fim da fila depois que os desafiantes saem dela: quem acabou de perder nunca
+    # passa na frente de quem já estava esperando.
+    perdedores_embaralhados = ids_perdedores.copy()
+    random.shuffle(perdedores_embaralhados)
+
+    vencedores_embaralhados = ids_vencedores.copy()
+    random.shuffle(vencedores_embaralhados)
+
+    if jogo["vitoriasConsecutivas"][vencedor] >= config.max_vitorias:
+        # Atingiu o limite: Vencedores também saem
+        t.estender_fila(perdedores_embaralhados)
+        t.estender_fila(vencedores_embaralhados)
+        jogo = None # Esvazia a quadra
+        msg = f"Limite de {config.max_vitorias} vitórias atingido. Todos para a fila."
+    elif len(t.fila) + len(perdedores_embaralhados) >= config.tamanho_time:
+        # Não atingiu o limite: Puxa desafiantes (O "Loop" perfeito dos 8 jogadores)
+        candidatos = t.fila.primeiros(config.tamanho_time + FOLGA_DESAFIANTES) # Só quem já esperava
+        if len(candidatos) >= config.tamanho_time:
+            # Entre os primeiros da fila, quem menos repete dupla na noite (convivencia.py)
+            repeticoes = convivencia.MATRIZ.entre(candidatos + ids_vencedores)
+            novos_desafiantes = formacao.escolher_desafiantes(candidatos, config.tamanho_time, ids_vencedores, repeticoes)
+            if novos_desafiantes == candidatos[:config.tamanho_time]:
+                t.retirar_da_fila(config.tamanho_time)
+            else:
+                for jogador_id in novos_desafiantes:
+                    t.sair_da_fila(jogador_id)
+            t.estender_fila(perdedores_embaralhados)
+        else:
+            # Fila curta: todo mundo que esperava entra e os perdedores completam o time
+            faltam = config.tamanho_time - len(candidatos)
+            t.retirar_da_fila(len(candidatos))
+            novos_desafiantes = candidatos + perdedores_embaralhados[:faltam]
+            t.estender_fila(perdedores_embaralhados[faltam:])
+
+        # Substitui o time que perdeu
+        jogo[f"time{perdedor}"] = novos_desafiantes
+        # Reseta a quadra para a nova partida
+        jogo["placar"] = {"A": 0, "B": 0}
+        jogo["inicio"] = datetime.now(timezone.utc).isoformat()
+        msg = "Vitória registrada. Novos desafiantes entraram."
+    else:
+        # Regra de fallback (quase impossível de ocorrer devido ao loop, mas previne travamento do app)
+        t.estender_fila(perdedores_embaralhados)
+        t.estender_fila(vencedores_embaralhados)
+        jogo = None
+        msg = "Fila insuficiente para continuar, quadra esvaziada."
+
+    if jogo is None:
+        _liberar_quadra(t, quadra_id, config)
+    else:
+        t.definir_quadra(quadra_id, jogo)
+    return msg, jogo, resultado
+
+
+def substituir_jogador(t, quadra_id, id_saindo, id_entrando):
+    # 1. Validações Iniciais
+    jogo = _jogo_ativo(t, quadra_id)
+    if id_entrando not in t.fila:
+        raise ComandoInvalido("O jogador substituto não está na fila de espera.")
+
+    # 2. Descobre em qual time o jogador que vai sair está
+    if id_saindo in jogo["timeA"]:
+        time_alvo = "timeA"
+    elif id_saindo in jogo["timeB"]:
+        time_alvo = "timeB"
+    else:
+        raise ComandoInvalido("O jogador que vai sair não está na quadra.")
+
+    # 3. Faz a troca no time (Sai um, Entra o outro)
+    jogo[time_alvo].remove(id_saindo)
+    jogo[time_alvo].append(id_entrando)
+
+    # 4. Atualiza a fila (Remove o substituto e joga quem saiu pro final) junto com a quadra
+    t.sair_da_fila(id_entrando)
+    t.entrar_na_fila(id_saindo)
+    t.definir_quadra(quadra_id, jogo)
+    return jogo
@@ -0,0 +1,118 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from sqlalchemy import select
+import models
+from database import SessionLocal, insert_ou_atualizar
+
+# Valores usados quando a chave ainda não foi cadastrada na tabela configuracoes
+PADRAO_TAMANHO_TIME = 4
+PADRAO_MAX_VITORIAS = 3
+PADRAO_QUANTIDADE_QUADRAS = 2
+
+TABELA = "configuracoes" # Linha de versoes_tabelas que conta as escritas em configuracoes
+
+
+@dataclass(frozen=True)
+class Configuracoes:
+    # Foto imutável da tabela configuracoes. Nunca é alterada: cada escrita gera uma nova,
+    # então quem está lendo (no meio de uma partida) nunca vê um valor pela metade.
+    valores: dict = field(default_factory=dict)
+
+    @property
+    def tamanho_time(self) -> int:
+        return self.valores.get("TamanhoTime", PADRAO_TAMANHO_TIME)
+
+    @property
+    def max_vitorias(self) -> int:
+        return self.valores.get("MaxVitorias", PADRAO_MAX_VITORIAS)
+
+    @property
+    def quantidade_quadras(self) -> int:
+        return self.valores.get("QuantidadeQuadras", PADRAO_QUANTIDADE_QUADRAS)
+
+    def como_lista(self) -> list:
+        # Mesmo formato que o GET /configuracoes sempre devolveu
+        return [{"chave": chave, "valor": valor} for chave, valor in self.valores.items()]
+
+
+def incremento(db):
+    # Como o elenco.incremento(): quem grava em configuracoes executa isto na mesma transação
+    versao = models.VersaoTabela
+    return insert_ou_atualizar(db, versao).values(nome=TABELA, versao=1).on_conflict_do_update(
+        index_elements=[versao.nome], set_={"versao": versao.versao + 1})
+
+
+def _versao(db):
+    return db.scalar(select(models.VersaoTabela.versao).where(models.VersaoTabela.nome == TABELA)) or 0
+
+
+class CacheConfiguracoes:
+    # Cache em memória da tabela configuracoes, carregado uma vez e atualizado write-through
+    # pelo POST /configuracoes. Se alguém mexer no banco por fora, use recarregar() ou invalidar().
+    # Com vários workers (compartilhado=True), o write-through só chega no worker que atendeu o POST:
+    # os outros conferem a linha 'configuracoes' de versoes_tabelas (no máximo uma consulta a cada
+    # `intervalo_conferencia` segundos) e recarregam quando ela mudou.
+
+    def __init__(self, fabrica_sessao=SessionLocal, intervalo_conferencia=1.0):
+        self._fabrica_sessao = fabrica_sessao
+        self.intervalo_conferencia = intervalo_conferencia
+        self.compartilhado = False
+        self._trava = threading.Lock()
+        self._atual = None
+        self._versao = None # versoes_tabelas['configuracoes'] lida junto com _atual
+        self._conferido = 0.0
+
+    def carregar(self, db=None) -> Configuracoes:
+        with self._trava:
+            if db is not None:
+                self._atual = self._ler(db)
+            else:
+                with self._fabrica_sessao() as sessao:
+                    self._atual = self._ler(sessao)
+            self._conferido = time.monotonic()
+            return self._atual
+
+    def _ler(self, db) -> Configuracoes:
+        # A versão vem antes das linhas: uma escrita no meio só faz a próxima conferência recarregar de novo
+        self._versao = _versao(db)
+        linhas = db.query(models.Configuracao).all()
+        return Configuracoes({linha.chave: linha.valor for linha in linhas})
+
+    def recarregar(self) -> Configuracoes:
+        # Conta como escrita: os outros workers também recarregam
+        with self._fabrica_sessao() as db:
+            db.execute(incremento(db))
+            db.commit()
+            return self.carregar(db)
+
+    def invalidar(self):
+        # A próxima leitura vai ao banco de novo
+        self._atual = None
+
+    def atual(self) -> Configuracoes:
+        atual = self._atual
+        if atual is None:
+            atual = self.carregar()
+        elif self.compartilhado and time.monotonic() - self._conferido >= self.intervalo_conferencia:
+            atual = self._conferir()
+        return atual
+
+    def _conferir(self) -> Configuracoes:
+        self._conferido = time.monotonic()
+        with self._fabrica_sessao() as db:
+            if _versao(db) != self._versao:
+                return self.carregar(db)
+        return self._atual
+
+    def definir(self, chave: str, valor: int):
+        # Write-through: chamado depois do commit no banco
+        with self._trava:
+            if self._atual is None:
+                return # Ainda não carregado: a próxima leitura já busca o valor novo
+            valores = dict(self._atual.valores)
+            valores[chave] = valor
+            self._atual = Configuracoes(valores)
+
+
+CACHE_CONFIGURACOES = CacheConfiguracoes()
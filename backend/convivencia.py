@@ -0,0 +1,134 @@
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from itertools import combinations
+from sqlalchemy import select
+import models
+from database import SessionLocal
+
+# Quantas vezes cada par de jogadores jogou junto (mesmo time) ou um contra o outro na sessão atual.
+# Serve para quebrar as panelinhas: a montagem dos times (formacao.py) e a entrada dos desafiantes
+# (comandos.registrar_vitoria) evitam repetir as mesmas duplas.
+#
+# - Esparsa: só existem os pares que jogaram juntos dentro da janela (memória proporcional aos pares
+#   observados, não ao quadrado do número de jogadores).
+# - Janela de recência: só contam as partidas que terminaram nas últimas JANELA_PADRAO horas (uma noite
+#   de jogo). Partidas que saem da janela são descontadas e os pares zerados somem do dicionário.
+# - Incremental: cada partida encerrada entra com registrar_resultado(); carregar() refaz tudo a partir
+#   do PartidaHistorico (na subida da API).
+
+JANELA_PADRAO = timedelta(hours=6)
+
+
+def _par(a, b):
+    return (a, b) if a < b else (b, a)
+
+
+def _utc(momento):
+    # O SQLite devolve datetime sem fuso; tudo aqui é UTC
+    return momento if momento.tzinfo is not None else momento.replace(tzinfo=timezone.utc)
+
+
+class MatrizConvivencia:
+
+    def __init__(self, janela=JANELA_PADRAO):
+        self.janela = janela
+        self._trava = threading.Lock()
+        self._pares = {} # (a, b) com a < b -> [vezes no mesmo time, vezes em times opostos]
+        self._partidas = deque() # (fim, pares no mesmo time, pares em times opostos), em ordem de fim
+
+    def __len__(self):
+        return len(self._pares)
+
+    def _somar(self, pares, posicao, sinal):
+        for par in pares:
+            contagem = self._pares.get(par)
+            if contagem is None:
+                contagem = self._pares[par] = [0, 0]
+            contagem[posicao] += sinal
+            if contagem == [0, 0]:
+                del self._pares[par]
+
+    def _descartar_antigas(self, agora):
+        limite = agora - self.janela
+        while self._partidas and self._partidas[0][0] < limite:
+            _, companheiros, adversarios = self._partidas.popleft()
+            self._somar(companheiros, 0, -1)
+            self._somar(adversarios, 1, -1)
+
+    def _registrar(self, time_a, time_b, fim):
+        fim = _utc(fim)
+        self._descartar_antigas(fim)
+        if self._partidas and fim < self._partidas[-1][0] - self.janela:
+            return # Já nasceu fora da janela
+        companheiros = [_par(a, b) for time_ in (time_a, time_b) for a, b in combinations(time_, 2)]
+        adversarios = [_par(a, b) for a in time_a for b in time_b]
+        self._somar(companheiros, 0, 1)
+        self._somar(adversarios, 1, 1)
+        self._partidas.append((fim, companheiros, adversarios))
+
+    def registrar(self, time_a, time_b, fim=None):
+        with self._trava:
+            self._registrar(time_a, time_b, fim or datetime.now(timezone.utc))
+
+    def registrar_resultado(self, resultado):
+        # persistencia.ResultadoPartida (encerramento manual também conta: o pessoal jogou junto)
+        times = {"A": [], "B": []}
+        for linha in resultado.historico:
+            times[linha["time"]].append(linha["jogador_id"])
+        self.registrar(times["A"], times["B"], resultado.partida["fim"])
+
+    def carregar(self, db=None, agora=None):
+        # Refaz a matriz com as partidas da janela, lidas do histórico em ordem de término
+        agora = _utc(agora or datetime.now(timezone.utc))
+        consulta = (
+            select(models.Partida.id, models.Partida.fim, models.PartidaHistorico.jogador_id, models.PartidaHistorico.time)
+            .join(models.PartidaHistorico, models.PartidaHistorico.partida_id == models.Partida.id)
+            # Folga de um dia no filtro do banco (datas sem fuso); o corte exato é feito aqui
+            .where(models.Partida.fim >= (agora - self.janela - timedelta(days=1)).replace(tzinfo=None))
+            .order_by(models.Partida.fim, models.Partida.id)
+        )
+        if db is None:
+            with SessionLocal() as sessao:
+                linhas = sessao.execute(consulta).all()
+        else:
+            linhas = db.execute(consulta).all()
+
+        partidas = {}
+        for partida_id, fim, jogador_id, time_ in linhas:
+            partida = partidas.setdefault(partida_id, (fim, {"A": [], "B": []}))
+            partida[1][time_].append(jogador_id)
+
+        with self._trava:
+            self._pares = {}
+            self._partidas = deque()
+            for fim, times in partidas.values():
+                if fim is not None and _utc(fim) >= agora - self.janela:
+                    self._registrar(times["A"], times["B"], fim)
+            self._descartar_antigas(agora)
+        return len(self._partidas)
+
+    def companheiros(self, a, b):
+        contagem = self._pares.get(_par(a, b))
+        return contagem[0] if contagem else 0
+
+    def adversarios(self, a, b):
+        contagem = self._pares.get(_par(a, b))
+        return contagem[1] if contagem else 0
+
+    def entre(self, ids):
+        # {(a, b): [companheiros, adversários]} só dos pares de `ids` que já se cruzaram na janela
+        with self._trava:
+            self._descartar_antigas(datetime.now(timezone.utc))
+            pares = self._pares
+            if not pares:
+                return {}
+            resultado = {}
+            for par in combinations(sorted(set(ids)), 2):
+                contagem = pares.get(par)
+                if contagem is not None:
+                    resultado[par] = list(contagem)
+            return resultado
+
+
+MATRIZ = MatrizConvivencia()
@@ -0,0 +1,30 @@
+# backend/copiar_banco.py
+import sys
+from sqlalchemy import create_engine, delete, insert, inspect, select
+from database import engine, Base
+import models
+import migracoes
+
+# Copia todas as tabelas de um arquivo SQLite para o banco configurado (VOLEIFLOW_BANCO / VOLEIFLOW_POSTGRES_URL).
+# Serve para a mudança para o Postgres/Supabase e para semear um Postgres local com o mesmo voleiflow.db
+# que a suíte de testes usa. Uso:  VOLEIFLOW_BANCO=postgres VOLEIFLOW_POSTGRES_URL=... python copiar_banco.py ./voleiflow.db
+# O destino precisa estar vazio (as linhas são inseridas, não mescladas).
+LOTE = 5000
+
+origem = create_engine(f"sqlite:///{sys.argv[1] if len(sys.argv) > 1 else './voleiflow.db'}")
+migracoes.migrar(origem) # Arquivo de uma versão anterior: ganha as colunas novas (como a API faria ao subir)
+migracoes.migrar(engine) # O destino já sai com o esquema e o carimbo atuais
+existentes = set(inspect(origem).get_table_names())
+with origem.connect() as leitura, engine.begin() as escrita:
+    # Os contadores que as migrações do destino criaram valem o que está na origem
+    escrita.execute(delete(models.VersaoTabela))
+    for tabela in Base.metadata.sorted_tables: # Pais antes dos filhos
+        if tabela.name not in existentes or tabela is models.VersaoEsquema.__table__:
+            continue # Arquivo de uma versão anterior, sem esta tabela (ou o carimbo, que é do destino)
+        copiadas = 0
+        resultado = leitura.execute(select(tabela).execution_options(yield_per=LOTE))
+        for bloco in resultado.mappings().partitions():
+            escrita.execute(insert(tabela), [dict(linha) for linha in bloco])
+            copiadas += len(bloco)
+        print(f"{tabela.name}: {copiadas} linha(s)")
+print("Cópia concluída!")
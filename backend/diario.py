@@ -0,0 +1,286 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import estado
+
+logger = logging.getLogger("voleiflow.diario")
+
+# Políticas de fsync do diário:
+# - "sempre":    fsync a cada alteração (nada se perde, cada toque custa uma ida ao disco)
+# - "intervalo": fsync no máximo a cada `intervalo_fsync` segundos, e nenhuma escrita fica mais que isso
+#                sem fsync (pode perder os últimos instantes)
+# - "nunca":     deixa o sistema operacional decidir (só sobrevive a queda do processo, não do servidor)
+POLITICAS_FSYNC = ("sempre", "intervalo", "nunca")
+
+ARQUIVO_SNAPSHOT = "snapshot.json"
+ARQUIVO_DIARIO = "diario.ndjson"
+
+
+class DiarioEstado:
+    # Diário append-only do ESTADO_MEMORIA: cada delta publicado por estado.transacao() vira uma linha
+    # NDJSON. A cada `snapshot_a_cada` deltas o estado inteiro é gravado em snapshot.json e o diário
+    # recomeça vazio, então a recuperação é sempre "último snapshot + cauda curta do diário".
+    #
+    # O disco fica numa thread própria: registrar() e compactar() só entregam o delta (ou a foto) numa
+    # fila, na ordem das versões, e voltam na hora, sem escrita nem fsync dentro das travas do estado.
+    # A thread grava tudo o que estiver pendente de uma vez (um flush e no máximo um fsync por leva).
+    # Com fsync="sempre", quem publicou espera o disco com aguardar(), já fora das travas.
+
+    def __init__(self, pasta, fsync="intervalo", intervalo_fsync=0.2, snapshot_a_cada=1000):
+        if fsync not in POLITICAS_FSYNC:
+            raise ValueError(f"Política de fsync inválida: {fsync}. Use uma de {POLITICAS_FSYNC}.")
+        self.pasta = pasta
+        self.fsync = fsync
+        self.intervalo_fsync = intervalo_fsync
+        self.snapshot_a_cada = snapshot_a_cada
+        self.caminho_snapshot = os.path.join(pasta, ARQUIVO_SNAPSHOT)
+        self.caminho_diario = os.path.join(pasta, ARQUIVO_DIARIO)
+        self._arquivo = None
+        self._desde_snapshot = 0
+        self._ultimo_fsync = 0.0
+        self._sujo = False # Com fsync="intervalo": há escrita no arquivo ainda sem fsync
+        self._precisa_foto = False # Uma gravação falhou: o diário tem um buraco até o próximo snapshot
+        self._pedir_foto = False # registrar() avisa estado.transacao() para compactar (e tapar o buraco)
+        self._pendentes = queue.Queue()
+        self._thread = None
+        self._trava_thread = threading.Lock()
+        self._gravada = threading.Condition()
+        self._versao_gravada = 0 # Última versão que a thread já entregou ao disco (conforme a política)
+        self._versao_falha = 0 # Última versão cuja gravação falhou (quem espera por ela recebe o erro)
+        self._erro = None
+        self.ultimo_erro = None
+        os.makedirs(pasta, exist_ok=True)
+
+    # --- Recuperação ---
+
+    def restaurar(self, destino) -> int:
+        # Preenche `destino` (um EstadoMemoria) com snapshot + diário e devolve a versão recuperada
+        versao = 0
+        if os.path.exists(self.caminho_snapshot):
+            with open(self.caminho_snapshot, "rb") as arquivo:
+                foto = json.loads(arquivo.read())
+            versao = foto["versao"]
+            destino["fila"] = foto["fila"]
+            # JSON só tem chaves texto; as quadras voltam a ser números
+            destino["jogos"] = {int(quadra_id): jogo for quadra_id, jogo in foto["jogos"].items()}
+
+        aplicados = 0
+        for delta in self._ler_diario():
+            if delta["versao"] <= versao:
+                continue # Já está dentro do snapshot (queda entre gravar o snapshot e zerar o diário)
+            for op in delta["ops"]:
+                estado.aplicar_operacao(destino, op)
+            versao = delta["versao"]
+            aplicados += 1
+
+        self._desde_snapshot = aplicados
+        return versao
+
+    def _ler_diario(self):
+        if not os.path.exists(self.caminho_diario):
+            return
+        with open(self.caminho_diario, "rb") as arquivo:
+            for linha in arquivo:
+                if not linha.endswith(b"\n"):
+                    # Última linha pela metade: o processo caiu no meio da escrita
+                    logger.warning("Descartando linha incompleta no fim do diário")
+                    return
+                yield json.loads(linha)
+
+    # --- Gravação ---
+
+    def _abrir(self):
+        if self._arquivo is None:
+            self._arquivo = open(self.caminho_diario, "ab")
+        return self._arquivo
+
+    def _iniciar(self):
+        with self._trava_thread:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._executar, name="diario-estado", daemon=True)
+                self._thread.start()
+
+    def registrar(self, delta) -> bool:
+        # Chamado por estado.transacao() com a trava do estado segura, na ordem das versões.
+        # Devolve True quando já é hora de compactar (quem chamou tira a foto e chama compactar()).
+        self._iniciar()
+        self._pendentes.put(("delta", delta))
+        self._desde_snapshot += 1
+        return self._desde_snapshot >= self.snapshot_a_cada or self._pedir_foto
+
+    def compactar(self, foto):
+        # `foto` precisa ser uma cópia independente, tirada com as travas (estado._foto()): ela entra na
+        # fila depois de todos os deltas até a versão dela e antes de qualquer delta mais novo
+        self._iniciar()
+        # Zerado antes de entrar na fila: se esta foto também falhar, a thread pede outra
+        self._pedir_foto = False
+        self._pendentes.put(("foto", foto))
+        self._desde_snapshot = 0
+
+    def aguardar(self, versao):
+        # Com fsync="sempre", só volta quando `versao` já está no disco (nas outras políticas, na hora).
+        # Se a gravação dela falhou, o erro chega aqui: a alteração vale em memória, mas não está no disco.
+        if self.fsync != "sempre":
+            return
+        with self._gravada:
+            self._gravada.wait_for(lambda: self._versao_gravada >= versao or self._versao_falha >= versao)
+            if self._versao_gravada < versao:
+                raise RuntimeError(f"O diário não gravou a versão {versao}: {self.ultimo_erro}") from self._erro
+
+    def descarregar(self):
+        # Espera tudo o que já foi entregue chegar no arquivo
+        self._pendentes.join()
+
+    def _executar(self):
+        while True:
+            primeiro = self._proximo()
+            if primeiro is None:
+                self._sincronizar_atrasado()
+                continue
+            itens = [primeiro]
+            while True:
+                try:
+                    itens.append(self._pendentes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._gravar(itens)
+            except Exception as erro:
+                # Diário com problema (disco cheio, permissão): o estado em memória segue valendo
+                self.ultimo_erro = repr(erro)
+                logger.exception("Falha ao gravar o diário do estado")
+                self._registrar_falha(itens, erro)
+            finally:
+                for _ in itens:
+                    self._pendentes.task_done()
+            if any(tipo == "parar" for tipo, _ in itens):
+                return
+
+    def _proximo(self):
+        # Com escrita ainda sem fsync, espera um item novo só até o intervalo vencer (None = venceu)
+        if not self._sujo:
+            return self._pendentes.get()
+        espera = self._ultimo_fsync + self.intervalo_fsync - time.monotonic()
+        try:
+            return self._pendentes.get(timeout=max(espera, 0))
+        except queue.Empty:
+            return None
+
+    def _sincronizar_atrasado(self):
+        # O intervalo venceu sem escrita nova: o que ficou só no cache do sistema vai para o disco
+        try:
+            self._sincronizar(self._arquivo, forcar=True)
+        except Exception as erro:
+            self.ultimo_erro = repr(erro)
+            logger.exception("Falha no fsync do diário do estado")
+            self._ultimo_fsync = time.monotonic() # Tenta de novo no próximo intervalo, sem girar em falso
+
+    def _registrar_falha(self, itens, erro):
+        # O que não foi gravado deixa um buraco no diário: os deltas seguintes nem são escritos
+        # (uma recuperação aplicaria eles sobre um estado errado) e registrar() pede um snapshot novo
+        self._precisa_foto = True
+        self._pedir_foto = True
+        versao = max((item[1]["versao"] for item in itens if item[0] != "parar"), default=0)
+        with self._gravada:
+            self._erro = erro
+            self._versao_falha = max(self._versao_falha, versao)
+            self._gravada.notify_all()
+
+    def _confirmar(self, versao):
+        with self._gravada:
+            self._versao_gravada = max(self._versao_gravada, versao)
+            self._gravada.notify_all()
+
+    def _gravar(self, itens):
+        # Cada pedaço gravado é confirmado na hora: se um pedaço falhar, o que veio antes já vale
+        linhas = []
+        versao = 0
+        for tipo, conteudo in itens:
+            if tipo == "delta":
+                if self._precisa_foto:
+                    continue
+                linhas.append(json.dumps(conteudo, separators=(",", ":")).encode() + b"\n")
+                versao = conteudo["versao"]
+                continue
+            if linhas:
+                self._escrever(linhas)
+                self._confirmar(versao)
+                linhas = []
+            if tipo == "foto":
+                self._gravar_snapshot(conteudo)
+                self._precisa_foto = False
+                self._confirmar(conteudo["versao"])
+        if linhas:
+            self._escrever(linhas)
+            self._confirmar(versao)
+
+    def _escrever(self, linhas):
+        arquivo = self._abrir()
+        arquivo.write(b"".join(linhas))
+        arquivo.flush()
+        self._sincronizar(arquivo)
+
+    def _sincronizar(self, arquivo, forcar=False):
+        if self.fsync == "nunca" and not forcar:
+            return
+        agora = time.monotonic()
+        if forcar or self.fsync == "sempre" or agora - self._ultimo_fsync >= self.intervalo_fsync:
+            os.fsync(arquivo.fileno())
+            self._ultimo_fsync = agora
+            self._sujo = False
+        else:
+            self._sujo = True # A thread faz o fsync quando o intervalo vencer (_proximo)
+
+    def _gravar_snapshot(self, foto):
+        # 1. Grava o snapshot num arquivo temporário e troca de forma atômica (rename)
+        temporario = self.caminho_snapshot + ".tmp"
+        with open(temporario, "wb") as arquivo:
+            arquivo.write(json.dumps(foto, separators=(",", ":")).encode())
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self.caminho_snapshot)
+        self._sincronizar_pasta()
+
+        # 2. Só depois zera o diário (se cair antes disso, a versão no snapshot descarta as linhas velhas)
+        if self._arquivo is not None:
+            self._arquivo.close()
+        self._arquivo = open(self.caminho_diario, "wb")
+        self._sujo = False
+
+    def _sincronizar_pasta(self):
+        if not hasattr(os, "O_DIRECTORY"):
+            return # Windows não deixa abrir pasta para fsync
+        descritor = os.open(self.pasta, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(descritor)
+        finally:
+            os.close(descritor)
+
+    def fechar(self):
+        # Grava o que estiver pendente e encerra a thread
+        with self._trava_thread:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._pendentes.put(("parar", None))
+            thread.join()
+        if self._arquivo is not None:
+            self._arquivo.flush()
+            self._sincronizar(self._arquivo, forcar=True)
+            self._arquivo.close()
+            self._arquivo = None
+
+
+def diario_do_ambiente():
+    # Configuração por variáveis de ambiente. VOLEIFLOW_DIARIO vazio desliga o diário.
+    pasta = os.getenv("VOLEIFLOW_DIARIO", "./diario_estado")
+    if not pasta:
+        return None
+    return DiarioEstado(
+        pasta,
+        fsync=os.getenv("VOLEIFLOW_DIARIO_FSYNC", "intervalo"),
+        intervalo_fsync=float(os.getenv("VOLEIFLOW_DIARIO_INTERVALO_FSYNC", "0.2")),
+        snapshot_a_cada=int(os.getenv("VOLEIFLOW_DIARIO_SNAPSHOT_A_CADA", "1000")),
+    )
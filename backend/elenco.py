@@ -0,0 +1,63 @@
+import hashlib
+import json
+from sqlalchemy import select
+import models
+from database import insert_ou_atualizar
+
+# Elenco enxuto (GET /jogadores/elenco): só os campos pedidos, em colunas, com ETag.
+# Toda escrita em jogadores incrementa a linha 'jogadores' de versoes_tabelas na mesma transação
+# (incremento()). O ETag sai dessa versão: conferir se o elenco mudou custa ler uma linha, e o corpo
+# já serializado é reaproveitado enquanto a versão não muda (vários celulares abrindo o app = uma consulta).
+# Avatares não vêm aqui dentro: o campo avatar é um emoji ou a URL /avatares/<hash> (avatares.py).
+
+TABELA = "jogadores"
+CAMPOS = ("id", "nome", "sexo", "whatsapp", "avatar", "is_presente")
+CAMPOS_PADRAO = ("id", "nome", "sexo", "avatar", "is_presente")
+
+_cache = {} # {campos: (versao, corpo, etag)}
+
+
+class CampoInvalido(ValueError):
+    pass
+
+
+def incremento(db):
+    # INSERT ... ON CONFLICT que soma 1 na versão; quem chama executa na transação da escrita
+    versao = models.VersaoTabela
+    return insert_ou_atualizar(db, versao).values(nome=TABELA, versao=1).on_conflict_do_update(
+        index_elements=[versao.nome], set_={"versao": versao.versao + 1})
+
+
+def campos_pedidos(texto):
+    # "nome,sexo" -> ("id", "nome", "sexo"): o id sempre vem, e a ordem é a de CAMPOS
+    if not texto:
+        return CAMPOS_PADRAO
+    pedidos = {campo.strip() for campo in texto.split(",") if campo.strip()}
+    desconhecidos = pedidos - set(CAMPOS)
+    if desconhecidos:
+        raise CampoInvalido(f"Campos inválidos: {', '.join(sorted(desconhecidos))}. Use: {', '.join(CAMPOS)}.")
+    return tuple(campo for campo in CAMPOS if campo == "id" or campo in pedidos)
+
+
+async def versao_atual(db):
+    return await db.scalar(select(models.VersaoTabela.versao).where(models.VersaoTabela.nome == TABELA)) or 0
+
+
+async def serializado(db, campos):
+    # (versao, corpo em bytes, etag) do elenco ativo com `campos`
+    versao = await versao_atual(db)
+    cache = _cache.get(campos)
+    if cache is not None and cache[0] == versao:
+        return cache
+    # A versão é lida antes das linhas: o corpo nunca é mais antigo que a versão que o identifica
+    jogador = models.Jogador
+    linhas = await db.execute(
+        select(*(getattr(jogador, campo) for campo in campos))
+        .where(jogador.is_ativo == True)
+        .order_by(jogador.created_at, jogador.id))
+    corpo = json.dumps({"versao": versao, "campos": list(campos), "jogadores": [list(linha) for linha in linhas]},
+                       separators=(",", ":"), ensure_ascii=False).encode()
+    etag = '"' + hashlib.blake2b(corpo, digest_size=8).hexdigest() + '"'
+    cache = (versao, corpo, etag)
+    _cache[campos] = cache
+    return cache
@@ -0,0 +1,513 @@
+import asyncio
+import copy
+import hashlib
+import orjson
+import threading
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+from fila import FilaIndexada
+from armazem import ArmazemMemoria
+
+
+# Quantos deltas um cliente pode acumular sem ler antes de ser "rebaixado" para um snapshot novo
+LIMITE_PENDENTES_POR_CLIENTE = 256
+
+# Quantos deltas ficam guardados para quem pede /estado?desde=<versao> (ring buffer)
+TAMANHO_HISTORICO = 1024
+
+# Travas, sempre adquiridas nesta ordem para nunca dar deadlock:
+#   0. trava de escrita do armazém (armazem.py)            -> uma escrita por vez entre os workers (só compartilhado)
+#   1. travas das quadras (em ordem crescente de quadra_id) -> protegem o jogo de cada quadra
+#   2. _trava_fila                                         -> protege a fila de espera
+#   3. _trava                                              -> versão, histórico, diário e assinantes
+# Placar na quadra 1 e vitória na quadra 3 não disputam nada; só quem mexe na fila espera pela fila.
+_trava = threading.RLock()
+_trava_fila = threading.RLock()
+_travas_quadras = {}
+_trava_registro_quadras = threading.Lock()
+_versao = 0
+_assinantes = set()
+_historico = deque(maxlen=TAMANHO_HISTORICO)
+_cache_serializado = None # (versao, corpo em bytes, etag)
+_diario = None # DiarioEstado (diario.py) quando a persistência local do estado está ligada
+_armazem = ArmazemMemoria() # Onde o estado é compartilhado (armazem.py); o padrão é só a memória
+_parar_sincronizacao = None # threading.Event da thread que acompanha os outros workers
+INTERVALO_SINCRONIZACAO = 0.05 # Segundos entre conferências do armazém compartilhado (para o stream)
+
+
+def _descartar_cache():
+    global _cache_serializado
+    _cache_serializado = None
+
+
+class EstadoMemoria(dict):
+    # Dicionário comum, mas que garante que a "fila" seja sempre uma FilaIndexada,
+    # mesmo quando alguém atribui uma lista diretamente (ex: ESTADO_MEMORIA["fila"] = [...])
+    def __setitem__(self, chave, valor):
+        if chave == "fila" and not isinstance(valor, FilaIndexada):
+            valor = FilaIndexada(valor)
+        super().__setitem__(chave, valor)
+        # Atribuição direta (usada em testes e scripts) invalida o corpo pré-serializado do /estado
+        _descartar_cache()
+
+# A nossa variável global que todos os dispositivos vão enxergar
+ESTADO_MEMORIA = EstadoMemoria()
+ESTADO_MEMORIA["fila"] = [] # Guardará apenas as strings dos IDs dos jogadores
+ESTADO_MEMORIA["jogos"] = {
+    1: None,
+    2: None
+}
+
+
+# --- Operações ---
+# Toda alteração no ESTADO_MEMORIA vira uma operação pequena e serializável em JSON.
+# Quem recebe os deltas aplica as mesmas operações na mesma ordem e chega no mesmo estado.
+# Operações nunca carregam aleatoriedade: embaralhamentos já viajam com o resultado final.
+
+def aplicar_operacao(estado, op):
+    tipo = op["op"]
+    if tipo == "fila.entrar":
+        estado["fila"].entrar(op["jogador_id"])
+    elif tipo == "fila.sair":
+        estado["fila"].sair(op["jogador_id"])
+    elif tipo == "fila.final":
+        estado["fila"].mover_para_final(op["jogador_id"])
+    elif tipo == "fila.estender":
+        estado["fila"].estender(op["ids"])
+    elif tipo == "fila.retirar":
+        estado["fila"].retirar_primeiros(op["quantidade"])
+    elif tipo == "fila.definir":
+        estado["fila"] = op["fila"]
+    elif tipo == "quadra.definir":
+        # Copia para que o estado nunca compartilhe dicionários com a operação publicada
+        estado["jogos"][op["quadra_id"]] = copy.deepcopy(op["jogo"])
+    elif tipo == "quadra.placar":
+        estado["jogos"][op["quadra_id"]]["placar"] = dict(op["placar"])
+    elif tipo == "quadra.remover":
+        estado["jogos"].pop(op["quadra_id"], None)
+    else:
+        raise ValueError(f"Operação desconhecida: {tipo}")
+
+
+class Transacao:
+    # Acumula as operações de uma requisição. Cada método já aplica a alteração na memória,
+    # e no fim da transação tudo é publicado como um único delta (uma única versão).
+    # `quadras` e `com_fila` dizem o que a transação travou; mexer em outra coisa é erro de programação.
+
+    def __init__(self, estado, quadras=None, com_fila=True):
+        self.estado = estado
+        self.quadras = quadras
+        self.com_fila = com_fila
+        self.ops = []
+        self.versao = None # Versão publicada no fim da transação (None se nada mudou)
+
+    def _registrar(self, op):
+        if op["op"].startswith("fila.") and not self.com_fila:
+            raise RuntimeError("Transação sem a trava da fila tentou alterar a fila.")
+        if "quadra_id" in op and self.quadras is not None and op["quadra_id"] not in self.quadras:
+            raise RuntimeError(f"Transação sem a trava da quadra {op['quadra_id']} tentou alterá-la.")
+        aplicar_operacao(self.estado, op)
+        self.ops.append(op)
+
+    @property
+    def fila(self):
+        return self.estado["fila"]
+
+    def jogo(self, quadra_id):
+        # Cópia de trabalho: o handler altera à vontade e devolve via definir_quadra()
+        return copy.deepcopy(self.estado["jogos"].get(quadra_id))
+
+    def entrar_na_fila(self, jogador_id):
+        if jogador_id not in self.fila:
+            self._registrar({"op": "fila.entrar", "jogador_id": jogador_id})
+
+    def sair_da_fila(self, jogador_id):
+        if jogador_id in self.fila:
+            self._registrar({"op": "fila.sair", "jogador_id": jogador_id})
+
+    def mover_para_final(self, jogador_id):
+        if jogador_id in self.fila:
+            self._registrar({"op": "fila.final", "jogador_id": jogador_id})
+
+    def estender_fila(self, ids):
+        if ids:
+            self._registrar({"op": "fila.estender", "ids": list(ids)})
+
+    def retirar_da_fila(self, quantidade):
+        retirados = self.fila.primeiros(quantidade)
+        if retirados:
+            self._registrar({"op": "fila.retirar", "quantidade": len(retirados)})
+        return retirados
+
+    def definir_fila(self, ids):
+        self._registrar({"op": "fila.definir", "fila": list(ids)})
+
+    def definir_quadra(self, quadra_id, jogo):
+        self._registrar({"op": "quadra.definir", "quadra_id": quadra_id, "jogo": copy.deepcopy(jogo)})
+
+    def definir_placar(self, quadra_id, placar):
+        self._registrar({"op": "quadra.placar", "quadra_id": quadra_id, "placar": dict(placar)})
+
+    def remover_quadra(self, quadra_id):
+        self._registrar({"op": "quadra.remover", "quadra_id": quadra_id})
+
+
+def trava_da_quadra(quadra_id):
+    with _trava_registro_quadras:
+        trava = _travas_quadras.get(quadra_id)
+        if trava is None:
+            trava = _travas_quadras[quadra_id] = threading.RLock()
+        return trava
+
+
+@contextmanager
+def _travado(quadras, com_fila):
+    with ExitStack() as pilha:
+        for quadra_id in sorted(set(quadras)):
+            pilha.enter_context(trava_da_quadra(quadra_id))
+        if com_fila:
+            pilha.enter_context(_trava_fila)
+        yield
+
+
+@contextmanager
+def _tudo_travado():
+    # Para fotos completas: nenhuma transação fica pela metade enquanto a foto é tirada
+    with _travado(list(ESTADO_MEMORIA["jogos"]), com_fila=True):
+        with _trava:
+            yield
+
+
+@contextmanager
+def transacao(quadras=None, fila=True):
+    # quadras=None trava todas as quadras; passe só as que a requisição realmente mexe
+    # (ex: placar da quadra 2 -> transacao(quadras=[2], fila=False)).
+    precisa_compactar = False
+    armazem = _armazem
+    # A trava de escrita do armazém vem antes das travas locais: enquanto o BEGIN IMMEDIATE espera
+    # outro worker, este processo continua servindo leituras, stream e a sincronização
+    armazem.abrir_escrita()
+    try:
+        if quadras is None:
+            quadras = list(ESTADO_MEMORIA["jogos"])
+        if armazem.compartilhado:
+            # Com vários workers as escritas já são uma de cada vez (trava de escrita do armazém) e o que
+            # os outros processos gravaram pode mexer em qualquer quadra: trava tudo aqui também.
+            travas = _travado(list(ESTADO_MEMORIA["jogos"]), com_fila=True)
+        else:
+            travas = _travado(quadras, fila)
+        with travas:
+            _aplicar_pendentes()
+            t = Transacao(ESTADO_MEMORIA, quadras=set(quadras), com_fila=fila)
+            try:
+                yield t
+            finally:
+                # Mesmo se o handler falhar no meio, o que já foi aplicado precisa ser publicado.
+                # A publicação acontece ainda com as travas da transação, então duas transações que
+                # mexem na mesma coisa sempre saem na ordem em que foram aplicadas.
+                if t.ops:
+                    t.versao, precisa_compactar = _publicar(t.ops)
+    finally:
+        armazem.fechar_escrita()
+
+    if precisa_compactar:
+        _compactar_diario()
+    diario = _diario
+    if t.versao is not None and diario is not None:
+        # fsync="sempre": a resposta só sai com o delta no disco, mas a espera é fora das travas
+        diario.aguardar(t.versao)
+
+
+def _publicar(ops):
+    # Dá a próxima versão às operações já aplicadas e entrega para armazém, histórico, diário e stream
+    global _versao
+    with _trava:
+        delta = {"versao": _versao + 1, "ops": ops}
+        try:
+            _armazem.confirmar(delta, _foto)
+        except BaseException:
+            # O armazém compartilhado não aceitou: a memória local volta a ser a do armazém
+            _armazem.fechar_escrita()
+            _recarregar_do_armazem()
+            raise
+        _versao = delta["versao"]
+        _historico.append(delta)
+        precisa_compactar = _diario.registrar(delta) if _diario is not None else False
+        for assinante in list(_assinantes):
+            assinante.entregar(delta)
+        return delta["versao"], precisa_compactar
+
+
+def _aplicar_pendentes(deltas=None):
+    # Traz para a memória local o que os outros workers gravaram no armazém compartilhado.
+    # Chamado com todas as travas seguras (ou de dentro de uma escrita do armazém).
+    # `deltas` já lidos do armazém (fora das travas) servem se ainda emendam na versão local.
+    global _versao
+    if not _armazem.compartilhado:
+        return
+    if deltas is not None:
+        deltas = [delta for delta in deltas if delta["versao"] > _versao]
+        if deltas and deltas[0]["versao"] != _versao + 1:
+            deltas = None
+    if deltas is None:
+        deltas = _armazem.novos_deltas(_versao)
+    if deltas is None:
+        _recarregar_do_armazem()
+        return
+    for delta in deltas:
+        for op in delta["ops"]:
+            aplicar_operacao(ESTADO_MEMORIA, op)
+        with _trava:
+            _versao = delta["versao"]
+            _historico.append(delta)
+            for assinante in list(_assinantes):
+                assinante.entregar(delta)
+
+
+def _recarregar_do_armazem():
+    # Recomeça a réplica local a partir da foto + deltas do armazém. Quem estava no stream
+    # não tem como emendar os deltas antigos com os novos: recebe um snapshot.
+    global _versao
+    foto, deltas = _armazem.carregar()
+    with _trava:
+        if foto is not None:
+            ESTADO_MEMORIA["fila"] = foto["fila"]
+            ESTADO_MEMORIA["jogos"] = foto["jogos"]
+            _versao = foto["versao"]
+        for delta in deltas:
+            for op in delta["ops"]:
+                aplicar_operacao(ESTADO_MEMORIA, op)
+            _versao = delta["versao"]
+        _historico.clear()
+        _descartar_cache()
+        for assinante in list(_assinantes):
+            assinante.forcar_snapshot()
+
+
+def sincronizar():
+    # Leituras chamam isto antes de servir o estado: com um armazém compartilhado, confere
+    # (uma consulta barata) se algum outro worker já publicou versões novas
+    if not _armazem.compartilhado:
+        return
+    versao = _versao
+    if _armazem.versao() == versao:
+        return
+    # A leitura do armazém é feita sem as travas; com elas só se aplica o que foi lido
+    # (se outra thread já andou com a versão nesse meio tempo, _aplicar_pendentes confere de novo)
+    deltas = _armazem.novos_deltas(versao)
+    with _tudo_travado():
+        _aplicar_pendentes(deltas)
+
+
+def ligar_armazem(armazem):
+    # Passa a usar `armazem`. Num armazém compartilhado o estado que vale é o dele; se ainda estiver
+    # vazio, o estado deste processo vira o ponto de partida de todos os workers.
+    global _armazem, _parar_sincronizacao
+    desligar_armazem()
+    if armazem.compartilhado:
+        # semear() espera a trava de escrita do armazém: só a foto é tirada com as travas locais
+        armazem.semear(snapshot())
+    with _tudo_travado():
+        _armazem = armazem
+        if armazem.compartilhado:
+            _recarregar_do_armazem()
+    if armazem.compartilhado:
+        # Os deltas dos outros workers chegam nos clientes do stream deste worker mesmo sem escrita aqui
+        _parar_sincronizacao = threading.Event()
+        threading.Thread(target=_acompanhar_armazem, args=(_parar_sincronizacao,),
+                         name="sincronizacao-estado", daemon=True).start()
+    return _versao
+
+
+def _acompanhar_armazem(parar):
+    while not parar.wait(INTERVALO_SINCRONIZACAO):
+        try:
+            sincronizar()
+        except Exception:
+            pass # Armazém ocupado ou fechando: a próxima volta tenta de novo
+
+
+def desligar_armazem():
+    global _armazem, _parar_sincronizacao
+    if _parar_sincronizacao is not None:
+        _parar_sincronizacao.set()
+        _parar_sincronizacao = None
+    with _tudo_travado():
+        _armazem.fechar()
+        _armazem = ArmazemMemoria()
+
+
+def _compactar_diario():
+    # Só a cópia é feita com as travas; o snapshot vai para o disco pela thread do diário
+    with _tudo_travado():
+        if _diario is not None:
+            _diario.compactar(_foto())
+
+
+def quadras_ativas():
+    sincronizar()
+    return sorted(ESTADO_MEMORIA["jogos"])
+
+
+def primeiros_da_fila(quantidade):
+    # Leitura consistente da frente da fila (nunca pega a fila no meio de uma transação)
+    sincronizar()
+    with _trava_fila:
+        return ESTADO_MEMORIA["fila"].primeiros(quantidade)
+
+
+def ajustar_quadras(quantidade):
+    # Deixa as quadras 1..quantidade disponíveis. Quadras a mais só somem se estiverem vazias;
+    # uma quadra com jogo rolando continua até o jogo acabar (aí o comando que esvazia fecha ela).
+    atuais = list(ESTADO_MEMORIA["jogos"])
+    with transacao(quadras=set(atuais) | set(range(1, quantidade + 1)), fila=False) as t:
+        for quadra_id in range(1, quantidade + 1):
+            if quadra_id not in t.estado["jogos"]:
+                t.definir_quadra(quadra_id, None)
+        for quadra_id in atuais:
+            if quadra_id > quantidade and t.estado["jogos"].get(quadra_id) is None:
+                t.remover_quadra(quadra_id)
+    return quadras_ativas()
+
+
+def versao_atual():
+    return _versao
+
+
+def restaurar(diario):
+    # Recupera fila e quadras do diário (snapshot + cauda) e passa a registrar tudo nele
+    global _versao, _diario
+    with _tudo_travado():
+        # max(): a versão nunca anda para trás (clientes usam ela em ?desde= e no Last-Event-ID)
+        _versao = max(_versao, diario.restaurar(ESTADO_MEMORIA))
+        _historico.clear()
+        _descartar_cache()
+        _diario = diario
+        return _versao
+
+
+def desligar_diario():
+    global _diario
+    with _tudo_travado():
+        if _diario is not None:
+            _diario.fechar()
+        _diario = None
+
+
+def deltas_desde(versao):
+    # Deltas aplicados depois de `versao`, em ordem. Devolve None quando o ring buffer já
+    # descartou alguma versão necessária (ou a versão pedida não existe): aí só um snapshot resolve.
+    sincronizar()
+    return _deltas_desde(versao)
+
+
+def _deltas_desde(versao):
+    with _trava:
+        if versao == _versao:
+            return []
+        if versao < 0 or versao > _versao or not _historico:
+            return None
+        primeira = _historico[0]["versao"]
+        if primeira > versao + 1:
+            return None
+        return list(islice(_historico, versao + 1 - primeira, None))
+
+
+def estado_serializado():
+    # Corpo JSON do /estado já pronto em bytes + ETag. Só é refeito quando a versão muda,
+    # então centenas de celulares lendo o mesmo estado custam uma serialização só.
+    global _cache_serializado
+    sincronizar()
+    cache = _cache_serializado
+    if cache is not None and cache[0] == _versao:
+        return cache
+    foto = snapshot()
+    corpo = orjson.dumps(foto, option=orjson.OPT_NON_STR_KEYS)
+    etag = '"' + hashlib.blake2b(corpo, digest_size=8).hexdigest() + '"'
+    cache = (foto["versao"], corpo, etag)
+    _cache_serializado = cache
+    return cache
+
+
+def snapshot():
+    # Foto completa e independente do estado, no mesmo formato do GET /estado (+ versão)
+    with _tudo_travado():
+        return _foto()
+
+
+def _foto():
+    # Chamado com todas as travas seguras
+    return {
+        "versao": _versao,
+        "fila": ESTADO_MEMORIA["fila"].como_lista(),
+        "jogos": copy.deepcopy(ESTADO_MEMORIA["jogos"]),
+    }
+
+
+# --- Transmissão ao vivo ---
+
+class Assinante:
+    # Um cliente conectado no stream. Cada um tem sua própria fila de deltas pendentes,
+    # então um celular lento nunca segura a publicação para os outros: se ele acumular
+    # mais do que o limite, os deltas dele são descartados e ele recebe um snapshot novo.
+
+    def __init__(self, loop, limite=LIMITE_PENDENTES_POR_CLIENTE):
+        self.loop = loop
+        self.limite = limite
+        self.pendentes = deque()
+        self.precisa_snapshot = False
+        self.sinal = asyncio.Event()
+
+    def entregar(self, delta):
+        # Chamado com a _trava segura, a partir de qualquer thread
+        if self.precisa_snapshot:
+            pass
+        elif len(self.pendentes) >= self.limite:
+            self.pendentes.clear()
+            self.precisa_snapshot = True
+        else:
+            self.pendentes.append(delta)
+        try:
+            self.loop.call_soon_threadsafe(self.sinal.set)
+        except RuntimeError:
+            # O loop do cliente já foi encerrado (desconectou)
+            pass
+
+    def forcar_snapshot(self):
+        # O estado foi recarregado por inteiro: os deltas pendentes não servem mais
+        self.pendentes.clear()
+        self.precisa_snapshot = True
+        try:
+            self.loop.call_soon_threadsafe(self.sinal.set)
+        except RuntimeError:
+            pass
+
+    def ressincronizar(self):
+        # Troca tudo o que estava pendente por um snapshot coerente com a versão atual
+        with _tudo_travado():
+            self.pendentes.clear()
+            self.precisa_snapshot = False
+            return snapshot()
+
+
+def assinar(loop, limite=LIMITE_PENDENTES_POR_CLIENTE, desde=None):
+    # Registra o cliente e tira o snapshot inicial de forma atômica:
+    # todo delta publicado depois disso tem versão maior que a do snapshot.
+    # Se o cliente já conhece uma versão (reconexão) e o ring buffer ainda cobre o intervalo,
+    # ele recebe só os deltas que perdeu e o snapshot volta como None.
+    sincronizar()
+    with _tudo_travado():
+        assinante = Assinante(loop, limite)
+        _assinantes.add(assinante)
+        if desde is not None:
+            perdidos = _deltas_desde(desde)
+            if perdidos is not None and len(perdidos) <= limite:
+                assinante.pendentes.extend(perdidos)
+                return assinante, None
+        return assinante, snapshot()
+
+
+def cancelar_assinatura(assinante):
+    with _trava:
+        _assinantes.discard(assinante)
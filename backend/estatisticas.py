@@ -0,0 +1,86 @@
+from sqlalchemy import case, delete, insert, select
+import models
+from database import insert_ou_atualizar
+
+# Estatísticas por jogador (tabela estatisticas_jogadores).
+# Em vez de varrer partidas_historico + partidas a cada consulta, cada partida gravada soma a sua
+# parte no agregado de cada jogador, dentro da mesma transação (ver persistencia.gravar_resultados).
+
+CAMPOS_SOMADOS = ("partidas", "vitorias", "derrotas", "empates", "pontos_pro", "pontos_contra")
+
+
+def _novo_agregado(jogador_id):
+    agregado = dict.fromkeys(CAMPOS_SOMADOS, 0)
+    agregado["jogador_id"] = jogador_id
+    agregado["ultima_partida"] = None
+    return agregado
+
+
+def _somar(agregados, jogador_id, time, resultado, placar_a, placar_b, fim):
+    agregado = agregados.get(jogador_id)
+    if agregado is None:
+        agregado = agregados[jogador_id] = _novo_agregado(jogador_id)
+    agregado["partidas"] += 1
+    if resultado == "Vitoria":
+        agregado["vitorias"] += 1
+    elif resultado == "Derrota":
+        agregado["derrotas"] += 1
+    else:
+        agregado["empates"] += 1
+    pro, contra = (placar_a, placar_b) if time == "A" else (placar_b, placar_a)
+    agregado["pontos_pro"] += pro or 0
+    agregado["pontos_contra"] += contra or 0
+    if fim is not None and (agregado["ultima_partida"] is None or fim > agregado["ultima_partida"]):
+        agregado["ultima_partida"] = fim
+
+
+def incrementos(resultados):
+    # Soma de um lote de persistencia.ResultadoPartida, uma linha por jogador
+    agregados = {}
+    for resultado in resultados:
+        partida = resultado.partida
+        for linha in resultado.historico:
+            _somar(agregados, linha["jogador_id"], linha["time"], linha["resultado"],
+                   partida["placar_a"], partida["placar_b"], partida["fim"])
+    return list(agregados.values())
+
+
+def aplicar_incrementos(db, linhas):
+    # Um único INSERT em lote: quem ainda não tem linha é criado, quem já tem recebe a soma.
+    # Não faz commit; quem chama decide a transação.
+    if not linhas:
+        return
+    tabela = models.EstatisticaJogador.__table__
+    comando = insert_ou_atualizar(db, models.EstatisticaJogador)
+    novos = comando.excluded
+    atualizacao = {campo: tabela.c[campo] + novos[campo] for campo in CAMPOS_SOMADOS}
+    atualizacao["ultima_partida"] = case(
+        (tabela.c.ultima_partida.is_(None), novos.ultima_partida),
+        (novos.ultima_partida > tabela.c.ultima_partida, novos.ultima_partida),
+        else_=tabela.c.ultima_partida,
+    )
+    db.execute(comando.on_conflict_do_update(index_elements=[tabela.c.jogador_id], set_=atualizacao), linhas)
+
+
+def atualizar(db, resultados):
+    aplicar_incrementos(db, incrementos(resultados))
+
+
+def recalcular(db, lote=1000):
+    # Refaz a tabela inteira a partir do histórico numa passada só: as linhas chegam do banco
+    # em blocos (sem carregar o histórico todo na memória) e só o agregado por jogador fica guardado.
+    consulta = (
+        select(models.PartidaHistorico.jogador_id, models.PartidaHistorico.time, models.PartidaHistorico.resultado,
+               models.Partida.placar_a, models.Partida.placar_b, models.Partida.fim)
+        .join(models.Partida, models.Partida.id == models.PartidaHistorico.partida_id)
+        .execution_options(yield_per=lote)
+    )
+    agregados = {}
+    for linha in db.execute(consulta):
+        _somar(agregados, *linha)
+
+    db.execute(delete(models.EstatisticaJogador))
+    if agregados:
+        db.execute(insert(models.EstatisticaJogador), list(agregados.values()))
+    db.commit()
+    return len(agregados)
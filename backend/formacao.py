@@ -0,0 +1,167 @@
+import random
+import time
+from itertools import combinations
+import ranking
+
+# Montagem dos times de uma partida nova.
+# Regra de sempre: as mulheres são divididas entre os dois times (no máximo uma de diferença).
+# Dentro dessa regra, procura a divisão com a menor diferença de rating entre os times.
+# - Até TAMANHO_BUSCA_EXATA jogadores por time: testa todas as divisões (462 com 6 x 6).
+# - Acima disso: divisão gulosa + trocas que melhoram, até acabar o orçamento de tempo.
+# Os selecionados são embaralhados antes (a regra de quebrar panelinhas): entre divisões igualmente
+# equilibradas, a escolhida muda de uma partida para outra.
+# Com `repeticoes` (convivencia.MATRIZ.entre), cada dupla que já jogou junta na sessão soma PESO_REPETICAO
+# pontos de rating ao custo da divisão por vez que se repetiria. Só o "mesmo time" entra na conta: com
+# os jogadores já escolhidos, todo par que não fica junto fica em times opostos.
+
+TAMANHO_BUSCA_EXATA = 6
+ORCAMENTO_PADRAO = 0.003 # segundos
+PESO_REPETICAO = 40.0 # pontos de diferença de rating que valem uma dupla repetida
+PESO_ADVERSARIO = 0.5 # na entrada dos desafiantes: enfrentar de novo pesa metade de jogar junto de novo
+
+
+def _respeita_sexo(mulheres_a, total_mulheres):
+    return abs(2 * mulheres_a - total_mulheres) <= 1
+
+
+def _busca_exata(ids, ratings, mulher, repetidas, tamanho_time, limite):
+    total = sum(ratings)
+    total_mulheres = sum(mulher)
+    indices = range(1, len(ids))
+    # Duplas repetidas dentro dos dois times = dentro de A + dentro de B = total - (linhas de A) + 2 * (dentro de A),
+    # então basta olhar os pares do time A
+    vezes = [[0] * len(ids) for _ in ids]
+    for (i, j), quantidade in repetidas.items():
+        vezes[i][j] = vezes[j][i] = quantidade
+    linha = [sum(v) for v in vezes]
+    total_repetidas = sum(repetidas.values())
+    melhor, melhor_custo = None, None
+    # O primeiro jogador fica sempre no time A: metade das combinações são só os times trocados
+    for verificadas, resto in enumerate(combinations(indices, tamanho_time - 1)):
+        time_a = (0,) + resto
+        if not _respeita_sexo(sum(mulher[i] for i in time_a), total_mulheres):
+            continue
+        custo = abs(total - 2 * sum(ratings[i] for i in time_a))
+        if repetidas and (melhor_custo is None or custo < melhor_custo):
+            # Só conta as duplas quando a diferença de rating sozinha ainda pode ganhar da melhor
+            dentro_a = sum(vezes[i][j] for i, j in combinations(time_a, 2))
+            custo += PESO_REPETICAO * (total_repetidas - sum(linha[i] for i in time_a) + 2 * dentro_a)
+        if melhor_custo is None or custo < melhor_custo:
+            melhor, melhor_custo = time_a, custo
+            if custo == 0:
+                break
+        if verificadas % 64 == 0 and time.perf_counter() > limite and melhor is not None:
+            break
+    return melhor
+
+
+def _busca_heuristica(ids, ratings, mulher, repetidas, tamanho_time, limite):
+    # 1. Ponto de partida: mulheres primeiro, alternando entre os times, depois os homens; cada grupo
+    #    do maior rating para o menor, indo para o time mais fraco (entre os que podem receber)
+    ordem = sorted(range(len(ids)), key=lambda i: (not mulher[i], -ratings[i]))
+    time_a, time_b = [], []
+    soma_a = soma_b = 0.0
+    mulheres_a = mulheres_b = 0
+    for i in ordem:
+        if len(time_a) >= tamanho_time:
+            para_a = False
+        elif len(time_b) >= tamanho_time:
+            para_a = True
+        elif mulher[i] and mulheres_a != mulheres_b:
+            para_a = mulheres_a < mulheres_b
+        else:
+            para_a = soma_a <= soma_b
+        if para_a:
+            time_a.append(i)
+            soma_a += ratings[i]
+            mulheres_a += mulher[i]
+        else:
+            time_b.append(i)
+            soma_b += ratings[i]
+            mulheres_b += mulher[i]
+
+    # 2. Trocas entre os times (só do mesmo sexo, para manter a divisão das mulheres) enquanto melhorar.
+    #    vezes[i][j]: quantas vezes i e j já jogaram juntos (matriz densa só dos 2 * tamanho_time daqui)
+    vezes = [[0] * len(ids) for _ in ids]
+    for (i, j), quantidade in repetidas.items():
+        vezes[i][j] = vezes[j][i] = quantidade
+
+    def custo_dupla(i, time_):
+        return sum(vezes[i][k] for k in time_)
+
+    melhorou = True
+    while melhorou and time.perf_counter() < limite:
+        melhorou = False
+        diferenca = soma_a - soma_b
+        melhor_troca, melhor_ganho = None, 0.0
+        for posicao_a, i in enumerate(time_a):
+            for posicao_b, j in enumerate(time_b):
+                if mulher[i] != mulher[j]:
+                    continue
+                ganho = abs(diferenca) - abs(diferenca - 2 * (ratings[i] - ratings[j]))
+                if repetidas:
+                    # i vai para o time B e j para o A: saem as duplas antigas de cada um, entram as novas
+                    antes = custo_dupla(i, time_a) + custo_dupla(j, time_b)
+                    depois = custo_dupla(i, time_b) - vezes[i][j] + custo_dupla(j, time_a) - vezes[j][i]
+                    ganho += PESO_REPETICAO * (antes - depois)
+                if ganho > melhor_ganho + 1e-9:
+                    melhor_troca, melhor_ganho = (posicao_a, posicao_b), ganho
+        if melhor_troca is not None:
+            posicao_a, posicao_b = melhor_troca
+            i, j = time_a[posicao_a], time_b[posicao_b]
+            time_a[posicao_a], time_b[posicao_b] = j, i
+            soma_a += ratings[j] - ratings[i]
+            soma_b += ratings[i] - ratings[j]
+            melhorou = True
+    return tuple(time_a)
+
+
+def montar_times(selecionados, ratings, sexos, tamanho_time, repeticoes=None, orcamento=ORCAMENTO_PADRAO, sorteio=random):
+    # selecionados: ids (2 * tamanho_time); ratings: {id: rating} (faltando = rating inicial);
+    # sexos: {id: 'M'/'F'} (faltando = 'M'); repeticoes: {(id, id): [mesmo time, times opostos]}.
+    # Devolve (time_a, time_b) como listas de ids.
+    limite = time.perf_counter() + orcamento
+    ids = list(selecionados)
+    sorteio.shuffle(ids)
+    valores = [float(ratings.get(i, ranking.RATING_INICIAL)) for i in ids]
+    mulher = [sexos.get(i) == 'F' for i in ids]
+    posicao = {jogador_id: i for i, jogador_id in enumerate(ids)}
+    repetidas = {}
+    for (a, b), (companheiros, _) in (repeticoes or {}).items():
+        if companheiros and a in posicao and b in posicao:
+            repetidas[(posicao[a], posicao[b])] = companheiros
+
+    if tamanho_time <= TAMANHO_BUSCA_EXATA:
+        escolhidos = _busca_exata(ids, valores, mulher, repetidas, tamanho_time, limite)
+    else:
+        escolhidos = _busca_heuristica(ids, valores, mulher, repetidas, tamanho_time, limite)
+
+    no_time_a = set(escolhidos)
+    time_a = [ids[i] for i in range(len(ids)) if i in no_time_a]
+    time_b = [ids[i] for i in range(len(ids)) if i not in no_time_a]
+    return time_a, time_b
+
+
+def escolher_desafiantes(candidatos, quantidade, vencedores, repeticoes=None):
+    # Entrada dos desafiantes depois de uma vitória: escolhe `quantidade` entre os `candidatos` (a frente
+    # da fila, em ordem) repetindo o mínimo de duplas, seja entre eles (mesmo time) seja contra os
+    # vencedores que ficam (times opostos). O primeiro da fila sempre entra e, no empate, ganha quem está
+    # mais na frente; quem fica de fora continua no começo da fila e entra na próxima.
+    candidatos = list(candidatos)
+    if not repeticoes or len(candidatos) <= quantidade:
+        return candidatos[:quantidade]
+
+    def vezes(a, b, posicao):
+        contagem = repeticoes.get((a, b) if a < b else (b, a))
+        return contagem[posicao] if contagem else 0
+
+    melhor, melhor_custo = None, None
+    for resto in combinations(candidatos[1:], quantidade - 1):
+        escolhidos = (candidatos[0],) + resto
+        custo = sum(vezes(a, b, 0) for a, b in combinations(escolhidos, 2))
+        custo += PESO_ADVERSARIO * sum(vezes(a, b, 1) for a in escolhidos for b in vencedores)
+        if melhor_custo is None or custo < melhor_custo:
+            melhor, melhor_custo = escolhidos, custo
+            if custo == 0:
+                break
+    return list(melhor)
@@ -0,0 +1,88 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import select, tuple_
+import models
+
+# Histórico de partidas paginado por cursor (keyset), das mais recentes para as mais antigas.
+# A página seguinte começa logo depois da última (inicio, id) entregue, usando o índice
+# ix_partidas_inicio_id: o custo de uma página não depende de quantas partidas existem nem de quão
+# fundo no histórico ela está (um OFFSET teria que pular todas as linhas anteriores).
+# Os participantes da página inteira vêm numa consulta só (nada de carregar jogador por jogador).
+# Nas partidas de um jogador o custo acompanha o histórico daquele jogador (as partidas dele são
+# ordenadas a cada página), não o tamanho da tabela.
+
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 200
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(inicio, partida_id):
+    dados = json.dumps([inicio.isoformat(), partida_id]).encode()
+    return base64.urlsafe_b64encode(dados).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    try:
+        dados = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        inicio, partida_id = json.loads(dados)
+        return datetime.fromisoformat(inicio), str(partida_id)
+    except (ValueError, TypeError) as erro:
+        raise CursorInvalido("Cursor inválido.") from erro
+
+
+def _participantes(db, partida_ids):
+    # {partida_id: [participantes]} de todas as partidas da página, com o nome de cada jogador
+    por_partida = {partida_id: [] for partida_id in partida_ids}
+    if not partida_ids:
+        return por_partida
+    consulta = (
+        select(models.PartidaHistorico.partida_id, models.PartidaHistorico.jogador_id, models.Jogador.nome,
+               models.PartidaHistorico.time, models.PartidaHistorico.resultado)
+        .outerjoin(models.Jogador, models.Jogador.id == models.PartidaHistorico.jogador_id)
+        .where(models.PartidaHistorico.partida_id.in_(partida_ids))
+        .order_by(models.PartidaHistorico.partida_id, models.PartidaHistorico.time)
+    )
+    for partida_id, jogador_id, nome, time_, resultado in db.execute(consulta):
+        por_partida[partida_id].append({"jogador_id": jogador_id, "nome": nome, "time": time_, "resultado": resultado})
+    return por_partida
+
+
+def pagina(db, limite=LIMITE_PADRAO, cursor=None, quadra_id=None, jogador_id=None):
+    # Devolve {"partidas": [...], "proximo_cursor": str ou None}
+    partida = models.Partida
+    consulta = select(partida)
+    if jogador_id is not None:
+        consulta = consulta.join(models.PartidaHistorico, models.PartidaHistorico.partida_id == partida.id).where(
+            models.PartidaHistorico.jogador_id == jogador_id)
+    if quadra_id is not None:
+        consulta = consulta.where(partida.quadra_id == quadra_id)
+    if cursor is not None:
+        inicio, partida_id = decodificar_cursor(cursor)
+        # Comparação de tupla (row value): o SQLite usa o índice para começar direto no cursor.
+        # Escrita como "inicio < x OR (inicio = x AND id < y)" ela vira uma varredura.
+        consulta = consulta.where(tuple_(partida.inicio, partida.id) < tuple_(inicio, partida_id))
+    # Um a mais que o limite: se vier, existe uma próxima página
+    consulta = consulta.order_by(partida.inicio.desc(), partida.id.desc()).limit(limite + 1)
+
+    linhas = db.execute(consulta).scalars().all()
+    tem_proxima = len(linhas) > limite
+    linhas = linhas[:limite]
+    participantes = _participantes(db, [linha.id for linha in linhas])
+
+    partidas = [{
+        "id": linha.id,
+        "quadra_id": linha.quadra_id,
+        "inicio": linha.inicio,
+        "fim": linha.fim,
+        "placar_a": linha.placar_a,
+        "placar_b": linha.placar_b,
+        "vencedor": linha.vencedor,
+        "motivo_fim": linha.motivo_fim,
+        "participantes": participantes[linha.id],
+    } for linha in linhas]
+    proximo = codificar_cursor(linhas[-1].inicio, linhas[-1].id) if tem_proxima else None
+    return {"partidas": partidas, "proximo_cursor": proximo}
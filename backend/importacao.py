@@ -0,0 +1,176 @@
+import codecs
+import csv
+import json
+from collections import deque
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+import models
+import schemas
+import elenco
+import avatares
+
+# Importação de jogadores em massa (POST /jogadores/importar), em CSV ou NDJSON.
+# O corpo é lido em pedaços conforme chega: cada linha é validada com o schemas.JogadorImportado (o mesmo
+# JogadorCreate do POST /jogadores, mais os campos do backup) e as válidas são gravadas em blocos de LOTE
+# (um INSERT em lote e um commit por bloco). Linha com problema não derruba a importação: vai para a
+# lista de erros com o número da linha.
+# Uma linha por jogador: o CSV precisa de cabeçalho (nome,sexo,whatsapp,avatar e, opcionalmente, id,
+# is_ativo, is_presente e created_at, para restaurar um backup do GET /jogadores/exportar sem mudar os ids
+# que o histórico usa nem quem estava inativo ou presente).
+
+LOTE = 500
+LIMITE_ERROS = 1000 # Depois disso os erros só são contados
+
+
+async def linhas(pedacos):
+    # Texto linha a linha a partir dos bytes do corpo (um caractere UTF-8 pode vir partido entre dois pedaços)
+    decodificador = codecs.getincrementaldecoder("utf-8-sig")()
+    resto = ""
+    async for pedaco in pedacos:
+        resto += decodificador.decode(pedaco)
+        *completas, resto = resto.split("\n")
+        for linha in completas:
+            yield linha.rstrip("\r")
+    resto += decodificador.decode(b"", final=True)
+    if resto.strip():
+        yield resto.rstrip("\r")
+
+
+class _FonteCsv:
+    # O que o csv.reader lê: as linhas de registros já completos, entregues por registros_csv
+    # (acabar aqui não encerra o leitor; o próximo next() volta a ler o que entrar depois)
+    def __init__(self):
+        self.linhas = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.linhas:
+            raise StopIteration
+        return self.linhas.popleft()
+
+
+async def registros_csv(linhas_texto):
+    # (número da linha, dict da linha ou mensagem de erro); a linha 1 é o cabeçalho.
+    # Um csv.reader só para o arquivo inteiro: um campo entre aspas pode ter quebra de linha (RFC 4180),
+    # então as linhas só vão para o leitor quando as aspas abertas fecharem, e o número que sai é o da
+    # linha em que o registro começa.
+    fonte = _FonteCsv()
+    leitor = csv.reader(fonte)
+    numeros = deque() # Número de cada linha que está em `fonte`
+    cabecalho = None
+    numero = 0
+    aspas = 0
+    async for linha in linhas_texto:
+        numero += 1
+        if not numeros and not linha.strip():
+            continue
+        fonte.linhas.append(linha + "\n")
+        numeros.append(numero)
+        aspas += linha.count('"')
+        if aspas % 2:
+            continue
+        aspas = 0
+        while fonte.linhas:
+            inicio = numeros[0]
+            campos = next(leitor)
+            while len(numeros) > len(fonte.linhas):
+                numeros.popleft()
+            if not campos:
+                continue
+            if cabecalho is None:
+                cabecalho = [campo.strip() for campo in campos]
+                continue
+            if len(campos) != len(cabecalho):
+                yield inicio, f"Esperava {len(cabecalho)} colunas, veio {len(campos)}."
+                continue
+            # Célula vazia no CSV é campo ausente (whatsapp/avatar são opcionais)
+            yield inicio, {chave: valor for chave, valor in zip(cabecalho, campos) if valor != ""}
+    if numeros:
+        yield numeros[0], "Aspas abertas sem fechar até o fim do arquivo."
+
+
+async def registros_ndjson(linhas_texto):
+    numero = 0
+    async for linha in linhas_texto:
+        numero += 1
+        if not linha.strip():
+            continue
+        try:
+            dados = json.loads(linha)
+        except ValueError:
+            yield numero, "JSON inválido."
+            continue
+        if not isinstance(dados, dict):
+            yield numero, "Cada linha precisa ser um objeto JSON."
+            continue
+        yield numero, dados
+
+
+def _mensagem(erro: ValidationError):
+    return "; ".join(f"{'.'.join(str(parte) for parte in item['loc'])}: {item['msg']}" for item in erro.errors())
+
+
+class Relatorio:
+    def __init__(self):
+        self.importados = 0
+        self.total_erros = 0
+        self.erros = []
+
+    def erro(self, numero, mensagem):
+        self.total_erros += 1
+        if len(self.erros) < LIMITE_ERROS:
+            self.erros.append({"linha": numero, "erro": mensagem})
+
+    def como_dict(self):
+        # Os ids repetidos só são conferidos na gravação do bloco: ordena para o relatório seguir o arquivo
+        erros = sorted(self.erros, key=lambda erro: erro["linha"])
+        return {"importados": self.importados, "total_erros": self.total_erros, "erros": erros}
+
+
+async def _gravar(db, bloco, relatorio):
+    # Ids que já existem (ou repetidos no próprio arquivo) viram erro da linha, não do bloco inteiro
+    existentes = set(await db.scalars(select(models.Jogador.id).where(models.Jogador.id.in_([linha["id"] for _, linha in bloco]))))
+    novas = []
+    for numero, linha in bloco:
+        if linha["id"] in existentes:
+            relatorio.erro(numero, f"Já existe um jogador com o id {linha['id']}.")
+            continue
+        try:
+            # Como no POST /jogadores: imagem em data URL vai para /avatares e no jogador fica a URL
+            linha["avatar"] = await avatares.normalizar(db, linha["avatar"])
+        except avatares.AvatarInvalido as erro:
+            relatorio.erro(numero, str(erro))
+            continue
+        existentes.add(linha["id"])
+        novas.append(linha)
+    if novas:
+        await db.execute(insert(models.Jogador), novas)
+        await db.execute(elenco.incremento(db))
+    await db.commit()
+    relatorio.importados += len(novas)
+
+
+async def importar(db, registros, lote=None):
+    lote = lote or LOTE
+    relatorio = Relatorio()
+    bloco = []
+    async for numero, dados in registros:
+        if isinstance(dados, str):
+            relatorio.erro(numero, dados)
+            continue
+        try:
+            jogador = schemas.JogadorImportado.model_validate(dados)
+        except ValidationError as erro:
+            relatorio.erro(numero, _mensagem(erro))
+            continue
+        linha = jogador.model_dump()
+        linha["id"] = str(dados.get("id") or models.generate_uuid())
+        bloco.append((numero, linha))
+        if len(bloco) >= lote:
+            await _gravar(db, bloco, relatorio)
+            bloco = []
+    if bloco:
+        await _gravar(db, bloco, relatorio)
+    return relatorio.como_dict()
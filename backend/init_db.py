@@ -1,7 +1,7 @@
 # backend/init_db.py
-from database import engine, Base
-import models
+from database import engine
+import migracoes
 
-# Isso diz ao SQLAlchemy para ler as classes e criar o arquivo .db fisicamente
-Base.metadata.create_all(bind=engine)
-print("Banco de dados criado com sucesso!")
\ No newline at end of file
+# Cria o arquivo .db (ou leva um banco existente até a versão atual do esquema, ver migracoes.py)
+passos = migracoes.migrar(engine)
+print(f"Banco de dados pronto na versão {migracoes.VERSAO_ATUAL} do esquema ({passos} passo(s) aplicado(s))!")
@@ -1,20 +1,83 @@
 # backend/main.py
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy import case, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 import models
-from database import SessionLocal, engine
+from database import SessionLocal, SessionAsync, engine, engine_async
 import schemas
-from pydantic import BaseModel
-import random
-from datetime import datetime, timezone
-import random
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Annotated, Literal, Optional
+from datetime import datetime
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+from contextlib import asynccontextmanager
+import estado
+from estado import ESTADO_MEMORIA
+import configuracoes
+from configuracoes import CACHE_CONFIGURACOES
+import persistencia
+import diario
+import armazem
+import ranking
+import formacao
+import convivencia
+import historico
+import importacao
+import exportacao
+import elenco
+import avatares
+import comandos
+import respostas
+import metricas
+import migracoes
+import logging
+
+logger = logging.getLogger("voleiflow")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Esquema do banco: com o carimbo em dia é uma consulta só; senão roda os passos que faltam
+    # (também cria tudo caso o arquivo .db seja deletado acidentalmente)
+    passos = migracoes.migrar(engine)
+    if passos:
+        logger.info("Banco migrado até a versão %d do esquema (%d passo(s))", migracoes.VERSAO_ATUAL, passos)
+
+    # Carrega as configurações uma única vez; depois disso as partidas não consultam mais o banco para isso
+    CACHE_CONFIGURACOES.carregar()
+    persistencia.GRAVADOR.iniciar()
+
+    armazem_estado = armazem.armazem_do_ambiente()
+    if armazem_estado.compartilhado:
+        # Vários workers: fila e quadras ficam no armazém compartilhado (que já sobrevive a reinícios)
+        versao = estado.ligar_armazem(armazem_estado)
+        CACHE_CONFIGURACOES.compartilhado = True # POST /configuracoes num worker chega nos outros
+        logger.info("Estado compartilhado ligado na versão %d", versao)
+    else:
+        # Recupera a fila e as quadras de antes de um reinício (ninguém perde o lugar na fila)
+        diario_estado = diario.diario_do_ambiente()
+        if diario_estado is not None:
+            versao = estado.restaurar(diario_estado)
+            logger.info("Estado restaurado do diário na versão %d", versao)
+
+    # Quem jogou com quem nas últimas horas (se a API reiniciar no meio da noite, as panelinhas continuam contadas)
+    convivencia.MATRIZ.carregar()
+
+    # Abre (ou fecha) quadras conforme a configuração QuantidadeQuadras
+    estado.ajustar_quadras(CACHE_CONFIGURACOES.atual().quantidade_quadras)
+
+    yield
 
-# Garante que as tabelas existam (útil caso o arquivo .db seja deletado acidentalmente)
-models.Base.metadata.create_all(bind=engine)
+    # Shutdown: só sai depois que todos os resultados pendentes chegaram no banco
+    persistencia.GRAVADOR.parar()
+    estado.desligar_diario()
+    estado.desligar_armazem()
+    CACHE_CONFIGURACOES.compartilhado = False
+    await engine_async.dispose()
 
-app = FastAPI(title="VôleiFlow API", version="2.0")
+app = FastAPI(title="VôleiFlow API", version="2.0", lifespan=lifespan)
 
 # --- ADICIONE ESTE BLOCO CORS ---
 app.add_middleware(
@@ -26,14 +89,25 @@ app.add_middleware(
 )
 # --------------------------------
 
-# A nossa variável global que todos os dispositivos vão enxergar
-ESTADO_MEMORIA = {
-    "fila": [], # Guardará apenas as strings dos IDs dos jogadores
-    "jogos": {
-        1: None,
-        2: None
-    }
-}
+# Por fora de tudo (inclusive do CORS): o tempo medido é o da requisição inteira
+app.add_middleware(metricas.MiddlewareMetricas)
+metricas.ligar_banco(engine)
+metricas.ligar_banco(engine_async.sync_engine)
+
+@app.exception_handler(comandos.ComandoInvalido)
+async def tratar_comando_invalido(request: Request, erro: comandos.ComandoInvalido):
+    # Regra de negócio violada dentro de uma transação: mesmo formato do HTTPException(400)
+    return JSONResponse(status_code=400, content={"detail": str(erro)})
+
+@app.exception_handler(avatares.AvatarInvalido)
+@app.exception_handler(elenco.CampoInvalido)
+async def tratar_valor_invalido(request: Request, erro: ValueError):
+    return JSONResponse(status_code=400, content={"detail": str(erro)})
+
+# O ESTADO_MEMORIA (fila + quadras) agora mora no módulo estado.py.
+# Toda alteração passa por estado.transacao(), que gera a versão e os deltas do stream ao vivo.
+# Cada transação trava só as quadras que mexe (e a fila, se precisar), e a validação acontece
+# lá dentro (comandos.py): nada de ler o estado fora da trava e decidir em cima de uma foto velha.
 
 # Molde simples para receber o ID de quem quer entrar na fila
 
@@ -43,19 +117,92 @@ class FilaAcaoRequest(BaseModel):
 # --- Adicione estas rotas lá no final do arquivo ---
 
 @app.get("/estado")
-def obter_estado():
-    # Qualquer dispositivo pode bater aqui para saber como está a quadra agora
-    return ESTADO_MEMORIA
+def obter_estado(request: Request, desde: Optional[int] = None):
+    # Qualquer dispositivo pode bater aqui para saber como está a quadra agora.
+    # Com ?desde=<versao> devolve só as operações aplicadas depois daquela versão
+    # (ou o snapshot completo, se o histórico em memória já não cobre esse intervalo).
+    if desde is not None:
+        deltas = estado.deltas_desde(desde)
+        if deltas is not None:
+            return respostas.RespostaJSON({"versao": deltas[-1]["versao"] if deltas else desde, "deltas": deltas})
+
+    # Corpo pré-serializado e reaproveitado enquanto a versão não muda
+    versao, corpo, etag = estado.estado_serializado()
+    cabecalhos = {"ETag": etag, "X-Estado-Versao": str(versao), "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cabecalhos)
+    return Response(content=corpo, media_type="application/json", headers=cabecalhos)
+
+# Intervalo do "ping" que mantém a conexão aberta em proxies e redes de celular
+INTERVALO_KEEPALIVE = 15
+
+# Eventos já formatados por (evento, versão): o mesmo delta vai para todos os celulares conectados
+# e é serializado uma vez só, não uma vez por assinante
+_eventos_sse = {}
+LIMITE_EVENTOS_SSE = 256
+
+def _evento_sse(evento, dados):
+    # O id é a versão: numa reconexão o navegador manda de volta o Last-Event-ID
+    chave = (evento, dados["versao"])
+    texto = _eventos_sse.get(chave)
+    if texto is None:
+        if len(_eventos_sse) >= LIMITE_EVENTOS_SSE:
+            _eventos_sse.clear()
+        texto = f"id: {dados['versao']}\nevent: {evento}\ndata: {respostas.dumps(dados).decode()}\n\n"
+        _eventos_sse[chave] = texto
+    return texto
+
+@app.get("/estado/stream")
+async def stream_estado(request: Request):
+    # Em vez de cada celular ficar batendo no /estado, ele abre uma conexão só (Server-Sent Events):
+    # recebe um snapshot completo ao conectar e depois apenas os deltas versionados
+    ultima_versao = request.headers.get("last-event-id")
+    desde = int(ultima_versao) if ultima_versao and ultima_versao.isdigit() else None
+    # assinar() e ressincronizar() pegam as travas do estado (e, com o armazém compartilhado, consultam
+    # o SQLite): no threadpool, para uma transação demorada não parar o event loop e os outros clientes
+    assinante, inicial = await run_in_threadpool(estado.assinar, asyncio.get_running_loop(), desde=desde)
+
+    async def gerar():
+        try:
+            if inicial is not None:
+                yield _evento_sse("snapshot", inicial)
+            while not await request.is_disconnected():
+                if assinante.precisa_snapshot:
+                    # Cliente ficou para trás: descarta os deltas dele e manda a foto atual
+                    yield _evento_sse("snapshot", await run_in_threadpool(assinante.ressincronizar))
+                    continue
+                if assinante.pendentes:
+                    yield _evento_sse("delta", assinante.pendentes.popleft())
+                    continue
+                assinante.sinal.clear()
+                if assinante.pendentes or assinante.precisa_snapshot:
+                    continue
+                try:
+                    await asyncio.wait_for(assinante.sinal.wait(), timeout=INTERVALO_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+        finally:
+            estado.cancelar_assinatura(assinante)
+
+    return StreamingResponse(gerar(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no", # Impede o nginx de segurar os eventos em buffer
+    })
+
+# As mutações de fila e quadras respondem pelo caminho rápido (respostas.py). Com o cabeçalho
+# "Prefer: return=minimal" devolvem só {"ok": true, "versao": n}, sem copiar a fila nem a quadra.
 
 @app.post("/fila/entrar")
-def entrar_na_fila(requisicao: FilaAcaoRequest):
-    jogador_id = requisicao.jogador_id
-    
-    # Regra de Negócio: Não deixa entrar duplicado
-    if jogador_id not in ESTADO_MEMORIA["fila"]:
-        ESTADO_MEMORIA["fila"].append(jogador_id)
-        
-    return {"mensagem": "Adicionado com sucesso", "fila": ESTADO_MEMORIA["fila"]}
+def entrar_na_fila(requisicao: FilaAcaoRequest, prefer: Annotated[Optional[str], Header()] = None):
+    compacta = respostas.quer_compacta(prefer)
+    with estado.transacao(quadras=[]) as t:
+        comandos.entrar_na_fila(t, requisicao.jogador_id)
+        # A fila devolvida é a desta transação, não a de uma requisição vizinha
+        fila = None if compacta else t.fila.como_lista()
+
+    if compacta:
+        return respostas.confirmacao(t)
+    return respostas.RespostaJSON({"mensagem": "Adicionado com sucesso", "fila": fila})
 
 # Nossa função 'recepcionista' para gerenciar a sessão do banco
 def get_db():
@@ -65,21 +212,45 @@ def get_db():
     finally:
         db.close()
 
+# A mesma recepcionista para os endpoints async (cadastros, estatísticas, histórico, ranking):
+# enquanto esperam o banco, o event loop atende outras requisições, sem o limite de threads do threadpool
+async def get_db_async():
+    async with SessionAsync() as db:
+        yield db
+
 @app.get("/")
 def read_root():
     return {"status": "Online", "app": "VôleiFlow 2.0"}
 
+@app.get("/saude")
+def saude():
+    # Mostra se o gravador em segundo plano está conseguindo acompanhar as partidas
+    gravacao = persistencia.GRAVADOR.saude()
+    status = "Online" if gravacao["falhas"] == 0 and gravacao["ultimo_erro"] is None else "Degradado"
+    return {"status": status, "gravacao": gravacao}
+
+@app.get("/metrics", include_in_schema=False)
+def obter_metricas():
+    # Formato texto do Prometheus (latência por rota, consultas ao banco, fila e quadras)
+    return Response(metricas.METRICAS.exportar(), media_type=metricas.TIPO_CONTEUDO)
+
 # Nossa nova rota conectada ao banco de dados
 @app.get("/configuracoes")
-def listar_configuracoes(db: Session = Depends(get_db)):
-    # Faz uma query (consulta) pedindo todos os registros da tabela Configuracao
-    configuracoes = db.query(models.Configuracao).all()
-    return configuracoes
+def listar_configuracoes():
+    # Servido direto do cache em memória (sem ir ao banco)
+    return CACHE_CONFIGURACOES.atual().como_lista()
+
+@app.post("/configuracoes/recarregar")
+def recarregar_configuracoes():
+    # Para quando alguém altera a tabela configuracoes direto no banco, por fora da API
+    config = CACHE_CONFIGURACOES.recarregar()
+    estado.ajustar_quadras(config.quantidade_quadras)
+    return config.como_lista()
 
 @app.post("/configuracoes", response_model=schemas.ConfiguracaoResponse)
-def criar_ou_atualizar_configuracao(config: schemas.ConfiguracaoCreate, db: Session = Depends(get_db)):
+async def criar_ou_atualizar_configuracao(config: schemas.ConfiguracaoCreate, db: AsyncSession = Depends(get_db_async)):
     # Busca se a configuração já existe no banco
-    db_config = db.query(models.Configuracao).filter(models.Configuracao.chave == config.chave).first()
+    db_config = await db.get(models.Configuracao, config.chave)
     
     if db_config:
         # Atualiza se existir
@@ -88,149 +259,357 @@ def criar_ou_atualizar_configuracao(config: schemas.ConfiguracaoCreate, db: Sess
         # Cria nova se não existir
         db_config = models.Configuracao(chave=config.chave, valor=config.valor)
         db.add(db_config)
+    await db.execute(configuracoes.incremento(db)) # Os outros workers veem a mudança (CacheConfiguracoes)
     
-    db.commit() # Salva no banco
-    db.refresh(db_config) # Atualiza a variável com os dados do banco
+    await db.commit() # Salva no banco
+    await db.refresh(db_config) # Atualiza a variável com os dados do banco
+    CACHE_CONFIGURACOES.definir(db_config.chave, db_config.valor) # Write-through no cache
+    if db_config.chave == "QuantidadeQuadras":
+        # Trava todas as quadras (e, com o armazém compartilhado, espera o SQLite): fora do event loop
+        await run_in_threadpool(estado.ajustar_quadras, db_config.valor)
     return db_config
 
 @app.post("/jogadores", response_model=schemas.JogadorResponse)
-def criar_jogador(jogador: schemas.JogadorCreate, db: Session = Depends(get_db)):
+async def criar_jogador(jogador: schemas.JogadorCreate, db: AsyncSession = Depends(get_db_async)):
     # Transforma o molde do Pydantic no modelo do SQLAlchemy
     db_jogador = models.Jogador(
         nome=jogador.nome,
         whatsapp=jogador.whatsapp,
         sexo=jogador.sexo,
-        avatar=jogador.avatar
+        avatar=await avatares.normalizar(db, jogador.avatar) # Imagem vai para /avatares; no jogador fica a URL
     )
     db.add(db_jogador)
-    db.commit()
-    db.refresh(db_jogador)
+    await db.execute(elenco.incremento(db))
+    await db.commit()
+    await db.refresh(db_jogador)
     return db_jogador
 
 # O response_model como list[] garante que o FastAPI vai devolver um Array JSON
 @app.get("/jogadores", response_model=list[schemas.JogadorResponse])
-def listar_jogadores_ativos(db: Session = Depends(get_db)):
-    # Busca todos onde is_ativo é Verdadeiro
-    jogadores = db.query(models.Jogador).filter(models.Jogador.is_ativo == True).all()
-    return jogadores
+async def listar_jogadores_ativos(db: AsyncSession = Depends(get_db_async)):
+    # Busca todos onde is_ativo é Verdadeiro, na ordem de cadastro (explícita: o Postgres não garante ordem sem ORDER BY)
+    jogadores = await db.scalars(select(models.Jogador).where(models.Jogador.is_ativo == True)
+                                 .order_by(models.Jogador.created_at, models.Jogador.id))
+    return jogadores.all()
+
+@app.get("/jogadores/elenco")
+async def obter_elenco(request: Request, campos: Optional[str] = None, db: AsyncSession = Depends(get_db_async)):
+    # Jogadores ativos só com os campos pedidos (?campos=nome,sexo; o id sempre vem), em colunas:
+    # {"versao", "campos": [...], "jogadores": [[...], ...]}. Com If-None-Match igual, 304 sem corpo.
+    versao, corpo, etag = await elenco.serializado(db, elenco.campos_pedidos(campos))
+    cabecalhos = {"ETag": etag, "X-Elenco-Versao": str(versao), "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cabecalhos)
+    return Response(content=corpo, media_type="application/json", headers=cabecalhos)
+
+@app.post("/avatares", status_code=201)
+async def enviar_avatar(request: Request, db: AsyncSession = Depends(get_db_async)):
+    # Corpo = a imagem crua (Content-Type image/png, image/jpeg, ...). Devolve a URL para usar no avatar do jogador.
+    tipo = request.headers.get("content-type", "").split(";")[0].strip()
+    hash_ = await avatares.guardar(db, await request.body(), tipo)
+    await db.commit()
+    return {"hash": hash_, "url": avatares.url(hash_)}
+
+@app.get("/avatares/{hash_}")
+async def obter_avatar(hash_: str, request: Request, db: AsyncSession = Depends(get_db_async)):
+    # O conteúdo de uma URL nunca muda: o navegador guarda por um ano e nem revalida
+    etag = f'"{hash_}"'
+    cabecalhos = {"ETag": etag, "Cache-Control": avatares.CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cabecalhos)
+    avatar = await avatares.buscar(db, hash_)
+    if avatar is None:
+        raise HTTPException(status_code=404, detail="Avatar não encontrado")
+    return Response(content=avatar.conteudo, media_type=avatar.tipo, headers=cabecalhos)
+
+@app.post("/jogadores/importar")
+async def importar_jogadores(request: Request, formato: Optional[Literal["csv", "ndjson"]] = None,
+                             db: AsyncSession = Depends(get_db_async)):
+    # Corpo em CSV (com cabeçalho) ou NDJSON; sem ?formato=, vale o Content-Type.
+    # Validação linha a linha e gravação em blocos: as linhas com erro voltam no relatório.
+    if formato is None:
+        formato = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    linhas = importacao.linhas(request.stream())
+    registros = importacao.registros_csv(linhas) if formato == "csv" else importacao.registros_ndjson(linhas)
+    return await importacao.importar(db, registros)
+
+@app.get("/jogadores/exportar")
+async def exportar_jogadores(formato: Literal["csv", "ndjson"] = "csv"):
+    # Todos os jogadores (ativos ou não), em fluxo: serve de backup e volta pelo /jogadores/importar
+    consulta = exportacao.consulta_jogadores()
+    if formato == "csv":
+        corpo, tipo = exportacao.em_csv(consulta, exportacao.COLUNAS_JOGADOR), "text/csv; charset=utf-8"
+    else:
+        corpo, tipo = exportacao.em_ndjson(consulta, exportacao.COLUNAS_JOGADOR), "application/x-ndjson"
+    return StreamingResponse(corpo, media_type=tipo, headers={
+        "Content-Disposition": f'attachment; filename="jogadores.{formato}"',
+    })
+
+@app.get("/jogadores/estatisticas", response_model=list[schemas.EstatisticaJogadorResponse])
+async def listar_estatisticas(ids: Optional[list[str]] = Query(None), db: AsyncSession = Depends(get_db_async)):
+    # Leitura direta do agregado (sem varrer o histórico). ?ids=a&ids=b filtra alguns jogadores.
+    consulta = select(models.EstatisticaJogador)
+    if ids:
+        consulta = consulta.where(models.EstatisticaJogador.jogador_id.in_(ids))
+    consulta = consulta.order_by(models.EstatisticaJogador.vitorias.desc(), models.EstatisticaJogador.partidas.desc())
+    return (await db.scalars(consulta)).all()
+
+@app.get("/jogadores/{jogador_id}/estatisticas", response_model=schemas.EstatisticaJogadorResponse)
+async def obter_estatisticas(jogador_id: str, db: AsyncSession = Depends(get_db_async)):
+    linha = await db.get(models.EstatisticaJogador, jogador_id)
+    if linha is not None:
+        return linha
+    if await db.get(models.Jogador, jogador_id) is None:
+        raise HTTPException(status_code=404, detail="Jogador não encontrado")
+    # Jogador cadastrado que ainda não jogou
+    return models.EstatisticaJogador(jogador_id=jogador_id, partidas=0, vitorias=0, derrotas=0, empates=0,
+                                     pontos_pro=0, pontos_contra=0)
+
+@app.get("/jogadores/{jogador_id}/partidas", response_model=schemas.PaginaPartidasResponse)
+async def listar_partidas_do_jogador(jogador_id: str, limite: int = Query(historico.LIMITE_PADRAO, ge=1, le=historico.LIMITE_MAXIMO),
+                                     cursor: Optional[str] = None, db: AsyncSession = Depends(get_db_async)):
+    if await db.get(models.Jogador, jogador_id) is None:
+        raise HTTPException(status_code=404, detail="Jogador não encontrado")
+    try:
+        # run_sync: o mesmo historico.pagina do código síncrono, executado sobre a conexão assíncrona
+        return await db.run_sync(historico.pagina, limite, cursor, jogador_id=jogador_id)
+    except historico.CursorInvalido as erro:
+        raise HTTPException(status_code=400, detail=str(erro))
+
+@app.get("/partidas", response_model=schemas.PaginaPartidasResponse)
+async def listar_partidas(limite: int = Query(historico.LIMITE_PADRAO, ge=1, le=historico.LIMITE_MAXIMO),
+                          cursor: Optional[str] = None, quadra_id: Optional[int] = None, db: AsyncSession = Depends(get_db_async)):
+    # Mais recentes primeiro. Para a próxima página, mande o proximo_cursor da resposta em ?cursor=
+    try:
+        return await db.run_sync(historico.pagina, limite, cursor, quadra_id=quadra_id)
+    except historico.CursorInvalido as erro:
+        raise HTTPException(status_code=400, detail=str(erro))
+
+@app.get("/partidas/exportar")
+async def exportar_partidas(formato: Literal["csv", "ndjson"] = "ndjson", desde: Optional[datetime] = None,
+                            apos: Optional[int] = None):
+    # Histórico inteiro (ou o que terminou depois de ?desde=) em fluxo, para ferramentas de análise.
+    # Incremental: ?apos=<sequencia da última linha recebida> traz só o que foi gravado depois dela.
+    # Os blocos vêm do banco pelo driver async: a API continua atendendo durante uma exportação grande.
+    consulta = exportacao.consulta_partidas(desde, apos)
+    if formato == "csv":
+        corpo, tipo = exportacao.em_csv(consulta, exportacao.COLUNAS_PARTIDA), "text/csv; charset=utf-8"
+    else:
+        corpo, tipo = exportacao.em_ndjson(consulta, exportacao.COLUNAS_PARTIDA), "application/x-ndjson"
+    return StreamingResponse(corpo, media_type=tipo, headers={
+        "Content-Disposition": f'attachment; filename="partidas.{formato}"',
+    })
+
+@app.get("/ranking", response_model=list[schemas.RankingJogadorResponse])
+async def listar_ranking(limite: int = Query(50, ge=1, le=500), db: AsyncSession = Depends(get_db_async)):
+    # Melhores ratings primeiro (o nome vem junto para o placar de líderes não precisar de outra chamada)
+    linhas = (await db.execute(
+        select(models.RatingJogador, models.Jogador.nome)
+        .outerjoin(models.Jogador, models.Jogador.id == models.RatingJogador.jogador_id)
+        .order_by(models.RatingJogador.rating.desc())
+        .limit(limite)
+    )).all()
+    return [{"jogador_id": rating.jogador_id, "nome": nome, "rating": rating.rating, "partidas": rating.partidas}
+            for rating, nome in linhas]
+
+@app.post("/ranking/recalcular", status_code=202)
+def recalcular_ranking():
+    # Refaz o ranking inteiro a partir do histórico numa thread separada; a resposta volta na hora
+    if not ranking.RECALCULO.iniciar():
+        raise HTTPException(status_code=409, detail="Já existe um recálculo em andamento.")
+    return ranking.RECALCULO.situacao()
+
+@app.get("/ranking/recalcular")
+def situacao_recalculo_ranking():
+    return ranking.RECALCULO.situacao()
 
 @app.put("/jogadores/{jogador_id}", response_model=schemas.JogadorResponse)
-def atualizar_jogador(jogador_id: str, atualizacao: schemas.JogadorUpdate, db: Session = Depends(get_db)):
-    db_jogador = db.query(models.Jogador).filter(models.Jogador.id == jogador_id).first()
+async def atualizar_jogador(jogador_id: str, atualizacao: schemas.JogadorUpdate, db: AsyncSession = Depends(get_db_async)):
+    db_jogador = await db.get(models.Jogador, jogador_id)
     if not db_jogador:
         raise HTTPException(status_code=404, detail="Jogador não encontrado")
     
     # Extrai apenas os campos que o Front-end enviou na requisição
     dados_atualizacao = atualizacao.model_dump(exclude_unset=True)
     
+    if "avatar" in dados_atualizacao:
+        dados_atualizacao["avatar"] = await avatares.normalizar(db, dados_atualizacao["avatar"])
+
     # Atualiza dinamicamente o modelo do banco
     for chave, valor in dados_atualizacao.items():
         setattr(db_jogador, chave, valor)
-        
-    db.commit()
-    db.refresh(db_jogador)
+
+    await db.execute(elenco.incremento(db))
+    await db.commit()
+    await db.refresh(db_jogador)
     return db_jogador
 
 @app.patch("/jogadores/{jogador_id}/status", response_model=schemas.JogadorResponse)
-def alterar_status_jogador(jogador_id: str, status: schemas.JogadorStatusUpdate, db: Session = Depends(get_db)):
-    db_jogador = db.query(models.Jogador).filter(models.Jogador.id == jogador_id).first()
+async def alterar_status_jogador(jogador_id: str, status: schemas.JogadorStatusUpdate, db: AsyncSession = Depends(get_db_async)):
+    db_jogador = await db.get(models.Jogador, jogador_id)
     if not db_jogador:
         raise HTTPException(status_code=404, detail="Jogador não encontrado")
     
     dados_status = status.model_dump(exclude_unset=True)
     for chave, valor in dados_status.items():
         setattr(db_jogador, chave, valor)
-        
-    db.commit()
-    db.refresh(db_jogador)
+
+    await db.execute(elenco.incremento(db))
+    await db.commit()
+    await db.refresh(db_jogador)
     return db_jogador
 
+def _atualizar_presenca(presencas):
+    # {jogador_id: is_presente} num único UPDATE, em vez de um PATCH (e um SELECT + UPDATE) por jogador.
+    # Valores misturados viram um CASE no id; ids que não existem são simplesmente ignorados.
+    valores = set(presencas.values())
+    novo_valor = valores.pop() if len(valores) == 1 else case(presencas, value=models.Jogador.id)
+    return update(models.Jogador).where(models.Jogador.id.in_(list(presencas))).values(is_presente=novo_valor)
+
+@app.patch("/jogadores/presenca")
+async def alterar_presenca_em_lote(req: schemas.JogadorPresencaLote, db: AsyncSession = Depends(get_db_async)):
+    if not req.ids:
+        return {"atualizados": 0}
+    resultado = await db.execute(_atualizar_presenca({jogador_id: req.is_presente for jogador_id in req.ids}))
+    await db.execute(elenco.incremento(db))
+    await db.commit()
+    return {"atualizados": resultado.rowcount}
+
 @app.post("/fila/sair")
-def sair_da_fila(requisicao: FilaAcaoRequest):
-    jogador_id = requisicao.jogador_id
-    
+def sair_da_fila(requisicao: FilaAcaoRequest, prefer: Annotated[Optional[str], Header()] = None):
     # Se o jogador estiver na fila, removemos
-    if jogador_id in ESTADO_MEMORIA["fila"]:
-        ESTADO_MEMORIA["fila"].remove(jogador_id)
-        
-    return {"mensagem": "Removido", "fila": ESTADO_MEMORIA["fila"]}
+    compacta = respostas.quer_compacta(prefer)
+    with estado.transacao(quadras=[]) as t:
+        comandos.sair_da_fila(t, requisicao.jogador_id)
+        fila = None if compacta else t.fila.como_lista()
+
+    if compacta:
+        return respostas.confirmacao(t)
+    return respostas.RespostaJSON({"mensagem": "Removido", "fila": fila})
 
 @app.post("/fila/final")
-def mover_para_final(requisicao: FilaAcaoRequest):
-    jogador_id = requisicao.jogador_id
-    
-    if jogador_id in ESTADO_MEMORIA["fila"]:
-        ESTADO_MEMORIA["fila"].remove(jogador_id)
-        ESTADO_MEMORIA["fila"].append(jogador_id) # Coloca no fim da lista
-        
-    return {"mensagem": "Movido para o final", "fila": ESTADO_MEMORIA["fila"]}
+def mover_para_final(requisicao: FilaAcaoRequest, prefer: Annotated[Optional[str], Header()] = None):
+    # Coloca no fim da fila (se ele estiver nela)
+    compacta = respostas.quer_compacta(prefer)
+    with estado.transacao(quadras=[]) as t:
+        comandos.mover_para_final(t, requisicao.jogador_id)
+        fila = None if compacta else t.fila.como_lista()
+
+    if compacta:
+        return respostas.confirmacao(t)
+    return respostas.RespostaJSON({"mensagem": "Movido para o final", "fila": fila})
 
 @app.post("/fila/embaralhar")
-def embaralhar_fila():
-    # random.shuffle altera a lista original diretamente na memória
-    random.shuffle(ESTADO_MEMORIA["fila"])
-    return {"mensagem": "Fila embaralhada", "fila": ESTADO_MEMORIA["fila"]}
+def embaralhar_fila(prefer: Annotated[Optional[str], Header()] = None):
+    compacta = respostas.quer_compacta(prefer)
+    with estado.transacao(quadras=[]) as t:
+        comandos.embaralhar_fila(t)
+        fila = None if compacta else t.fila.como_lista()
+    if compacta:
+        return respostas.confirmacao(t)
+    return respostas.RespostaJSON({"mensagem": "Fila embaralhada", "fila": fila})
+
+# Check-in do começo da noite: uma lista ordenada de operações de fila e presença numa requisição só
+LIMITE_LOTE = 500
+
+class OperacaoLote(BaseModel):
+    op: Literal["entrar", "sair", "final", "presenca"]
+    jogador_id: str
+    presente: Optional[bool] = None # Só para op='presenca'
+
+class LoteFilaRequest(BaseModel):
+    operacoes: list[OperacaoLote] = Field(max_length=LIMITE_LOTE)
+
+@app.post("/fila/lote")
+def aplicar_lote_fila(req: LoteFilaRequest, db: Session = Depends(get_db)):
+    # 1. Confere o lote inteiro antes de mexer em qualquer coisa
+    presencas, operacoes_fila = {}, []
+    for operacao in req.operacoes:
+        if operacao.op == "presenca":
+            if operacao.presente is None:
+                raise HTTPException(status_code=400, detail="Operação 'presenca' precisa do campo 'presente'.")
+            presencas[operacao.jogador_id] = operacao.presente # A última do lote vale
+        else:
+            operacoes_fila.append((operacao.op, operacao.jogador_id))
+    comandos.validar_lote_fila(operacoes_fila)
+
+    # 2. Presenças num único UPDATE, confirmadas antes da fila (e fora da trava dela: nada de I/O
+    # com a trava segura). Se o banco recusar, nada foi publicado no stream.
+    presencas_atualizadas = 0
+    if presencas:
+        presencas_atualizadas = db.execute(_atualizar_presenca(presencas)).rowcount
+        db.execute(elenco.incremento(db))
+        db.commit()
+
+    # 3. Todas as operações de fila numa transação: um delta só no stream (uma versão).
+    # O lote já foi validado, então entrar/sair/final não têm mais como recusar nada aqui.
+    with estado.transacao(quadras=[]) as t:
+        comandos.aplicar_lote_fila(t, operacoes_fila)
+        tamanho_fila = len(t.fila)
+
+    # Resposta enxuta: quem acompanha o stream já recebe a fila nova pelo delta
+    return {
+        "versao": t.versao if t.versao is not None else estado.versao_atual(),
+        "operacoes": len(req.operacoes),
+        "presencas_atualizadas": presencas_atualizadas,
+        "tamanho_fila": tamanho_fila,
+    }
 
-@app.post("/quadras/{quadra_id}/iniciar")
-def iniciar_partida(quadra_id: int, db: Session = Depends(get_db)):
-    if quadra_id not in [1, 2]:
-        raise HTTPException(status_code=400, detail="Quadra inválida.")
-        
-    jogo_atual = ESTADO_MEMORIA["jogos"].get(quadra_id)
-    if jogo_atual and jogo_atual.get("status") == "JOGANDO":
-        raise HTTPException(status_code=400, detail="Quadra já está em uso.")
+@app.get("/quadras")
+def listar_quadras():
+    return respostas.RespostaJSON({"quadras": estado.quadras_ativas()})
 
-    # 1. Pega a configuração de Tamanho do Time (Padrão 4 se não existir)
-    config_tamanho = db.query(models.Configuracao).filter(models.Configuracao.chave == "TamanhoTime").first()
-    tamanho_time = config_tamanho.valor if config_tamanho else 4
-    necessarios = tamanho_time * 2
+# Quantas vezes o iniciar remonta os times se a frente da fila mudar no meio do caminho
+TENTATIVAS_INICIAR = 5
 
-    # 2. Verifica se tem gente suficiente
-    if len(ESTADO_MEMORIA["fila"]) < necessarios:
-        raise HTTPException(status_code=400, detail=f"Fila insuficiente. Necessários: {necessarios}.")
+def _montar_times(selecionados_ids, db, tamanho_time):
+    # 4. Busca no banco de dados o sexo e o rating de quem foi selecionado (uma consulta só)
+    linhas = (
+        db.query(models.Jogador.id, models.Jogador.sexo, models.RatingJogador.rating)
+        .outerjoin(models.RatingJogador, models.RatingJogador.jogador_id == models.Jogador.id)
+        .filter(models.Jogador.id.in_(selecionados_ids))
+        .all()
+    )
+    mapa_sexo = {jogador_id: sexo for jogador_id, sexo, _ in linhas}
+    mapa_rating = {jogador_id: rating for jogador_id, _, rating in linhas if rating is not None}
 
-    # 3. Separa os selecionados e atualiza a fila principal
-    selecionados_ids = ESTADO_MEMORIA["fila"][:necessarios]
-    ESTADO_MEMORIA["fila"] = ESTADO_MEMORIA["fila"][necessarios:]
+    # 5 a 7. Embaralha (a sua regra de quebrar panelinhas), divide as mulheres entre os dois times
+    # e, dentro dessa regra, escolhe a divisão mais equilibrada pelo rating que menos repete as duplas
+    # que já jogaram juntas na noite (formacao.py + convivencia.py)
+    repeticoes = convivencia.MATRIZ.entre(selecionados_ids)
+    return formacao.montar_times(selecionados_ids, mapa_rating, mapa_sexo, tamanho_time, repeticoes)
 
-    # 4. Aleatoriza PRIMEIRO (A sua regra de quebrar panelinhas)
-    random.shuffle(selecionados_ids)
+@app.post("/quadras/{quadra_id}/iniciar")
+def iniciar_partida(quadra_id: int, db: Session = Depends(get_db), prefer: Annotated[Optional[str], Header()] = None):
+    # As quadras existentes vêm da configuração QuantidadeQuadras (1..N)
+    if quadra_id not in estado.quadras_ativas():
+        raise HTTPException(status_code=400, detail="Quadra inválida.")
 
-    # 5. Busca no banco de dados o sexo de quem foi selecionado
-    jogadores_db = db.query(models.Jogador).filter(models.Jogador.id.in_(selecionados_ids)).all()
-    mapa_sexo = {j.id: j.sexo for j in jogadores_db}
+    # 1. Pega a configuração de Tamanho do Time (Padrão 4 se não existir)
+    tamanho_time = CACHE_CONFIGURACOES.atual().tamanho_time
+    necessarios = tamanho_time * 2
 
-    mulheres = [jid for jid in selecionados_ids if mapa_sexo.get(jid) == 'F']
-    homens = [jid for jid in selecionados_ids if mapa_sexo.get(jid) != 'F'] # Trata 'M' ou nulo como masculino
+    for _ in range(TENTATIVAS_INICIAR):
+        # 2. Verifica se tem gente suficiente e 3. Separa os selecionados (leitura consistente da fila)
+        selecionados_ids = estado.primeiros_da_fila(necessarios)
+        if len(selecionados_ids) < necessarios:
+            raise HTTPException(status_code=400, detail=f"Fila insuficiente. Necessários: {necessarios}.")
 
-    time_a = []
-    time_b = []
+        # 4 a 7. Monta os times sem nenhuma trava segura (tem consulta ao banco no meio)
+        time_a, time_b = _montar_times(selecionados_ids, db, tamanho_time)
 
-    # 6. Distribui as mulheres alternadamente
-    for i, f_id in enumerate(mulheres):
-        if i % 2 == 0:
-            time_a.append(f_id)
-        else:
-            time_b.append(f_id)
-            
-    # 7. Preenche as vagas restantes com os homens
-    for m_id in homens:
-        if len(time_a) < tamanho_time:
-            time_a.append(m_id)
-        else:
-            time_b.append(m_id)
-
-    # 8. Grava o novo estado da quadra na memória
-    ESTADO_MEMORIA["jogos"][quadra_id] = {
-        "status": "JOGANDO",
-        "inicio": datetime.now(timezone.utc).isoformat(),
-        "placar": {"A": 0, "B": 0},
-        "timeA": time_a,
-        "timeB": time_b,
-        "vitoriasConsecutivas": {"A": 0, "B": 0}
-    }
+        # 8. Confirma: se a quadra continua livre e a frente da fila é a mesma, tira os selecionados
+        # da fila e ocupa a quadra numa transação só. Se outra quadra puxou gente antes, monta de novo.
+        try:
+            with estado.transacao(quadras=[quadra_id]) as t:
+                novo_jogo = comandos.iniciar_partida(t, quadra_id, selecionados_ids, time_a, time_b)
+        except comandos.FilaMudou:
+            continue
+        if respostas.quer_compacta(prefer):
+            return respostas.confirmacao(t)
+        return respostas.RespostaJSON({"mensagem": "Partida iniciada", "estado_quadra": novo_jogo})
 
-    return {"mensagem": "Partida iniciada", "estado_quadra": ESTADO_MEMORIA["jogos"][quadra_id]}
+    raise HTTPException(status_code=409, detail="A fila mudou enquanto os times eram montados. Tente de novo.")
 
 # Molde para a requisição de alterar placar
 class PlacarRequest(BaseModel):
@@ -238,64 +617,32 @@ class PlacarRequest(BaseModel):
     delta: int # 1 para somar, -1 para subtrair
 
 @app.post("/quadras/{quadra_id}/placar")
-def atualizar_placar(quadra_id: int, requisicao: PlacarRequest):
-    jogo = ESTADO_MEMORIA["jogos"].get(quadra_id)
-    if not jogo or jogo["status"] != "JOGANDO":
-        raise HTTPException(status_code=400, detail="Nenhum jogo ativo nesta quadra.")
-    
-    time = requisicao.time.upper()
-    if time not in ["A", "B"]:
-        raise HTTPException(status_code=400, detail="Time inválido. Use 'A' ou 'B'.")
-        
-    novo_placar = jogo["placar"][time] + requisicao.delta
-    # Impede placar negativo
-    jogo["placar"][time] = max(0, novo_placar)
-    
-    return {"mensagem": "Placar atualizado", "placar": jogo["placar"]}
+def atualizar_placar(quadra_id: int, requisicao: PlacarRequest, prefer: Annotated[Optional[str], Header()] = None):
+    # Só trava esta quadra: pontos em quadras diferentes não esperam um pelo outro (nem pela fila).
+    # A leitura do placar fica dentro da trava para dois toques simultâneos não se perderem.
+    with estado.transacao(quadras=[quadra_id], fila=False) as t:
+        placar = comandos.atualizar_placar(t, quadra_id, requisicao.time, requisicao.delta)
+
+    if respostas.quer_compacta(prefer):
+        return respostas.confirmacao(t)
+    return respostas.RespostaJSON({"mensagem": "Placar atualizado", "placar": placar})
 
 @app.post("/quadras/{quadra_id}/encerrar")
-def encerrar_partida_manual(quadra_id: int, db: Session = Depends(get_db)):
-    jogo = ESTADO_MEMORIA["jogos"].get(quadra_id)
-    if not jogo or jogo["status"] != "JOGANDO":
-        raise HTTPException(status_code=400, detail="Nenhum jogo ativo nesta quadra.")
-        
-    # 1. Salva a Partida Principal no Banco
-    nova_partida = models.Partida(
-        quadra_id=quadra_id,
-        inicio=datetime.fromisoformat(jogo["inicio"]),
-        fim=datetime.now(timezone.utc),
-        placar_a=jogo["placar"]["A"],
-        placar_b=jogo["placar"]["B"],
-        vencedor=None, # Como foi manual, não tem vencedor formal
-        motivo_fim="Cancelada"
-    )
-    db.add(nova_partida)
-    db.commit()
-    db.refresh(nova_partida)
-    
-    # 2. Salva o Histórico de cada jogador no Banco (O seu registro atuarial)
-    todos_jogadores = []
-    
-    for j_id in jogo["timeA"]:
-        hist = models.PartidaHistorico(partida_id=nova_partida.id, jogador_id=j_id, time="A", resultado="Empate")
-        db.add(hist)
-        todos_jogadores.append(j_id)
-        
-    for j_id in jogo["timeB"]:
-        hist = models.PartidaHistorico(partida_id=nova_partida.id, jogador_id=j_id, time="B", resultado="Empate")
-        db.add(hist)
-        todos_jogadores.append(j_id)
-        
-    db.commit()
-    
-    # 3. Devolve a galera para a fila em ordem aleatória
-    random.shuffle(todos_jogadores)
-    ESTADO_MEMORIA["fila"].extend(todos_jogadores)
-    
-    # 4. Limpa a quadra
-    ESTADO_MEMORIA["jogos"][quadra_id] = None
-    
-    return {"mensagem": "Partida encerrada manualmente e salva no histórico.", "fila": ESTADO_MEMORIA["fila"]}
+def encerrar_partida_manual(quadra_id: int, prefer: Annotated[Optional[str], Header()] = None):
+    compacta = respostas.quer_compacta(prefer)
+    config = CACHE_CONFIGURACOES.atual()
+    # 1 a 4. Resultado, fila e quadra resolvidos juntos, com a quadra e a fila travadas
+    with estado.transacao(quadras=[quadra_id]) as t:
+        resultado = comandos.encerrar_partida(t, quadra_id, config)
+        fila = None if compacta else t.fila.como_lista()
+
+    # 5. A gravação no banco acontece em segundo plano (write-behind), sem segurar a resposta
+    persistencia.GRAVADOR.enfileirar(resultado)
+    convivencia.MATRIZ.registrar_resultado(resultado)
+
+    if compacta:
+        return respostas.confirmacao(t)
+    return respostas.RespostaJSON({"mensagem": "Partida encerrada manualmente e salva no histórico.", "fila": fila})
 
 class VitoriaRequest(BaseModel):
     time_vencedor: str # 'A' ou 'B'
@@ -303,119 +650,35 @@ class VitoriaRequest(BaseModel):
     placar_b: Optional[int] = None
 
 @app.post("/quadras/{quadra_id}/vitoria")
-def registrar_vitoria(quadra_id: int, req: VitoriaRequest, db: Session = Depends(get_db)):
-    jogo = ESTADO_MEMORIA["jogos"].get(quadra_id)
-    if not jogo or jogo["status"] != "JOGANDO":
-        raise HTTPException(status_code=400, detail="Nenhum jogo ativo nesta quadra.")
-
-    vencedor = req.time_vencedor.upper()
-    if vencedor not in ["A", "B"]:
-        raise HTTPException(status_code=400, detail="Vencedor inválido. Use 'A' ou 'B'.")
-        
-    perdedor = "B" if vencedor == "A" else "A"
-
-    # 1. Ajuste final de placar (se o Front enviou correção no modal)
-    if req.placar_a is not None: jogo["placar"]["A"] = req.placar_a
-    if req.placar_b is not None: jogo["placar"]["B"] = req.placar_b
-
-    # 2. Salva a Partida Principal no Banco
-    nova_partida = models.Partida(
-        quadra_id=quadra_id,
-        inicio=datetime.fromisoformat(jogo["inicio"]),
-        fim=datetime.now(timezone.utc),
-        placar_a=jogo["placar"]["A"],
-        placar_b=jogo["placar"]["B"],
-        vencedor=vencedor,
-        motivo_fim="Pontuacao"
-    )
-    db.add(nova_partida)
-    db.flush() # Envia pro banco para gerar o ID, mas não commita ainda
-
-    ids_vencedores = jogo[f"time{vencedor}"]
-    ids_perdedores = jogo[f"time{perdedor}"]
-
-    # 3. Salva o Histórico de cada jogador
-    for j_id in ids_vencedores:
-        db.add(models.PartidaHistorico(partida_id=nova_partida.id, jogador_id=j_id, time=vencedor, resultado="Vitoria"))
-    for j_id in ids_perdedores:
-        db.add(models.PartidaHistorico(partida_id=nova_partida.id, jogador_id=j_id, time=perdedor, resultado="Derrota"))
-    db.commit()
-
-    # 4. Rotaciona os Perdedores (Vão para a fila embaralhados)
-    perdedores_embaralhados = ids_perdedores.copy()
-    random.shuffle(perdedores_embaralhados)
-    ESTADO_MEMORIA["fila"].extend(perdedores_embaralhados)
-
-    # 5. Avalia o Limite de Vitórias
-    config_max = db.query(models.Configuracao).filter(models.Configuracao.chave == "MaxVitorias").first()
-    max_vitorias = config_max.valor if config_max else 3
-    
-    jogo["vitoriasConsecutivas"][vencedor] += 1
-    jogo["vitoriasConsecutivas"][perdedor] = 0 # Reseta o outro lado
-
-    if jogo["vitoriasConsecutivas"][vencedor] >= max_vitorias:
-        # Atingiu o limite: Vencedores também saem
-        vencedores_embaralhados = ids_vencedores.copy()
-        random.shuffle(vencedores_embaralhados)
-        ESTADO_MEMORIA["fila"].extend(vencedores_embaralhados)
-        
-        ESTADO_MEMORIA["jogos"][quadra_id] = None # Esvazia a quadra
-        msg = f"Limite de {max_vitorias} vitórias atingido. Todos para a fila."
-    else:
-        # Não atingiu o limite: Puxa desafiantes (O "Loop" perfeito dos 8 jogadores)
-        config_tamanho = db.query(models.Configuracao).filter(models.Configuracao.chave == "TamanhoTime").first()
-        tamanho_time = config_tamanho.valor if config_tamanho else 4
-
-        if len(ESTADO_MEMORIA["fila"]) >= tamanho_time:
-            novos_desafiantes = ESTADO_MEMORIA["fila"][:tamanho_time]
-            ESTADO_MEMORIA["fila"] = ESTADO_MEMORIA["fila"][tamanho_time:]
-            
-            # Substitui o time que perdeu
-            jogo[f"time{perdedor}"] = novos_desafiantes
-            # Reseta a quadra para a nova partida
-            jogo["placar"] = {"A": 0, "B": 0}
-            jogo["inicio"] = datetime.now(timezone.utc).isoformat()
-            msg = "Vitória registrada. Novos desafiantes entraram."
-        else:
-            # Regra de fallback (quase impossível de ocorrer devido ao loop, mas previne travamento do app)
-            vencedores_embaralhados = ids_vencedores.copy()
-            random.shuffle(vencedores_embaralhados)
-            ESTADO_MEMORIA["fila"].extend(vencedores_embaralhados)
-            ESTADO_MEMORIA["jogos"][quadra_id] = None
-            msg = "Fila insuficiente para continuar, quadra esvaziada."
+def registrar_vitoria(quadra_id: int, req: VitoriaRequest, prefer: Annotated[Optional[str], Header()] = None):
+    # A mesma foto das configurações vale para a requisição inteira
+    config = CACHE_CONFIGURACOES.atual()
+
+    # 1 a 6. Placar, resultado, limite de vitórias e rotação da fila numa única transação
+    with estado.transacao(quadras=[quadra_id]) as t:
+        msg, jogo, resultado = comandos.registrar_vitoria(
+            t, quadra_id, req.time_vencedor, req.placar_a, req.placar_b, config
+        )
 
-    return {"mensagem": msg, "estado_quadra": ESTADO_MEMORIA["jogos"].get(quadra_id)}
+    # 7. A quadra já girou; o banco recebe o resultado pelo gravador write-behind
+    persistencia.GRAVADOR.enfileirar(resultado)
+    convivencia.MATRIZ.registrar_resultado(resultado)
+
+    if respostas.quer_compacta(prefer):
+        return respostas.confirmacao(t)
+    return respostas.RespostaJSON({"mensagem": msg, "estado_quadra": jogo})
 
 class SubstituicaoRequest(BaseModel):
     id_saindo: str
     id_entrando: str
 
 @app.post("/quadras/{quadra_id}/substituir")
-def substituir_jogador(quadra_id: int, req: SubstituicaoRequest):
-    jogo = ESTADO_MEMORIA["jogos"].get(quadra_id)
-    
-    # 1. Validações Iniciais
-    if not jogo or jogo["status"] != "JOGANDO":
-        raise HTTPException(status_code=400, detail="Nenhum jogo ativo nesta quadra.")
-        
-    if req.id_entrando not in ESTADO_MEMORIA["fila"]:
-        raise HTTPException(status_code=400, detail="O jogador substituto não está na fila de espera.")
-
-    # 2. Descobre em qual time o jogador que vai sair está
-    time_alvo = None
-    if req.id_saindo in jogo["timeA"]:
-        time_alvo = "timeA"
-    elif req.id_saindo in jogo["timeB"]:
-        time_alvo = "timeB"
-    else:
-        raise HTTPException(status_code=400, detail="O jogador que vai sair não está na quadra.")
-
-    # 3. Faz a troca no time (Sai um, Entra o outro)
-    jogo[time_alvo].remove(req.id_saindo)
-    jogo[time_alvo].append(req.id_entrando)
-
-    # 4. Atualiza a fila (Remove o substituto e joga quem saiu pro final)
-    ESTADO_MEMORIA["fila"].remove(req.id_entrando)
-    ESTADO_MEMORIA["fila"].append(req.id_saindo)
-
-    return {"mensagem": "Substituição realizada com sucesso", "estado_quadra": jogo}
\ No newline at end of file
+def substituir_jogador(quadra_id: int, req: SubstituicaoRequest, prefer: Annotated[Optional[str], Header()] = None):
+    # Validação e troca com a quadra e a fila travadas: o substituto não pode ser puxado
+    # por outra quadra entre a conferência e a troca
+    with estado.transacao(quadras=[quadra_id]) as t:
+        jogo = comandos.substituir_jogador(t, quadra_id, req.id_saindo, req.id_entrando)
+
+    if respostas.quer_compacta(prefer):
+        return respostas.confirmacao(t)
+    return respostas.RespostaJSON({"mensagem": "Substituição realizada com sucesso", "estado_quadra": jogo})
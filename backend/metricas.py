@@ -0,0 +1,227 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from sqlalchemy import event
+import estado
+import persistencia
+from estado import ESTADO_MEMORIA
+
+# Métricas do processo no formato texto do Prometheus (GET /metrics):
+#   - latência por rota (histograma), requisições por rota e status
+#   - consultas ao banco: tempo de cada uma (histograma) e, por rota, quantas foram feitas e quanto
+#     tempo somaram; dividido pelo total de requisições da rota mostra um N+1 aparecendo
+#   - medidores lidos na hora da coleta: tamanho da fila, quadras com jogo, versão do estado e
+#     resultados esperando o gravador
+# Tudo é contado em memória com alguns inteiros por requisição (nada de lock no caminho da requisição,
+# só no da consulta, que pode vir de qualquer thread). Com vários workers, cada um tem as suas.
+# Com VOLEIFLOW_DEBUG_CONSULTAS=1 toda resposta leva o cabeçalho X-Consultas-Banco (consultas feitas
+# até a resposta começar; numa StreamingResponse, as do corpo não entram).
+
+LIMITES_REQUISICAO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0) # Segundos
+LIMITES_CONSULTA = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+ROTA_DESCONHECIDA = "nao_encontrada" # 404 não vira um rótulo por caminho digitado
+CABECALHO_CONSULTAS = b"x-consultas-banco"
+DEBUG_CONSULTAS = os.getenv("VOLEIFLOW_DEBUG_CONSULTAS") == "1"
+TIPO_CONTEUDO = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histograma:
+    __slots__ = ("limites", "baldes", "soma", "contagem")
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.baldes = [0] * (len(limites) + 1) # O último é o +Inf
+        self.soma = 0.0
+        self.contagem = 0
+
+    def observar(self, valor):
+        self.baldes[bisect.bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.contagem += 1
+
+    def linhas(self, nome, rotulos=""):
+        separador = "," if rotulos else ""
+        acumulado = 0
+        for limite, quantidade in zip(self.limites + ("+Inf",), self.baldes):
+            acumulado += quantidade
+            yield f'{nome}_bucket{{{rotulos}{separador}le="{limite}"}} {acumulado}'
+        chaves = f"{{{rotulos}}}" if rotulos else ""
+        yield f"{nome}_sum{chaves} {self.soma}"
+        yield f"{nome}_count{chaves} {self.contagem}"
+
+
+class Requisicao:
+    # O que a requisição em andamento já fez no banco (as consultas chegam pelo contextvar)
+    __slots__ = ("consultas", "tempo_banco")
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo_banco = 0.0
+
+
+_requisicao_atual = contextvars.ContextVar("voleiflow_requisicao", default=None)
+
+
+class Metricas:
+    def __init__(self):
+        self._trava_consultas = threading.Lock()
+        self.duracao = {} # (metodo, rota) -> Histograma
+        self.requisicoes = {} # (metodo, rota, status) -> quantidade
+        self.consultas_por_rota = {} # (metodo, rota) -> [consultas, segundos no banco]
+        self.consultas = Histograma(LIMITES_CONSULTA)
+
+    def registrar_requisicao(self, metodo, rota, status, segundos, requisicao):
+        # Só o event loop chama (middleware), então dispensa trava
+        chave = (metodo, rota)
+        histograma = self.duracao.get(chave)
+        if histograma is None:
+            histograma = self.duracao[chave] = Histograma(LIMITES_REQUISICAO)
+            self.consultas_por_rota[chave] = [0, 0.0]
+        histograma.observar(segundos)
+        banco = self.consultas_por_rota[chave]
+        banco[0] += requisicao.consultas
+        banco[1] += requisicao.tempo_banco
+        chave_status = (metodo, rota, status)
+        self.requisicoes[chave_status] = self.requisicoes.get(chave_status, 0) + 1
+
+    def registrar_consulta(self, segundos):
+        # Qualquer thread: threadpool do FastAPI, gravador em segundo plano, event loop (async)
+        with self._trava_consultas:
+            self.consultas.observar(segundos)
+        requisicao = _requisicao_atual.get()
+        if requisicao is not None:
+            requisicao.consultas += 1
+            requisicao.tempo_banco += segundos
+
+    def exportar(self) -> str:
+        linhas = [
+            "# HELP voleiflow_http_requisicoes_total Requisições atendidas por rota e status.",
+            "# TYPE voleiflow_http_requisicoes_total counter",
+        ]
+        for (metodo, rota, status), quantidade in sorted(self.requisicoes.items()):
+            linhas.append(f'voleiflow_http_requisicoes_total{{{_rotulos(metodo, rota)},status="{status}"}} {quantidade}')
+
+        linhas += [
+            "# HELP voleiflow_http_duracao_segundos Tempo de resposta por rota.",
+            "# TYPE voleiflow_http_duracao_segundos histogram",
+        ]
+        for (metodo, rota), histograma in sorted(self.duracao.items()):
+            linhas.extend(histograma.linhas("voleiflow_http_duracao_segundos", _rotulos(metodo, rota)))
+
+        linhas += [
+            "# HELP voleiflow_http_consultas_total Consultas ao banco feitas pelas requisições de cada rota.",
+            "# TYPE voleiflow_http_consultas_total counter",
+        ]
+        por_rota = sorted(self.consultas_por_rota.items())
+        for (metodo, rota), (consultas, _) in por_rota:
+            linhas.append(f"voleiflow_http_consultas_total{{{_rotulos(metodo, rota)}}} {consultas}")
+        linhas += [
+            "# HELP voleiflow_http_tempo_banco_segundos_total Tempo no banco somado por rota.",
+            "# TYPE voleiflow_http_tempo_banco_segundos_total counter",
+        ]
+        for (metodo, rota), (_, segundos) in por_rota:
+            linhas.append(f"voleiflow_http_tempo_banco_segundos_total{{{_rotulos(metodo, rota)}}} {segundos}")
+
+        with self._trava_consultas:
+            consultas = list(self.consultas.linhas("voleiflow_banco_consulta_segundos"))
+        linhas += [
+            "# HELP voleiflow_banco_consulta_segundos Tempo de cada consulta ao banco (requisições e segundo plano).",
+            "# TYPE voleiflow_banco_consulta_segundos histogram",
+            *consultas,
+        ]
+
+        for nome, ajuda, valor in _medidores():
+            linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} gauge", f"{nome} {valor}"]
+        return "\n".join(linhas) + "\n"
+
+
+def _escapar(valor):
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos(metodo, rota):
+    return f'metodo="{metodo}",rota="{_escapar(rota)}"'
+
+
+def _medidores():
+    # Lidos na hora da coleta: leitura sem trava, no máximo uma transação atrasada
+    jogos = list(ESTADO_MEMORIA["jogos"].values())
+    return [
+        ("voleiflow_fila_tamanho", "Jogadores esperando na fila.", len(ESTADO_MEMORIA["fila"])),
+        ("voleiflow_quadras_ativas", "Quadras com partida em andamento.", sum(1 for jogo in jogos if jogo is not None)),
+        ("voleiflow_quadras", "Quadras abertas.", len(jogos)),
+        ("voleiflow_estado_versao", "Versão atual do estado (fila + quadras).", estado.versao_atual()),
+        ("voleiflow_gravacoes_pendentes", "Resultados esperando o gravador em segundo plano.", persistencia.GRAVADOR.pendentes()),
+    ]
+
+
+METRICAS = Metricas()
+
+
+def _antes_da_consulta(conexao, _cursor, _sql, _parametros, _contexto, _executemany):
+    conexao.info.setdefault("voleiflow_inicio", []).append(time.perf_counter())
+
+
+def _depois_da_consulta(conexao, _cursor, _sql, _parametros, _contexto, _executemany):
+    METRICAS.registrar_consulta(time.perf_counter() - conexao.info["voleiflow_inicio"].pop())
+
+
+def _erro_na_consulta(contexto):
+    # Consulta que falhou não chega no after_cursor_execute: conta do mesmo jeito
+    inicios = contexto.connection.info.get("voleiflow_inicio") if contexto.connection is not None else None
+    if inicios:
+        METRICAS.registrar_consulta(time.perf_counter() - inicios.pop())
+
+
+EVENTOS_BANCO = {
+    "before_cursor_execute": _antes_da_consulta,
+    "after_cursor_execute": _depois_da_consulta,
+    "handle_error": _erro_na_consulta,
+}
+
+
+def ligar_banco(engine_sync):
+    # Cronometra cada consulta do engine (no assíncrono, passar o engine_async.sync_engine)
+    for nome, funcao in EVENTOS_BANCO.items():
+        event.listen(engine_sync, nome, funcao)
+
+
+def desligar_banco(engine_sync):
+    for nome, funcao in EVENTOS_BANCO.items():
+        event.remove(engine_sync, nome, funcao)
+
+
+class MiddlewareMetricas:
+    # ASGI puro (o BaseHTTPMiddleware custa uma task a mais por requisição e atrapalha o streaming)
+    def __init__(self, app, metricas=METRICAS):
+        self.app = app
+        self.metricas = metricas
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        requisicao = Requisicao()
+        token = _requisicao_atual.set(requisicao)
+        status = 500 # Se a aplicação estourar antes de responder
+        inicio = time.perf_counter()
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+                if DEBUG_CONSULTAS:
+                    mensagem["headers"] = [*mensagem.get("headers", ()), (CABECALHO_CONSULTAS, str(requisicao.consultas).encode())]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _requisicao_atual.reset(token)
+            # O roteador do FastAPI deixa a rota encontrada no scope: o molde (/quadras/{quadra_id}/placar),
+            # não o caminho, para não criar uma série por id
+            rota = getattr(scope.get("route"), "path", ROTA_DESCONHECIDA)
+            self.metricas.registrar_requisicao(scope["method"], rota, status, time.perf_counter() - inicio, requisicao)
@@ -0,0 +1,192 @@
+import logging
+from sqlalchemy import (Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, MetaData, String,
+                        Table, delete, insert, inspect, select, text, update)
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateTable
+import models
+
+logger = logging.getLogger("voleiflow")
+
+# Esquema do banco em passos numerados, conferido uma vez na subida da API (lifespan) e pelos scripts.
+# O banco guarda em esquema_versao até qual passo já foi; com o carimbo em dia, subir custa uma
+# consulta (não importa quantas tabelas existam), em vez de inspecionar todas as tabelas e índices.
+# Cada passo cria as tabelas e índices como eram quando ele foi escrito (a cópia congelada abaixo, não os
+# models de hoje), então um banco novo e um banco parado num passo antigo chegam no mesmo esquema.
+# Passo novo: acrescentar no fim de MIGRACOES, nunca mudar um que já rodou nem as tabelas congeladas;
+# coluna nova numa tabela existente entra como DDL explícito (ALTER TABLE) no passo novo, e o model
+# muda junto. Tabelas e índices são criados só se faltarem: um banco anterior ao carimbo (criado pelo
+# create_all antigo) só ganha o que falta.
+
+_ESQUEMA = MetaData()
+
+# Passo 1
+Table(
+    "jogadores", _ESQUEMA,
+    Column("id", String, primary_key=True),
+    Column("nome", String, index=True),
+    Column("whatsapp", String, index=True, nullable=True),
+    Column("sexo", String(1)),
+    Column("avatar", String),
+    Column("is_ativo", Boolean),
+    Column("is_presente", Boolean),
+    Column("created_at", DateTime),
+)
+Table(
+    "partidas", _ESQUEMA,
+    Column("id", String, primary_key=True),
+    Column("quadra_id", Integer),
+    Column("inicio", DateTime),
+    Column("fim", DateTime, nullable=True),
+    Column("placar_a", Integer),
+    Column("placar_b", Integer),
+    Column("vencedor", String(1), nullable=True),
+    Column("motivo_fim", String, nullable=True),
+    Index("ix_partidas_inicio_id", "inicio", "id"), # Passo 4
+    Index("ix_partidas_quadra_inicio_id", "quadra_id", "inicio", "id"), # Passo 4
+    Index("ix_partidas_fim_id", "fim", "id"), # Passo 5
+)
+Table(
+    "partidas_historico", _ESQUEMA,
+    Column("id", String, primary_key=True),
+    Column("partida_id", String, ForeignKey("partidas.id"), index=True), # Índice: passo 4
+    Column("jogador_id", String, ForeignKey("jogadores.id")),
+    Column("time", String(1)),
+    Column("resultado", String),
+    Index("ix_partidas_historico_jogador_partida", "jogador_id", "partida_id"), # Passo 4
+)
+Table(
+    "configuracoes", _ESQUEMA,
+    Column("chave", String, primary_key=True),
+    Column("valor", Integer),
+)
+# Passo 2
+Table(
+    "estatisticas_jogadores", _ESQUEMA,
+    Column("jogador_id", String, ForeignKey("jogadores.id"), primary_key=True),
+    Column("partidas", Integer, nullable=False),
+    Column("vitorias", Integer, nullable=False),
+    Column("derrotas", Integer, nullable=False),
+    Column("empates", Integer, nullable=False),
+    Column("pontos_pro", Integer, nullable=False),
+    Column("pontos_contra", Integer, nullable=False),
+    Column("ultima_partida", DateTime, nullable=True),
+)
+# Passo 3
+Table(
+    "ratings_jogadores", _ESQUEMA,
+    Column("jogador_id", String, ForeignKey("jogadores.id"), primary_key=True),
+    Column("rating", Float, nullable=False),
+    Column("partidas", Integer, nullable=False),
+    Column("atualizado_em", DateTime, nullable=True),
+)
+# Passo 6
+Table(
+    "versoes_tabelas", _ESQUEMA,
+    Column("nome", String, primary_key=True),
+    Column("versao", Integer, nullable=False),
+)
+Table(
+    "avatares", _ESQUEMA,
+    Column("hash", String(64), primary_key=True),
+    Column("tipo", String, nullable=False),
+    Column("conteudo", LargeBinary, nullable=False),
+    Column("created_at", DateTime),
+)
+
+# Chaves para jogadores só no SQLite, como nos models (a fila aceita ids sem cadastro)
+for _tabela in _ESQUEMA.sorted_tables:
+    for _chave in _tabela.foreign_keys:
+        if _chave.target_fullname == "jogadores.id":
+            _chave.constraint.ddl_if(dialect="sqlite")
+
+
+def _criar_tabelas(conexao, *nomes):
+    # Só a tabela: cada índice entra pelo passo que o criou
+    for nome in nomes:
+        if not inspect(conexao).has_table(nome):
+            conexao.execute(CreateTable(_ESQUEMA.tables[nome]))
+
+
+def _criar_indices(conexao, *nomes):
+    for tabela in _ESQUEMA.sorted_tables:
+        for indice in tabela.indexes:
+            if indice.name in nomes:
+                indice.create(conexao, checkfirst=True)
+
+
+def _passo_1(conexao):
+    _criar_tabelas(conexao, "jogadores", "partidas", "partidas_historico", "configuracoes")
+    _criar_indices(conexao, "ix_jogadores_nome", "ix_jogadores_whatsapp")
+
+
+def _passo_7(conexao):
+    # Ordem de gravação das partidas: coluna nova, as que já existem numeradas na ordem em que
+    # terminaram e o contador de versoes_tabelas continuando dali (persistencia.gravar_resultados)
+    if "sequencia" not in {coluna["name"] for coluna in inspect(conexao).get_columns("partidas")}:
+        conexao.execute(text("ALTER TABLE partidas ADD COLUMN sequencia INTEGER"))
+        conexao.execute(text(
+            "UPDATE partidas SET sequencia = numeradas.n "
+            "FROM (SELECT id, ROW_NUMBER() OVER (ORDER BY fim, id) AS n FROM partidas) AS numeradas "
+            "WHERE numeradas.id = partidas.id"))
+    conexao.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_partidas_sequencia ON partidas (sequencia)"))
+    conexao.execute(text("DELETE FROM versoes_tabelas WHERE nome = 'partidas'"))
+    conexao.execute(text(
+        "INSERT INTO versoes_tabelas (nome, versao) SELECT 'partidas', COALESCE(MAX(sequencia), 0) FROM partidas"))
+
+
+MIGRACOES = [
+    (1, "tabelas iniciais", _passo_1),
+    (2, "estatísticas por jogador", lambda c: _criar_tabelas(c, "estatisticas_jogadores")),
+    (3, "ratings (Elo)", lambda c: _criar_tabelas(c, "ratings_jogadores")),
+    (4, "índices do histórico paginado", lambda c: _criar_indices(
+        c, "ix_partidas_inicio_id", "ix_partidas_quadra_inicio_id", "ix_partidas_historico_partida_id",
+        "ix_partidas_historico_jogador_partida")),
+    (5, "índice da exportação incremental", lambda c: _criar_indices(c, "ix_partidas_fim_id")),
+    (6, "versões de tabela e avatares", lambda c: _criar_tabelas(c, "versoes_tabelas", "avatares")),
+    (7, "ordem de gravação das partidas", _passo_7),
+]
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+
+def versao_do_banco(engine) -> int:
+    # 0 quando o banco é anterior ao carimbo (ou está vazio)
+    try:
+        with engine.connect() as conexao:
+            return conexao.execute(select(models.VersaoEsquema.versao)).scalar() or 0
+    except DBAPIError:
+        return 0 # Tabela esquema_versao ainda não existe
+
+
+def _travar(conexao):
+    # Vários workers subindo juntos: um migra, os outros esperam e depois encontram o carimbo em dia.
+    # IF NOT EXISTS e não checkfirst: outro worker pode criar o carimbo entre a conferência e o CREATE
+    carimbo = CreateTable(models.VersaoEsquema.__table__, if_not_exists=True)
+    if conexao.dialect.name == "postgresql":
+        # No Postgres nem o IF NOT EXISTS é seguro em paralelo: a trava vem antes
+        conexao.execute(text("SELECT pg_advisory_xact_lock(hashtext('voleiflow_migracoes'))"))
+        conexao.execute(carimbo)
+    else:
+        # No SQLite o CREATE já é serializado; a primeira escrita abre a transação com a trava de escrita
+        # (o busy_timeout segura quem chega depois)
+        conexao.execute(carimbo)
+        conexao.execute(delete(models.VersaoEsquema).where(models.VersaoEsquema.versao < 0))
+
+
+def migrar(engine) -> int:
+    # Leva o banco até VERSAO_ATUAL; devolve quantos passos rodaram
+    if versao_do_banco(engine) >= VERSAO_ATUAL:
+        return 0
+
+    with engine.begin() as conexao: # Tudo ou nada (DDL é transacional no SQLite e no Postgres)
+        _travar(conexao)
+        versao = conexao.execute(select(models.VersaoEsquema.versao)).scalar()
+        if versao is None:
+            versao = 0
+            conexao.execute(insert(models.VersaoEsquema).values(versao=0))
+        pendentes = [(numero, descricao, passo) for numero, descricao, passo in MIGRACOES if numero > versao]
+        for numero, descricao, passo in pendentes:
+            logger.info("Migração %d: %s", numero, descricao)
+            passo(conexao)
+        if pendentes:
+            conexao.execute(update(models.VersaoEsquema).values(versao=pendentes[-1][0]))
+    return len(pendentes)
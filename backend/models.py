@@ -1,5 +1,5 @@
 # backend/models.py
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 import uuid
@@ -34,14 +34,26 @@ class Partida(Base):
     placar_b = Column(Integer, default=0)
     vencedor = Column(String(1), nullable=True) # 'A', 'B' ou Null
     motivo_fim = Column(String, nullable=True) # 'Pontuacao', 'Cancelada'
+    # Ordem de gravação (persistencia.gravar_resultados): cresce na mesma ordem dos commits,
+    # então serve de cursor para a exportação incremental (?apos=) sem pular partida nenhuma
+    sequencia = Column(Integer, nullable=True)
 
     detalhes = relationship("PartidaHistorico", back_populates="partida")
 
+    # Paginação por cursor do histórico (mais recentes primeiro): (inicio, id) desempata partidas no mesmo instante.
+    # (fim, id): exportação filtrada por ?desde=, na ordem em que as partidas terminaram
+    __table_args__ = (
+        Index("ix_partidas_inicio_id", "inicio", "id"),
+        Index("ix_partidas_quadra_inicio_id", "quadra_id", "inicio", "id"),
+        Index("ix_partidas_fim_id", "fim", "id"),
+        Index("ix_partidas_sequencia", "sequencia", unique=True),
+    )
+
 class PartidaHistorico(Base):
     __tablename__ = "partidas_historico"
 
     id = Column(String, primary_key=True, default=generate_uuid)
-    partida_id = Column(String, ForeignKey("partidas.id"))
+    partida_id = Column(String, ForeignKey("partidas.id"), index=True)
     jogador_id = Column(String, ForeignKey("jogadores.id"))
     time = Column(String(1)) # 'A' ou 'B'
     resultado = Column(String) # 'Vitoria', 'Derrota', 'Empate'
@@ -49,8 +61,74 @@ class PartidaHistorico(Base):
     partida = relationship("Partida", back_populates="detalhes")
     jogador = relationship("Jogador", back_populates="historico")
 
+    # Partidas de um jogador direto do índice (sem ler a linha do histórico)
+    __table_args__ = (
+        Index("ix_partidas_historico_jogador_partida", "jogador_id", "partida_id"),
+    )
+
+class EstatisticaJogador(Base):
+    # Agregado por jogador, atualizado na mesma transação que grava cada partida (persistencia.py).
+    # Pode ser refeito do zero a partir do histórico com recalcular_estatisticas.py.
+    __tablename__ = "estatisticas_jogadores"
+
+    jogador_id = Column(String, ForeignKey("jogadores.id"), primary_key=True)
+    partidas = Column(Integer, default=0, nullable=False)
+    vitorias = Column(Integer, default=0, nullable=False)
+    derrotas = Column(Integer, default=0, nullable=False)
+    empates = Column(Integer, default=0, nullable=False)
+    pontos_pro = Column(Integer, default=0, nullable=False)
+    pontos_contra = Column(Integer, default=0, nullable=False)
+    ultima_partida = Column(DateTime, nullable=True)
+
+    @property
+    def taxa_vitoria(self):
+        return self.vitorias / self.partidas if self.partidas else 0.0
+
+class RatingJogador(Base):
+    # Nível de habilidade (Elo) de cada jogador, atualizado a cada vitória registrada (ranking.py)
+    __tablename__ = "ratings_jogadores"
+
+    jogador_id = Column(String, ForeignKey("jogadores.id"), primary_key=True)
+    rating = Column(Float, nullable=False)
+    partidas = Column(Integer, default=0, nullable=False) # Partidas que contaram para o rating
+    atualizado_em = Column(DateTime, nullable=True)
+
 class Configuracao(Base):
     __tablename__ = "configuracoes"
 
     chave = Column(String, primary_key=True) # Ex: 'PontosMaximos'
-    valor = Column(Integer)
\ No newline at end of file
+    valor = Column(Integer)
+
+class VersaoTabela(Base):
+    # Contador de alterações por tabela, incrementado na mesma transação que a alteração.
+    # O ETag do GET /jogadores/elenco sai daqui: uma linha lida em vez da tabela inteira (elenco.py).
+    __tablename__ = "versoes_tabelas"
+
+    nome = Column(String, primary_key=True) # Ex: 'jogadores'
+    versao = Column(Integer, nullable=False, default=0)
+
+class Avatar(Base):
+    # Imagens de avatar endereçadas pelo conteúdo (sha256): o mesmo arquivo é guardado uma vez só
+    # e a URL /avatares/<hash> nunca muda de conteúdo (avatares.py)
+    __tablename__ = "avatares"
+
+    hash = Column(String(64), primary_key=True)
+    tipo = Column(String, nullable=False) # Ex: 'image/png'
+    conteudo = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+class VersaoEsquema(Base):
+    # Uma linha só: até qual passo de migracoes.py o banco já foi levado (conferida uma vez na subida)
+    __tablename__ = "esquema_versao"
+
+    versao = Column(Integer, primary_key=True, autoincrement=False)
+
+
+# A fila aceita qualquer id (inclusive quem ainda não foi cadastrado) e o resultado da partida é gravado
+# mesmo assim. O SQLite nunca aplicou as chaves estrangeiras para jogadores (PRAGMA foreign_keys fica
+# desligado); no Postgres elas também não são criadas, para o mesmo histórico caber nos dois perfis.
+for _tabela in (PartidaHistorico.__table__, EstatisticaJogador.__table__, RatingJogador.__table__):
+    for _chave in _tabela.foreign_keys:
+        if _chave.target_fullname == "jogadores.id":
+            _chave.constraint.ddl_if(dialect="sqlite")
+
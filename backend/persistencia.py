@@ -0,0 +1,294 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from sqlalchemy import insert
+import models
+import estatisticas
+import ranking
+from database import SessionLocal, insert_ou_atualizar
+
+logger = logging.getLogger("voleiflow.persistencia")
+
+
+@dataclass
+class ResultadoPartida:
+    # Tudo o que uma partida encerrada grava no banco: a linha da Partida e uma linha
+    # de PartidaHistorico por jogador. Os IDs já nascem aqui (UUID gerado no Python),
+    # então não é preciso flush/refresh para descobrir o id da partida.
+    partida: dict
+    historico: list
+
+
+def montar_resultado(quadra_id, jogo, vencedor, motivo_fim, fim=None) -> ResultadoPartida:
+    # vencedor: 'A', 'B' ou None (encerramento manual = Empate para todo mundo)
+    partida_id = models.generate_uuid()
+    partida = {
+        "id": partida_id,
+        "quadra_id": quadra_id,
+        "inicio": datetime.fromisoformat(jogo["inicio"]),
+        "fim": fim or datetime.now(timezone.utc),
+        "placar_a": jogo["placar"]["A"],
+        "placar_b": jogo["placar"]["B"],
+        "vencedor": vencedor,
+        "motivo_fim": motivo_fim,
+    }
+
+    historico = []
+    for time in ("A", "B"):
+        if vencedor is None:
+            resultado = "Empate"
+        else:
+            resultado = "Vitoria" if time == vencedor else "Derrota"
+        for jogador_id in jogo[f"time{time}"]:
+            historico.append({
+                "id": models.generate_uuid(),
+                "partida_id": partida_id,
+                "jogador_id": jogador_id,
+                "time": time,
+                "resultado": resultado,
+            })
+
+    return ResultadoPartida(partida=partida, historico=historico)
+
+
+TABELA_SEQUENCIA = "partidas" # Linha de versoes_tabelas com a última sequencia dada a uma partida
+
+
+def _reservar_sequencias(db, quantidade):
+    # Soma `quantidade` no contador e devolve o primeiro número reservado. É a primeira escrita da
+    # transação e a linha fica travada até o commit (no SQLite, o banco inteiro): quem grava depois
+    # espera e recebe números maiores. Sequência maior = commit depois, então a exportação por ?apos=
+    # nunca pula uma partida que ainda ia aparecer com número menor.
+    versao = models.VersaoTabela
+    ultima = db.execute(
+        insert_ou_atualizar(db, versao).values(nome=TABELA_SEQUENCIA, versao=quantidade)
+        .on_conflict_do_update(index_elements=[versao.nome], set_={"versao": versao.versao + quantidade})
+        .returning(versao.versao)
+    ).scalar_one()
+    return ultima - quantidade + 1
+
+
+def gravar_resultados(db, resultados):
+    # Um INSERT em lote para as partidas, outro para todo o histórico e um para as estatísticas
+    # e para os ratings dos jogadores, numa transação só (o agregado nunca fica diferente do histórico)
+    if not resultados:
+        return
+    primeira = _reservar_sequencias(db, len(resultados))
+    for numero, resultado in enumerate(resultados, start=primeira):
+        resultado.partida["sequencia"] = numero
+    db.execute(insert(models.Partida), [r.partida for r in resultados])
+    historico = [linha for r in resultados for linha in r.historico]
+    if historico:
+        db.execute(insert(models.PartidaHistorico), historico)
+    estatisticas.atualizar(db, resultados)
+    ranking.atualizar(db, resultados)
+    db.commit()
+
+
+def registrar_resultado(db, quadra_id, jogo, vencedor, motivo_fim) -> ResultadoPartida:
+    resultado = montar_resultado(quadra_id, jogo, vencedor, motivo_fim)
+    gravar_resultados(db, [resultado])
+    return resultado
+
+
+LIMITE_FALHAS = 1000 # Resultados esperando a repescagem em memória; o excesso vai para o arquivo
+ESPERA_MAXIMA_REPESCAGEM = 60.0
+
+
+class GravadorResultados:
+    # Gravação "write-behind": o handler atualiza a memória, entrega o resultado aqui e responde na hora.
+    # Uma thread de fundo junta os resultados pendentes e grava em lote, numa transação por lote.
+    #
+    # - A fila é limitada (capacidade). Se o banco ficar tão atrasado que ela encha, quem chega
+    #   grava direto (síncrono) em vez de perder o resultado.
+    # - Lote que falha é repetido com espera crescente; se ainda assim falhar, cada resultado é
+    #   tentado sozinho e só os que continuam falhando vão para `falhas` (aparecem no /saude).
+    # - `falhas` é repescada pela mesma thread, com espera dobrando a cada rodada sem sucesso (a partir
+    #   de `repescagem` segundos); quem grava sai da lista. Passando de `limite_falhas`, os mais antigos
+    #   vão para `arquivo_falhas` (NDJSON, para regravar à mão), assim como o que sobrar no parar().
+    # - parar() esvazia a fila antes de encerrar (chamado no shutdown da API).
+
+    def __init__(self, fabrica_sessao=SessionLocal, capacidade=1000, janela=0.05, lote_maximo=500,
+                 tentativas=5, espera_fila_cheia=1.0, repescagem=1.0, limite_falhas=LIMITE_FALHAS,
+                 arquivo_falhas=None):
+        self._fabrica_sessao = fabrica_sessao
+        self._fila = queue.Queue(maxsize=capacidade)
+        self.janela = janela
+        self.lote_maximo = lote_maximo
+        self.tentativas = tentativas
+        self.espera_fila_cheia = espera_fila_cheia
+        self.repescagem = repescagem
+        self.limite_falhas = limite_falhas
+        self.arquivo_falhas = arquivo_falhas
+        self._espera_repescagem = repescagem
+        self._proxima_repescagem = 0.0
+        self._trava = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self.gravados = 0
+        self.falhas = []
+        self.arquivados = 0
+        self.ultimo_erro = None
+        self.ultima_gravacao = None
+
+    def iniciar(self):
+        with self._trava:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._executar, name="gravador-resultados", daemon=True)
+            self._thread.start()
+
+    def enfileirar(self, resultado: ResultadoPartida):
+        self.iniciar()
+        try:
+            self._fila.put(resultado, timeout=self.espera_fila_cheia)
+        except queue.Full:
+            logger.warning("Fila de gravação cheia, gravando resultado de forma síncrona")
+            with self._fabrica_sessao() as db:
+                gravar_resultados(db, [resultado])
+
+    def pendentes(self) -> int:
+        # Inclui o lote que está sendo gravado neste momento
+        return self._fila.unfinished_tasks
+
+    def descarregar(self, timeout=None) -> bool:
+        # Espera tudo o que já foi enfileirado chegar no banco
+        with self._fila.all_tasks_done:
+            return self._fila.all_tasks_done.wait_for(lambda: self._fila.unfinished_tasks == 0, timeout)
+
+    def parar(self, timeout=10.0):
+        self._parar.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def saude(self) -> dict:
+        return {
+            "gravacoes_pendentes": self.pendentes(),
+            "gravados": self.gravados,
+            "falhas": len(self.falhas),
+            "arquivados": self.arquivados,
+            "ultimo_erro": self.ultimo_erro,
+            "ultima_gravacao": self.ultima_gravacao.isoformat() if self.ultima_gravacao else None,
+        }
+
+    def _executar(self):
+        while not (self._parar.is_set() and self._fila.empty()):
+            self._repescar()
+            try:
+                primeiro = self._fila.get(timeout=0.2)
+            except queue.Empty:
+                continue
+
+            # Junta o que mais chegar durante a janela (ou até encher o lote)
+            lote = [primeiro]
+            limite = time.monotonic() + self.janela
+            while len(lote) < self.lote_maximo:
+                restante = limite - time.monotonic()
+                try:
+                    lote.append(self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._gravar_com_retentativas(lote)
+            finally:
+                for _ in lote:
+                    self._fila.task_done()
+
+        # Encerrando: uma última chance para quem falhou; o que ainda assim não entrar vai para o arquivo
+        self._repescar(forcar=True)
+        self._arquivar(self.falhas)
+        self.falhas = []
+
+    def _gravar(self, lote):
+        with self._fabrica_sessao() as db:
+            gravar_resultados(db, lote)
+        self.gravados += len(lote)
+        self.ultima_gravacao = datetime.now(timezone.utc)
+
+    def _gravar_com_retentativas(self, lote):
+        espera = 0.05
+        for tentativa in range(1, self.tentativas + 1):
+            try:
+                self._gravar(lote)
+                self.ultimo_erro = None
+                return
+            except Exception as erro:
+                self.ultimo_erro = repr(erro)
+                logger.warning("Falha ao gravar lote de %d resultado(s) (tentativa %d): %r", len(lote), tentativa, erro)
+                if tentativa < self.tentativas:
+                    time.sleep(espera)
+                    espera = min(espera * 2, 2.0)
+
+        # O lote inteiro não entrou: isola quem está com problema
+        novas_falhas = []
+        for resultado in lote:
+            try:
+                self._gravar([resultado])
+            except Exception as erro:
+                self.ultimo_erro = repr(erro)
+                novas_falhas.append(resultado)
+                logger.error("Resultado da partida %s não pôde ser gravado: %r", resultado.partida["id"], erro)
+        if not novas_falhas:
+            self.ultimo_erro = None
+            return
+        if not self.falhas:
+            self._espera_repescagem = self.repescagem
+            self._proxima_repescagem = time.monotonic() + self._espera_repescagem
+        self.falhas.extend(novas_falhas)
+        excesso = len(self.falhas) - self.limite_falhas
+        if excesso > 0:
+            self._arquivar(self.falhas[:excesso])
+            del self.falhas[:excesso]
+
+    def _repescar(self, forcar=False):
+        # Tenta de novo, um a um, os resultados em `falhas` (só a thread mexe na lista)
+        if not self.falhas or (not forcar and time.monotonic() < self._proxima_repescagem):
+            return
+        restantes = []
+        for resultado in self.falhas:
+            try:
+                self._gravar([resultado])
+            except Exception as erro:
+                self.ultimo_erro = repr(erro)
+                restantes.append(resultado)
+        if restantes:
+            self._espera_repescagem = min(self._espera_repescagem * 2, ESPERA_MAXIMA_REPESCAGEM)
+        else:
+            self.ultimo_erro = None
+        logger.info("Repescagem: %d de %d resultado(s) gravado(s)", len(self.falhas) - len(restantes), len(self.falhas))
+        self.falhas = restantes
+        self._proxima_repescagem = time.monotonic() + self._espera_repescagem
+
+    def _arquivar(self, resultados):
+        # Sai da repescagem em memória: uma linha NDJSON por resultado (datas em ISO 8601)
+        if not resultados:
+            return
+        self.arquivados += len(resultados)
+        ids = [resultado.partida["id"] for resultado in resultados]
+        if self.arquivo_falhas is None:
+            logger.error("%d resultado(s) descartado(s) sem gravar: %s", len(resultados), ids)
+            return
+        try:
+            with open(self.arquivo_falhas, "a", encoding="utf-8") as arquivo:
+                for resultado in resultados:
+                    linha = {"partida": resultado.partida, "historico": resultado.historico}
+                    arquivo.write(json.dumps(linha, default=datetime.isoformat) + "\n")
+            logger.error("%d resultado(s) não gravado(s) guardado(s) em %s", len(resultados), self.arquivo_falhas)
+        except OSError:
+            logger.exception("Resultados %s não gravados e sem arquivo para guardar", ids)
+
+
+GRAVADOR = GravadorResultados(
+    arquivo_falhas=os.getenv("VOLEIFLOW_RESULTADOS_NAO_GRAVADOS", "./resultados_nao_gravados.ndjson") or None,
+)
+# Garante que nada pendente se perca se o processo sair sem passar pelo shutdown da API
+atexit.register(GRAVADOR.parar)
@@ -0,0 +1,324 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+from sqlalchemy import delete, insert, select
+import models
+from database import SessionLocal, insert_ou_atualizar
+
+logger = logging.getLogger("voleiflow.ranking")
+
+# Ranking por Elo de time: o rating de um time é a média dos ratings dos seus jogadores.
+# O vencedor ganha FATOR_K * (1 - esperado) pontos, que cada jogador do time perdedor perde.
+# Só partidas com vencedor contam (encerramento manual não mexe no rating).
+RATING_INICIAL = 1500.0
+FATOR_K = 32.0
+
+
+def esperado_time_a(media_a, media_b):
+    return 1.0 / (1.0 + 10.0 ** ((media_b - media_a) / 400.0))
+
+
+def _partidas_dos_resultados(resultados):
+    # persistencia.ResultadoPartida -> {"vencedor", "A": [ids], "B": [ids]}, na ordem em que terminaram
+    partidas = []
+    for resultado in sorted(resultados, key=lambda r: r.partida["fim"]):
+        if resultado.partida["vencedor"] not in ("A", "B"):
+            continue
+        partida = {"vencedor": resultado.partida["vencedor"], "A": [], "B": []}
+        for linha in resultado.historico:
+            partida[linha["time"]].append(linha["jogador_id"])
+        partidas.append(partida)
+    return partidas
+
+
+def variacoes(partidas, atuais):
+    # Aplica as partidas em ordem sobre os ratings `atuais` ({jogador_id: rating}).
+    # Devolve ({jogador_id: variação}, {jogador_id: partidas contadas}).
+    variacao = {}
+    contadas = {}
+
+    def rating(jogador_id):
+        return atuais.get(jogador_id, RATING_INICIAL) + variacao.get(jogador_id, 0.0)
+
+    for partida in partidas:
+        time_a, time_b = partida["A"], partida["B"]
+        if not time_a or not time_b:
+            continue
+        media_a = sum(rating(j) for j in time_a) / len(time_a)
+        media_b = sum(rating(j) for j in time_b) / len(time_b)
+        ganho_a = FATOR_K * ((1.0 if partida["vencedor"] == "A" else 0.0) - esperado_time_a(media_a, media_b))
+        for jogador_id, ganho in [(j, ganho_a) for j in time_a] + [(j, -ganho_a) for j in time_b]:
+            variacao[jogador_id] = variacao.get(jogador_id, 0.0) + ganho
+            contadas[jogador_id] = contadas.get(jogador_id, 0) + 1
+    return variacao, contadas
+
+
+def _aplicar(db, partidas):
+    if not partidas:
+        return
+    ids = {j for partida in partidas for j in partida["A"] + partida["B"]}
+    atuais = dict(db.execute(
+        select(models.RatingJogador.jogador_id, models.RatingJogador.rating)
+        .where(models.RatingJogador.jogador_id.in_(ids))
+    ).all())
+    variacao, contadas = variacoes(partidas, atuais)
+    if not variacao:
+        return
+
+    # Soma a variação no banco (rating = rating + variação) em vez de gravar o valor lido:
+    # duas gravações ao mesmo tempo nunca apagam a variação uma da outra.
+    agora = datetime.now(timezone.utc)
+    linhas = [{"jogador_id": j, "rating": RATING_INICIAL + variacao[j], "partidas": contadas[j], "atualizado_em": agora}
+              for j in variacao]
+    tabela = models.RatingJogador.__table__
+    comando = insert_ou_atualizar(db, models.RatingJogador)
+    novos = comando.excluded
+    db.execute(comando.on_conflict_do_update(index_elements=[tabela.c.jogador_id], set_={
+        # Na linha nova o rating é INICIAL + variação, então a variação é excluded.rating - INICIAL
+        "rating": tabela.c.rating + (novos.rating - RATING_INICIAL),
+        "partidas": tabela.c.partidas + novos.partidas,
+        "atualizado_em": novos.atualizado_em,
+    }), linhas)
+
+
+def atualizar(db, resultados):
+    # Chamado por persistencia.gravar_resultados, dentro da transação que grava as partidas. Não faz commit.
+    _aplicar(db, _partidas_dos_resultados(resultados))
+
+
+# --- Recalculo completo (NumPy) ---
+
+def _carregar_historico(db, lote=10000):
+    # Uma linha por jogador por partida com vencedor, em ordem cronológica, já em arrays
+    consulta = (
+        select(models.PartidaHistorico.partida_id, models.PartidaHistorico.jogador_id,
+               models.PartidaHistorico.time, models.Partida.vencedor)
+        .join(models.Partida, models.Partida.id == models.PartidaHistorico.partida_id)
+        .where(models.Partida.vencedor.in_(["A", "B"]))
+        .order_by(models.Partida.fim, models.Partida.id)
+        .execution_options(yield_per=lote)
+    )
+    colunas = ([], [], [], [])
+    # Direto na conexão (Core), sem passar pelo processamento de linhas do ORM
+    for bloco in db.connection().execute(consulta).partitions():
+        for coluna, valores in zip(colunas, zip(*bloco)):
+            coluna.extend(valores)
+    partidas, jogadores, times, vencedores = (np.array(c, dtype=object) for c in colunas)
+    return partidas, jogadores, times, vencedores
+
+
+# Abaixo desta média de partidas por onda, o laço compacto ganha das operações NumPy por onda
+LARGURA_MINIMA_ONDA = 8
+
+
+def calcular_ratings(partida_da_linha, jogador_da_linha, lado_da_linha, vitoria_a, quantidade_jogadores,
+                     inicial=RATING_INICIAL, k=FATOR_K, largura_minima_onda=LARGURA_MINIMA_ONDA):
+    # Elo de todo o histórico. Entradas (uma posição por linha de histórico, partidas em ordem cronológica):
+    #   partida_da_linha: índice da partida (0..P-1, não decrescente)
+    #   jogador_da_linha: índice do jogador (0..J-1)
+    #   lado_da_linha:    0 = time A, 1 = time B
+    #   vitoria_a:        por partida, 1.0 se o time A venceu, 0.0 se perdeu
+    #
+    # O Elo é sequencial (cada partida depende das anteriores dos mesmos jogadores), mas partidas sem
+    # jogador em comum podem ser calculadas juntas. As partidas são agrupadas em "ondas": a onda de uma
+    # partida é uma a mais que a última onda de qualquer um dos seus jogadores. Dentro da onda ninguém se
+    # repete, então a onda inteira vira um punhado de operações NumPy, com o mesmo resultado do cálculo
+    # partida a partida. Com poucas quadras as ondas são estreitas (2 partidas por onda numa noite com
+    # 2 quadras) e o custo fixo de cada chamada NumPy domina: aí o cálculo segue partida a partida,
+    # num laço sobre listas de inteiros já preparadas em lote pelo NumPy.
+    if len(partida_da_linha) == 0:
+        return np.full(quantidade_jogadores, inicial, dtype=np.float64)
+
+    # Linhas em ordem (partida, lado): em cada partida o time A vem antes do B
+    ordem = np.lexsort((lado_da_linha, partida_da_linha))
+    partida_da_linha, jogador_da_linha, lado_da_linha = (
+        partida_da_linha[ordem], jogador_da_linha[ordem], lado_da_linha[ordem])
+    inicios = np.flatnonzero(np.r_[True, partida_da_linha[1:] != partida_da_linha[:-1]])
+    fins = np.r_[inicios[1:], len(partida_da_linha)]
+    meios = inicios + np.bincount(partida_da_linha, weights=lado_da_linha == 0).astype(np.int64)
+
+    # Onda de cada partida (só inteiros em listas Python: é a parte que não dá para vetorizar)
+    jogadores = jogador_da_linha.tolist()
+    ultima_onda = [-1] * quantidade_jogadores
+    onda_da_partida = []
+    for inicio, fim in zip(inicios.tolist(), fins.tolist()):
+        elenco = jogadores[inicio:fim]
+        onda = max([ultima_onda[j] for j in elenco]) + 1
+        for j in elenco:
+            ultima_onda[j] = onda
+        onda_da_partida.append(onda)
+    onda_da_partida = np.array(onda_da_partida, dtype=np.int64)
+
+    if len(inicios) / (onda_da_partida.max() + 1) < largura_minima_onda:
+        return _calcular_partida_a_partida(jogadores, inicios, meios, fins, vitoria_a, quantidade_jogadores, inicial, k)
+    return _calcular_por_ondas(onda_da_partida, partida_da_linha, jogador_da_linha, lado_da_linha,
+                               vitoria_a, quantidade_jogadores, inicial, k)
+
+
+def _calcular_partida_a_partida(jogadores, inicios, meios, fins, vitoria_a, quantidade_jogadores, inicial, k):
+    ratings = [inicial] * quantidade_jogadores
+    for inicio, meio, fim, vitoria in zip(inicios.tolist(), meios.tolist(), fins.tolist(), vitoria_a.tolist()):
+        time_a, time_b = jogadores[inicio:meio], jogadores[meio:fim]
+        media_a = sum([ratings[j] for j in time_a]) / len(time_a)
+        media_b = sum([ratings[j] for j in time_b]) / len(time_b)
+        ganho_a = k * (vitoria - esperado_time_a(media_a, media_b))
+        for j in time_a:
+            ratings[j] += ganho_a
+        for j in time_b:
+            ratings[j] -= ganho_a
+    return np.array(ratings, dtype=np.float64)
+
+
+def _calcular_por_ondas(onda_da_partida, partida_da_linha, jogador_da_linha, lado_da_linha,
+                        vitoria_a, quantidade_jogadores, inicial, k):
+    ratings = np.full(quantidade_jogadores, inicial, dtype=np.float64)
+
+    # Tudo o que não depende dos ratings é preparado uma vez só: linhas em ordem (onda, partida, lado),
+    # onde começa cada time e a que time pertence cada linha
+    onda_da_linha = onda_da_partida[partida_da_linha]
+    ordem = np.argsort(onda_da_linha, kind="stable")
+    jogador_ordenado = jogador_da_linha[ordem]
+    time_ordenado = (partida_da_linha * 2 + lado_da_linha)[ordem]
+    inicio_time = np.flatnonzero(np.r_[True, time_ordenado[1:] != time_ordenado[:-1]])
+    tamanho_time = np.diff(np.r_[inicio_time, len(time_ordenado)])
+    time_da_linha = np.repeat(np.arange(len(inicio_time)), tamanho_time)
+    vitoria_por_par = vitoria_a[time_ordenado[inicio_time[0::2]] // 2]
+    sinal_do_time = np.tile([1.0, -1.0], len(inicio_time) // 2)
+    limite_times = np.searchsorted(onda_da_partida[time_ordenado[inicio_time] // 2], np.arange(onda_da_partida.max() + 2))
+    limite_linhas = np.r_[inicio_time, len(time_ordenado)][limite_times]
+
+    for onda in range(len(limite_times) - 1):
+        primeiro_time, ultimo_time = limite_times[onda], limite_times[onda + 1]
+        primeira_linha, ultima_linha = limite_linhas[onda], limite_linhas[onda + 1]
+        elenco = jogador_ordenado[primeira_linha:ultima_linha]
+        medias = (np.add.reduceat(ratings[elenco], inicio_time[primeiro_time:ultimo_time] - primeira_linha)
+                  / tamanho_time[primeiro_time:ultimo_time])
+        esperado = 1.0 / (1.0 + 10.0 ** ((medias[1::2] - medias[0::2]) / 400.0))
+        ganho_a = k * (vitoria_por_par[primeiro_time // 2:ultimo_time // 2] - esperado)
+        ganho_time = np.repeat(ganho_a, 2) * sinal_do_time[primeiro_time:ultimo_time]
+        ratings[elenco] += ganho_time[time_da_linha[primeira_linha:ultima_linha] - primeiro_time]
+    return ratings
+
+
+def _numerar_partidas(partidas):
+    # Linhas de uma mesma partida vêm juntas: índice 0..P-1 por linha e a máscara da primeira linha de cada uma
+    primeira = np.r_[True, partidas[1:] != partidas[:-1]]
+    return np.cumsum(primeira) - 1, primeira
+
+
+def recalcular(db):
+    # Refaz a tabela ratings_jogadores inteira a partir do histórico. O cálculo roda sem transação
+    # de escrita aberta; só a troca da tabela é uma transação curta.
+    partidas, jogadores, times, vencedores = _carregar_historico(db)
+    linhas = []
+    ids_partidas = set()
+
+    if len(partidas):
+        partida_da_linha, _ = _numerar_partidas(partidas)
+        lado_da_linha = (times == "B").astype(np.int64)
+
+        # Partidas com um time vazio (histórico incompleto) não têm como ser avaliadas
+        por_lado = np.bincount(partida_da_linha * 2 + lado_da_linha, minlength=2 * (partida_da_linha[-1] + 1))
+        validas = (por_lado.reshape(-1, 2) > 0).all(axis=1)[partida_da_linha]
+        partidas, jogadores, vencedores, lado_da_linha = (
+            coluna[validas] for coluna in (partidas, jogadores, vencedores, lado_da_linha))
+
+    if len(partidas):
+        partida_da_linha, primeira = _numerar_partidas(partidas)
+        vitoria_a = (vencedores[primeira] == "A").astype(np.float64)
+        ids_jogadores, jogador_da_linha = np.unique(jogadores, return_inverse=True)
+
+        ratings = calcular_ratings(partida_da_linha, jogador_da_linha, lado_da_linha, vitoria_a, len(ids_jogadores))
+        contadas = np.bincount(jogador_da_linha, minlength=len(ids_jogadores))
+
+        agora = datetime.now(timezone.utc)
+        linhas = [{"jogador_id": j, "rating": r, "partidas": c, "atualizado_em": agora}
+                  for j, r, c in zip(ids_jogadores.tolist(), ratings.tolist(), contadas.tolist())]
+        ids_partidas = set(partidas[primeira].tolist())
+
+    # A troca: apaga, grava o recalculado e soma por cima as partidas que chegaram durante o cálculo
+    db.execute(delete(models.RatingJogador))
+    if linhas:
+        db.execute(insert(models.RatingJogador), linhas)
+    _aplicar(db, _partidas_novas(db, ids_partidas))
+    db.commit()
+    return len(linhas), len(ids_partidas)
+
+
+def _partidas_novas(db, ja_calculadas):
+    # Partidas com vencedor gravadas depois que o histórico foi lido (só os ids são comparados)
+    ids = db.execute(select(models.Partida.id).where(models.Partida.vencedor.in_(["A", "B"]))).scalars().all()
+    novas_ids = [partida_id for partida_id in ids if partida_id not in ja_calculadas]
+    if not novas_ids:
+        return []
+    consulta = (
+        select(models.Partida.id, models.Partida.vencedor, models.PartidaHistorico.jogador_id, models.PartidaHistorico.time)
+        .join(models.PartidaHistorico, models.PartidaHistorico.partida_id == models.Partida.id)
+        .where(models.Partida.id.in_(novas_ids))
+        .order_by(models.Partida.fim, models.Partida.id)
+    )
+    novas = {}
+    for partida_id, vencedor, jogador_id, time in db.execute(consulta):
+        partida = novas.setdefault(partida_id, {"vencedor": vencedor, "A": [], "B": []})
+        partida[time].append(jogador_id)
+    return list(novas.values())
+
+
+class RecalculoRanking:
+    # Roda recalcular() numa thread separada, com sessão própria: a API continua atendendo
+    # (inclusive gravando partidas novas, que entram no resultado no fim do recálculo).
+
+    def __init__(self, fabrica_sessao=SessionLocal):
+        self._fabrica_sessao = fabrica_sessao
+        self._trava = threading.Lock()
+        self._thread = None
+        self.iniciado_em = None
+        self.duracao = None
+        self.jogadores = None
+        self.partidas = None
+        self.erro = None
+
+    def rodando(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def iniciar(self) -> bool:
+        # False se já tem um recálculo em andamento
+        with self._trava:
+            if self.rodando():
+                return False
+            self.iniciado_em = datetime.now(timezone.utc)
+            self.erro = None
+            self._thread = threading.Thread(target=self._executar, name="recalculo-ranking", daemon=True)
+            self._thread.start()
+            return True
+
+    def aguardar(self, timeout=None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _executar(self):
+        inicio = time.perf_counter()
+        try:
+            with self._fabrica_sessao() as db:
+                self.jogadores, self.partidas = recalcular(db)
+        except Exception as erro:
+            self.erro = repr(erro)
+            logger.exception("Falha ao recalcular o ranking")
+        finally:
+            self.duracao = time.perf_counter() - inicio
+
+    def situacao(self) -> dict:
+        return {
+            "rodando": self.rodando(),
+            "iniciado_em": self.iniciado_em.isoformat() if self.iniciado_em else None,
+            "duracao_segundos": self.duracao,
+            "jogadores": self.jogadores,
+            "partidas": self.partidas,
+            "erro": self.erro,
+        }
+
+
+RECALCULO = RecalculoRanking()
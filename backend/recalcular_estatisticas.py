@@ -0,0 +1,11 @@
+# backend/recalcular_estatisticas.py
+from database import engine, SessionLocal
+import migracoes
+import estatisticas
+
+# Refaz a tabela estatisticas_jogadores a partir do histórico de partidas (uma passada só).
+# Útil depois de corrigir o histórico na mão ou para conferir o agregado incremental.
+migracoes.migrar(engine)
+with SessionLocal() as db:
+    jogadores = estatisticas.recalcular(db)
+print(f"Estatísticas recalculadas para {jogadores} jogador(es)!")
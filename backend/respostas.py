@@ -0,0 +1,33 @@
+import orjson
+from fastapi.responses import Response
+import estado
+
+# Caminho rápido de resposta para os endpoints quentes (/estado, /fila/*, /quadras/*).
+# Devolver um dict faz o FastAPI passar tudo pelo jsonable_encoder (que percorre o objeto inteiro em
+# Python) e depois pelo json da biblioteca padrão. Aqui o dict vai direto para o orjson.
+# Quem manda "Prefer: return=minimal" (RFC 7240) nas mutações recebe só {"ok", "versao"}: a fila e
+# as quadras novas chegam pelo stream, então devolver a fila inteira a cada toque é desperdício.
+
+OPCOES = orjson.OPT_NON_STR_KEYS # As quadras são chaves int em ESTADO_MEMORIA["jogos"]
+
+
+def dumps(conteudo) -> bytes:
+    return orjson.dumps(conteudo, option=OPCOES)
+
+
+class RespostaJSON(Response):
+    media_type = "application/json"
+
+    def render(self, conteudo) -> bytes:
+        return dumps(conteudo)
+
+
+def quer_compacta(prefer):
+    # Valor do cabeçalho Prefer (pode trazer várias preferências separadas por vírgula)
+    return bool(prefer) and "return=minimal" in (parte.strip() for parte in prefer.split(","))
+
+
+def confirmacao(t):
+    # Resposta compacta de uma mutação: a versão publicada pela transação (ou a atual, se nada mudou)
+    versao = t.versao if t.versao is not None else estado.versao_atual()
+    return RespostaJSON({"ok": True, "versao": versao}, headers={"Preference-Applied": "return=minimal"})
@@ -1,14 +1,21 @@
 # backend/schemas.py
-from pydantic import BaseModel, ConfigDict
-from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from datetime import datetime, timezone
 from typing import Optional
 
 class ConfiguracaoBase(BaseModel):
     chave: str
     valor: int
 
+# Chaves que não fazem sentido abaixo de 1 (0 quadras fecharia todas, time de 0 nunca forma jogo)
+CHAVES_MINIMO_UM = ("QuantidadeQuadras", "TamanhoTime")
+
 class ConfiguracaoCreate(ConfiguracaoBase):
-    pass
+    @model_validator(mode="after")
+    def validar_minimo(self):
+        if self.chave in CHAVES_MINIMO_UM and self.valor < 1:
+            raise ValueError(f"{self.chave} precisa ser pelo menos 1")
+        return self
 
 class ConfiguracaoResponse(ConfiguracaoBase):
     # O jeito moderno do Pydantic V2 de ler dados do SQLAlchemy
@@ -25,6 +32,13 @@ class JogadorBase(BaseModel):
 class JogadorCreate(JogadorBase):
     pass
 
+class JogadorImportado(JogadorCreate):
+    # Linha do POST /jogadores/importar. Num backup do GET /jogadores/exportar estes campos vêm junto
+    # e são mantidos; num cadastro novo ficam os mesmos padrões do POST /jogadores.
+    is_ativo: bool = True
+    is_presente: bool = False
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
 class JogadorResponse(JogadorBase):
     id: str
     is_ativo: bool
@@ -41,4 +55,52 @@ class JogadorUpdate(BaseModel):
 
 class JogadorStatusUpdate(BaseModel):
     is_ativo: Optional[bool] = None
-    is_presente: Optional[bool] = None
\ No newline at end of file
+    is_presente: Optional[bool] = None
+
+class JogadorPresencaLote(BaseModel):
+    ids: list[str]
+    is_presente: bool
+
+class EstatisticaJogadorResponse(BaseModel):
+    jogador_id: str
+    partidas: int
+    vitorias: int
+    derrotas: int
+    empates: int
+    pontos_pro: int
+    pontos_contra: int
+    taxa_vitoria: float
+    ultima_partida: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class RankingJogadorResponse(BaseModel):
+    jogador_id: str
+    nome: Optional[str] = None
+    rating: float
+    partidas: int
+
+
+class ParticipantePartidaResponse(BaseModel):
+    jogador_id: str
+    nome: Optional[str] = None
+    time: str
+    resultado: Optional[str] = None
+
+
+class PartidaResponse(BaseModel):
+    id: str
+    quadra_id: Optional[int] = None
+    inicio: Optional[datetime] = None
+    fim: Optional[datetime] = None
+    placar_a: Optional[int] = None
+    placar_b: Optional[int] = None
+    vencedor: Optional[str] = None
+    motivo_fim: Optional[str] = None
+    participantes: list[ParticipantePartidaResponse]
+
+
+class PaginaPartidasResponse(BaseModel):
+    partidas: list[PartidaResponse]
+    proximo_cursor: Optional[str] = None # None = última página
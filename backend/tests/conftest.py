@@ -0,0 +1,19 @@
+from datetime import datetime
+from database import engine
+import migracoes
+
+# A API só confere o esquema no lifespan, e boa parte dos testes usa o TestClient sem "with"
+# (sem lifespan): o banco dos testes é levado até a versão atual uma vez, aqui.
+migracoes.migrar(engine)
+
+
+def jogo_rodando(time_a, time_b, placar=(21, 19), inicio="2026-03-01T20:00:00+00:00"):
+    # Jogo em andamento como fica em ESTADO_MEMORIA["jogos"] (inicio em texto ISO ou datetime)
+    return {
+        "status": "JOGANDO",
+        "inicio": inicio.isoformat() if isinstance(inicio, datetime) else inicio,
+        "placar": {"A": placar[0], "B": placar[1]},
+        "timeA": time_a,
+        "timeB": time_b,
+        "vitoriasConsecutivas": {"A": 0, "B": 0}
+    }
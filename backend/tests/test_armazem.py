@@ -0,0 +1,134 @@
+import multiprocessing
+import random
+import threading
+import time
+from fastapi.testclient import TestClient
+from armazem import ArmazemSQLite
+from configuracoes import Configuracoes
+import comandos
+import estado
+
+JOGADORES_POR_WORKER = 12
+RODADAS_POR_WORKER = 60
+
+def _trabalhador(caminho, nome, semente):
+    # Roda num processo separado, como um worker do uvicorn: a única coisa em comum é o arquivo do armazém
+    estado.ligar_armazem(ArmazemSQLite(caminho))
+    sorteio = random.Random(semente)
+    config = Configuracoes({"TamanhoTime": 2, "MaxVitorias": 2})
+    try:
+        for i in range(JOGADORES_POR_WORKER):
+            with estado.transacao(quadras=[]) as t:
+                comandos.entrar_na_fila(t, f"{nome}-{i}")
+        for _ in range(RODADAS_POR_WORKER):
+            quadra_id = sorteio.choice([1, 2])
+            try:
+                if sorteio.random() < 0.5:
+                    selecionados = estado.primeiros_da_fila(4)
+                    with estado.transacao(quadras=[quadra_id]) as t:
+                        comandos.iniciar_partida(t, quadra_id, selecionados, selecionados[:2], selecionados[2:])
+                else:
+                    with estado.transacao(quadras=[quadra_id]) as t:
+                        comandos.registrar_vitoria(t, quadra_id, sorteio.choice("AB"), None, None, config)
+            except comandos.ComandoInvalido:
+                pass # Quadra ocupada/vazia ou outro worker puxou a fila antes: recusa normal
+            with estado.transacao(quadras=[]) as t:
+                comandos.mover_para_final(t, f"{nome}-{sorteio.randrange(JOGADORES_POR_WORKER)}")
+    finally:
+        estado.desligar_armazem()
+
+def _entrar(jogador_id):
+    with estado.transacao(quadras=[]) as t:
+        comandos.entrar_na_fila(t, jogador_id)
+
+def _todos_os_lugares(foto):
+    lugares = list(foto["fila"])
+    for jogo in foto["jogos"].values():
+        if jogo:
+            lugares += jogo["timeA"] + jogo["timeB"]
+    return lugares
+
+def test_varios_workers_compartilham_um_estado_so(tmp_path):
+    caminho = str(tmp_path / "estado.db")
+    armazem = ArmazemSQLite(caminho, foto_a_cada=50, manter_deltas=20)
+    armazem.semear({"versao": 0, "fila": [], "jogos": {1: None, 2: None}})
+
+    contexto = multiprocessing.get_context("spawn")
+    nomes = [f"w{n}" for n in range(4)]
+    processos = [contexto.Process(target=_trabalhador, args=(caminho, nome, semente))
+                 for semente, nome in enumerate(nomes)]
+    for processo in processos:
+        processo.start()
+    for processo in processos:
+        processo.join(120)
+        assert processo.exitcode == 0
+
+    # Reconstrói o estado a partir do armazém: cada jogador de cada worker aparece exatamente uma vez
+    final = estado.EstadoMemoria()
+    foto, deltas = armazem.carregar()
+    final["fila"] = foto["fila"]
+    final["jogos"] = foto["jogos"]
+    versao = foto["versao"]
+    for delta in deltas:
+        assert delta["versao"] == versao + 1 # Nenhuma versão repetida ou pulada entre os workers
+        versao = delta["versao"]
+        for op in delta["ops"]:
+            estado.aplicar_operacao(final, op)
+
+    esperados = sorted(f"{nome}-{i}" for nome in nomes for i in range(JOGADORES_POR_WORKER))
+    lugares = _todos_os_lugares({"fila": final["fila"].como_lista(), "jogos": final["jogos"]})
+    assert sorted(lugares) == esperados
+    assert versao > len(esperados)
+    armazem.fechar()
+
+def test_api_enxerga_o_que_outro_worker_gravou(tmp_path):
+    from main import app
+    client = TestClient(app)
+    caminho = str(tmp_path / "estado.db")
+    estado.ligar_armazem(ArmazemSQLite(caminho))
+    try:
+        client.post("/fila/entrar", json={"jogador_id": "local-1"})
+        versao = client.get("/estado").json()["versao"]
+
+        # Outro "worker" grava direto no armazém
+        outro = ArmazemSQLite(caminho)
+        outro.abrir_escrita()
+        assert outro.novos_deltas(versao - 1)[0]["ops"] == [{"op": "fila.entrar", "jogador_id": "local-1"}]
+        outro.confirmar({"versao": versao + 1, "ops": [{"op": "fila.entrar", "jogador_id": "remoto-1"}]}, None)
+        outro.fechar()
+
+        resp = client.get("/estado").json()
+        assert resp["versao"] == versao + 1
+        assert resp["fila"][-2:] == ["local-1", "remoto-1"]
+
+        # A próxima escrita local continua a numeração global
+        client.post("/fila/sair", json={"jogador_id": "local-1"})
+        assert client.get(f"/estado?desde={versao + 1}").json()["deltas"][0]["versao"] == versao + 2
+    finally:
+        estado.desligar_armazem()
+
+def test_escrita_esperando_outro_worker_nao_segura_as_travas_locais(tmp_path):
+    caminho = str(tmp_path / "estado.db")
+    estado.ligar_armazem(ArmazemSQLite(caminho))
+    outro = ArmazemSQLite(caminho)
+    try:
+        # Outro worker fica com a trava de escrita do arquivo
+        outro.abrir_escrita()
+        escrevendo = threading.Thread(target=_entrar, args=("esperando-1",))
+        escrevendo.start()
+        time.sleep(0.2)
+        assert escrevendo.is_alive() # Esperando o BEGIN IMMEDIATE
+
+        # Enquanto isso as leituras deste processo (que pegam todas as travas locais) seguem
+        inicio = time.monotonic()
+        foto = estado.snapshot()
+        assert time.monotonic() - inicio < 0.5
+        assert "esperando-1" not in foto["fila"]
+
+        outro.fechar_escrita()
+        escrevendo.join(5)
+        assert not escrevendo.is_alive()
+        assert "esperando-1" in estado.snapshot()["fila"]
+    finally:
+        outro.fechar()
+        estado.desligar_armazem()
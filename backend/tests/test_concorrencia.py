@@ -0,0 +1,127 @@
+import asyncio
+import json
+import random
+import threading
+import pytest
+from fastapi import HTTPException
+from main import (
+    ESTADO_MEMORIA, iniciar_partida, registrar_vitoria, encerrar_partida_manual, substituir_jogador,
+    atualizar_placar, embaralhar_fila, mover_para_final, VitoriaRequest, SubstituicaoRequest,
+    PlacarRequest, FilaAcaoRequest,
+)
+from database import SessionLocal
+import comandos
+import estado
+
+JOGADORES = [f"stress-{i}" for i in range(40)]
+
+def _todos_os_lugares(foto):
+    # Cada jogador aparece em exatamente um lugar: na fila ou em um dos times de uma quadra
+    lugares = list(foto["fila"])
+    for jogo in foto["jogos"].values():
+        if jogo:
+            lugares += jogo["timeA"] + jogo["timeB"]
+    return lugares
+
+def _acao_aleatoria(sorteio):
+    quadra_id = sorteio.choice([1, 2, 3])
+    acao = sorteio.random()
+    try:
+        if acao < 0.25:
+            with SessionLocal() as db:
+                iniciar_partida(quadra_id, db)
+        elif acao < 0.45:
+            registrar_vitoria(quadra_id, VitoriaRequest(time_vencedor=sorteio.choice("AB")))
+        elif acao < 0.55:
+            encerrar_partida_manual(quadra_id)
+        elif acao < 0.7:
+            jogo = ESTADO_MEMORIA["jogos"].get(quadra_id)
+            fila = estado.primeiros_da_fila(3)
+            if jogo and fila:
+                # Leitura propositalmente "velha": o comando precisa revalidar dentro da trava
+                substituir_jogador(quadra_id, SubstituicaoRequest(
+                    id_saindo=sorteio.choice(jogo["timeA"] + jogo["timeB"]), id_entrando=sorteio.choice(fila)))
+        elif acao < 0.85:
+            atualizar_placar(quadra_id, PlacarRequest(time=sorteio.choice("AB"), delta=1))
+        elif acao < 0.92:
+            embaralhar_fila()
+        else:
+            mover_para_final(FilaAcaoRequest(jogador_id=sorteio.choice(JOGADORES)))
+    except (HTTPException, comandos.ComandoInvalido):
+        pass # Recusa legítima (quadra vazia, fila curta...): o que importa é o estado continuar íntegro
+
+def test_estresse_concorrente_mantem_cada_jogador_em_um_lugar_so():
+    estado.ajustar_quadras(3)
+    ESTADO_MEMORIA["jogos"] = {1: None, 2: None, 3: None}
+    ESTADO_MEMORIA["fila"] = list(JOGADORES)
+
+    loop = asyncio.new_event_loop()
+    assinante, inicial = estado.assinar(loop, limite=100_000)
+    parar_leitura = threading.Event()
+    leituras_quebradas = []
+    erros = []
+
+    def ler_sem_trava():
+        # /estado é servido sem trava a partir do corpo imutável da versão: nunca pode sair pela metade
+        while not parar_leitura.is_set():
+            _, corpo, _ = estado.estado_serializado()
+            lugares = _todos_os_lugares(json.loads(corpo))
+            if sorted(lugares) != sorted(JOGADORES):
+                leituras_quebradas.append(lugares)
+
+    def trabalhar(semente):
+        sorteio = random.Random(semente)
+        try:
+            for _ in range(150):
+                _acao_aleatoria(sorteio)
+        except Exception as erro:
+            erros.append(erro) # Exceção numa thread não derruba o teste sozinha
+
+    try:
+        leitor = threading.Thread(target=ler_sem_trava)
+        leitor.start()
+        threads = [threading.Thread(target=trabalhar, args=(semente,)) for semente in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        parar_leitura.set()
+        leitor.join()
+
+        assert erros == []
+        final = estado.snapshot()
+        assert sorted(_todos_os_lugares(final)) == sorted(JOGADORES)
+        assert leituras_quebradas == []
+
+        # Os deltas, aplicados em ordem sobre o snapshot inicial, chegam exatamente no estado final
+        replica = estado.EstadoMemoria()
+        replica["fila"] = inicial["fila"]
+        replica["jogos"] = inicial["jogos"]
+        versoes = [delta["versao"] for delta in assinante.pendentes]
+        assert versoes == list(range(inicial["versao"] + 1, final["versao"] + 1))
+        for delta in assinante.pendentes:
+            for op in delta["ops"]:
+                estado.aplicar_operacao(replica, op)
+        assert replica["fila"].como_lista() == final["fila"]
+        assert replica["jogos"] == final["jogos"]
+    finally:
+        parar_leitura.set()
+        estado.cancelar_assinatura(assinante)
+        loop.close()
+        ESTADO_MEMORIA["jogos"] = {1: None, 2: None, 3: None}
+        estado.ajustar_quadras(2)
+
+def test_iniciar_recusa_quando_a_fila_mudou_dentro_da_trava():
+    ESTADO_MEMORIA["jogos"] = {1: None, 2: None}
+    ESTADO_MEMORIA["fila"] = [f"corrida-{i}" for i in range(8)]
+    selecionados = estado.primeiros_da_fila(8)
+
+    # Outra requisição tirou alguém da frente da fila depois da leitura
+    with estado.transacao(quadras=[]) as t:
+        t.sair_da_fila("corrida-0")
+
+    with pytest.raises(comandos.FilaMudou):
+        with estado.transacao(quadras=[1]) as t:
+            comandos.iniciar_partida(t, 1, selecionados, selecionados[:4], selecionados[4:])
+    assert ESTADO_MEMORIA["jogos"][1] is None
+    assert ESTADO_MEMORIA["fila"].como_lista() == [f"corrida-{i}" for i in range(1, 8)]
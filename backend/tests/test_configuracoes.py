@@ -0,0 +1,84 @@
+import pytest
+from fastapi.testclient import TestClient
+from main import app, ESTADO_MEMORIA
+import estado
+from database import SessionLocal
+from configuracoes import CACHE_CONFIGURACOES, CacheConfiguracoes, Configuracoes, PADRAO_TAMANHO_TIME
+import models
+
+client = TestClient(app)
+
+def _valor_em(lista, chave):
+    return next((item["valor"] for item in lista if item["chave"] == chave), None)
+
+def test_post_atualiza_o_cache_write_through():
+    client.post("/configuracoes", json={"chave": "TesteCache", "valor": 7})
+    assert _valor_em(client.get("/configuracoes").json(), "TesteCache") == 7
+
+    client.post("/configuracoes", json={"chave": "TesteCache", "valor": 8})
+    assert _valor_em(client.get("/configuracoes").json(), "TesteCache") == 8
+
+def test_alteracao_externa_so_aparece_depois_de_recarregar():
+    client.post("/configuracoes", json={"chave": "TesteExterno", "valor": 1})
+
+    # Alguém muda o banco por fora da API
+    with SessionLocal() as db:
+        db.query(models.Configuracao).filter(models.Configuracao.chave == "TesteExterno").update({"valor": 2})
+        db.commit()
+
+    assert _valor_em(client.get("/configuracoes").json(), "TesteExterno") == 1
+
+    resp = client.post("/configuracoes/recarregar")
+    assert resp.status_code == 200
+    assert _valor_em(resp.json(), "TesteExterno") == 2
+    assert _valor_em(client.get("/configuracoes").json(), "TesteExterno") == 2
+
+def test_invalidar_forca_nova_leitura():
+    client.post("/configuracoes", json={"chave": "TesteInvalidar", "valor": 1})
+    with SessionLocal() as db:
+        db.query(models.Configuracao).filter(models.Configuracao.chave == "TesteInvalidar").update({"valor": 5})
+        db.commit()
+
+    CACHE_CONFIGURACOES.invalidar()
+    assert _valor_em(CACHE_CONFIGURACOES.atual().como_lista(), "TesteInvalidar") == 5
+
+def test_padroes_quando_a_chave_nao_existe():
+    assert Configuracoes({}).tamanho_time == PADRAO_TAMANHO_TIME
+    assert Configuracoes({"TamanhoTime": 6}).tamanho_time == 6
+
+def test_recarregar_aplica_a_quantidade_de_quadras():
+    ESTADO_MEMORIA["jogos"] = {1: None, 2: None}
+    try:
+        with SessionLocal() as db:
+            db.merge(models.Configuracao(chave="QuantidadeQuadras", valor=3))
+            db.commit()
+        client.post("/configuracoes/recarregar")
+        assert client.get("/quadras").json()["quadras"] == [1, 2, 3]
+    finally:
+        client.post("/configuracoes", json={"chave": "QuantidadeQuadras", "valor": 2})
+        estado.ajustar_quadras(2)
+
+@pytest.mark.parametrize("chave", ["QuantidadeQuadras", "TamanhoTime"])
+@pytest.mark.parametrize("valor", [0, -1])
+def test_valor_menor_que_um_e_recusado(chave, valor):
+    antes = _valor_em(client.get("/configuracoes").json(), chave)
+    resp = client.post("/configuracoes", json={"chave": chave, "valor": valor})
+    assert resp.status_code == 422
+    assert _valor_em(client.get("/configuracoes").json(), chave) == antes
+
+def test_outro_worker_ve_a_mudanca_pelo_contador():
+    # Cache de outro worker: não recebe o write-through deste, só enxerga o banco
+    outro = CacheConfiguracoes(intervalo_conferencia=0)
+    outro.compartilhado = True
+    client.post("/configuracoes", json={"chave": "TesteWorkers", "valor": 1})
+    assert _valor_em(outro.atual().como_lista(), "TesteWorkers") == 1
+
+    client.post("/configuracoes", json={"chave": "TesteWorkers", "valor": 2})
+    assert _valor_em(outro.atual().como_lista(), "TesteWorkers") == 2
+
+    # Mudança por fora + recarregar num worker: o outro também recarrega
+    with SessionLocal() as db:
+        db.query(models.Configuracao).filter(models.Configuracao.chave == "TesteWorkers").update({"valor": 3})
+        db.commit()
+    client.post("/configuracoes/recarregar")
+    assert _valor_em(outro.atual().como_lista(), "TesteWorkers") == 3
@@ -0,0 +1,148 @@
+import random
+from itertools import combinations
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+from main import app, ESTADO_MEMORIA
+from database import SessionLocal
+import models
+import persistencia
+import comandos
+import convivencia
+import estado
+import formacao
+from configuracoes import Configuracoes
+from tests.conftest import jogo_rodando
+
+client = TestClient(app)
+
+AGORA = datetime.now(timezone.utc)
+
+def test_conta_companheiros_e_adversarios_dentro_da_janela():
+    matriz = convivencia.MatrizConvivencia(janela=timedelta(hours=3))
+    matriz.registrar(["a", "b"], ["c", "d"], AGORA - timedelta(hours=4))
+    matriz.registrar(["a", "b"], ["c", "e"], AGORA - timedelta(hours=1))
+    matriz.registrar(["b", "a"], ["d", "c"], AGORA)
+
+    # A primeira partida já saiu da janela de 3 horas
+    assert matriz.companheiros("a", "b") == 2
+    assert matriz.companheiros("b", "a") == 2
+    assert matriz.companheiros("c", "d") == 1
+    assert matriz.adversarios("a", "c") == 2
+    assert matriz.adversarios("a", "e") == 1
+    assert matriz.companheiros("a", "c") == 0
+
+    # Só os pares observados ocupam memória; sumindo da janela, somem do dicionário
+    matriz.registrar(["x"], ["y"], AGORA + timedelta(hours=5))
+    assert len(matriz) == 1
+    assert matriz.adversarios("x", "y") == 1
+
+def test_carregar_refaz_a_matriz_pelo_historico():
+    a, b, c, d = (models.generate_uuid() for _ in range(4))
+    with SessionLocal() as db:
+        for horas, time_a, time_b in ((30, [a, b], [c, d]), (2, [a, c], [b, d]), (1, [a, c], [b, d])):
+            resultado = persistencia.montar_resultado(1, jogo_rodando(time_a, time_b, placar=(21, 15), inicio="2026-03-05T20:00:00+00:00"), "A", "Pontuacao", fim=AGORA - timedelta(hours=horas))
+            persistencia.gravar_resultados(db, [resultado])
+
+    matriz = convivencia.MatrizConvivencia()
+    matriz.carregar(agora=AGORA)
+    pares = matriz.entre([a, b, c, d])
+    # A partida de 30 horas atrás é de outra noite
+    assert matriz.companheiros(a, b) == 0
+    assert matriz.companheiros(a, c) == 2
+    assert matriz.adversarios(a, b) == 2
+    assert pares[tuple(sorted((a, c)))] == [2, 0]
+
+def test_divisao_separa_duplas_repetidas():
+    ids = [f"r{i}" for i in range(8)]
+    ratings = {j: 1500.0 for j in ids}
+    sexos = {j: "M" for j in ids}
+    matriz = convivencia.MatrizConvivencia()
+    for _ in range(3):
+        matriz.registrar(ids[0:4], ids[4:8], AGORA)
+
+    for tamanho_time, elenco in ((4, ids), (8, ids + [f"s{i}" for i in range(8)])):
+        for _ in range(10):
+            # Orçamento folgado: o que se testa aqui é o custo das repetições, não o relógio
+            # (com a máquina ocupada, 3 ms podem acabar antes da primeira troca)
+            time_a, time_b = formacao.montar_times(elenco, ratings, sexos, tamanho_time, repeticoes=matriz.entre(elenco),
+                                                   orcamento=1.0)
+            # O melhor é desmanchar os dois quartetos: 2 de cada lado nos dois times
+            assert len(set(time_a) & set(ids[0:4])) == 2
+            assert len(set(time_a) & set(ids[4:8])) == 2
+
+def test_desafiantes_evitam_dupla_repetida_sem_furar_a_fila():
+    matriz = convivencia.MatrizConvivencia()
+    for _ in range(2):
+        matriz.registrar(["f1", "f2"], ["v1", "v2"], AGORA)
+
+    fila = ["f1", "f2", "f3", "f4"]
+    # f1 e f2 já jogaram juntos: entra f1 (o primeiro sempre entra) e o próximo que não repete
+    assert formacao.escolher_desafiantes(fila, 2, ["v1", "v2"], matriz.entre(fila + ["v1", "v2"])) == ["f1", "f3"]
+    # Sem repetição, a ordem da fila manda
+    assert formacao.escolher_desafiantes(fila, 2, ["v1", "v2"], {}) == ["f1", "f2"]
+
+def test_iniciar_partida_desmancha_a_panelinha():
+    ESTADO_MEMORIA["fila"] = []
+    ESTADO_MEMORIA["jogos"] = {1: None, 2: None}
+    ids = []
+    for i in range(8):
+        jogador = client.post("/jogadores", json={"nome": f"Panelinha {i}", "sexo": "M"}).json()
+        ids.append(jogador["id"])
+        client.post("/fila/entrar", json={"jogador_id": jogador["id"]})
+    for _ in range(3):
+        convivencia.MATRIZ.registrar(ids[0:4], ids[4:8])
+
+    resp = client.post("/quadras/1/iniciar")
+    assert resp.status_code == 200
+    time_a = set(resp.json()["estado_quadra"]["timeA"])
+    assert len(time_a & set(ids[0:4])) == 2
+    client.post("/quadras/1/encerrar")
+
+def test_busca_exata_com_repeticoes_igual_a_forca_bruta():
+    sorteio = random.Random(9)
+    for _ in range(30):
+        ids = [f"b{i}" for i in range(10)]
+        ratings = {j: sorteio.uniform(1300, 1700) for j in ids}
+        sexos = {j: sorteio.choice("MF") for j in ids}
+        matriz = convivencia.MatrizConvivencia()
+        for _ in range(6):
+            elenco = sorteio.sample(ids, 10)
+            matriz.registrar(elenco[:5], elenco[5:], AGORA)
+        repeticoes = matriz.entre(ids)
+
+        def custo(time_a):
+            time_b = [j for j in ids if j not in time_a]
+            duplas = sum(matriz.companheiros(x, y) for time_ in (time_a, time_b) for x, y in combinations(time_, 2))
+            return abs(sum(ratings[j] for j in time_a) - sum(ratings[j] for j in time_b)) + formacao.PESO_REPETICAO * duplas
+
+        mulheres = sum(1 for j in ids if sexos[j] == "F")
+        melhor = min(custo(time_a) for time_a in combinations(ids, 5)
+                     if abs(2 * sum(1 for j in time_a if sexos[j] == "F") - mulheres) <= 1)
+        time_a, _ = formacao.montar_times(ids, ratings, sexos, 5, repeticoes=repeticoes, orcamento=1.0)
+        assert abs(custo(time_a) - melhor) < 1e-6
+
+def test_perdedores_nao_voltam_na_frente_de_quem_esperava(monkeypatch):
+    # w3 e w4 já jogaram muito com w1: sem o cuidado, a escolha dos desafiantes preferia um perdedor
+    matriz = convivencia.MatrizConvivencia()
+    for _ in range(3):
+        matriz.registrar(["w1", "w3", "w4", "x"], ["y1", "y2", "y3", "y4"], AGORA)
+    monkeypatch.setattr(convivencia, "MATRIZ", matriz)
+    atual = estado.EstadoMemoria()
+    atual["fila"] = ["w1", "w2", "w3", "w4"]
+    atual["jogos"] = {1: jogo_rodando(["a1", "a2", "a3", "a4"], ["l1", "l2", "l3", "l4"])}
+
+    t = estado.Transacao(atual)
+    _, jogo, _ = comandos.registrar_vitoria(t, 1, "A", None, None, Configuracoes({"TamanhoTime": 4, "MaxVitorias": 3}))
+    assert sorted(jogo["timeB"]) == ["w1", "w2", "w3", "w4"]
+    assert sorted(atual["fila"].como_lista()) == ["l1", "l2", "l3", "l4"]
+
+def test_fila_curta_completa_com_os_perdedores():
+    atual = estado.EstadoMemoria()
+    atual["fila"] = ["w1", "w2"]
+    atual["jogos"] = {1: jogo_rodando(["a1", "a2", "a3", "a4"], ["l1", "l2", "l3", "l4"])}
+
+    t = estado.Transacao(atual)
+    _, jogo, _ = comandos.registrar_vitoria(t, 1, "A", None, None, Configuracoes({"TamanhoTime": 4, "MaxVitorias": 3}))
+    assert jogo["timeB"][:2] == ["w1", "w2"]
+    assert sorted(jogo["timeB"][2:] + atual["fila"].como_lista()) == ["l1", "l2", "l3", "l4"]
+    assert len(atual["fila"]) == 2
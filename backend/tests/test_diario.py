@@ -0,0 +1,181 @@
+import os
+import pytest
+import threading
+import time
+from fastapi.testclient import TestClient
+from main import app, ESTADO_MEMORIA
+from diario import DiarioEstado
+import estado
+
+client = TestClient(app)
+
+def _novo_estado():
+    novo = estado.EstadoMemoria()
+    novo["fila"] = []
+    novo["jogos"] = {1: None, 2: None}
+    return novo
+
+def _gerar_deltas(diario, quantidade):
+    # Simula uma noite de fila: gente entrando, indo pro final e saindo
+    atual = _novo_estado()
+    versao = 0
+    for i in range(quantidade):
+        t = estado.Transacao(atual)
+        t.entrar_na_fila(f"j{i}")
+        if i % 3 == 0:
+            t.mover_para_final(f"j{i // 2}")
+        if i % 7 == 0:
+            t.sair_da_fila(f"j{i // 3}")
+        versao += 1
+        if diario.registrar({"versao": versao, "ops": t.ops}):
+            diario.compactar({"versao": versao, "fila": atual["fila"].como_lista(), "jogos": dict(atual["jogos"])})
+    return atual, versao
+
+def test_restaurar_reproduz_o_estado(tmp_path):
+    diario = DiarioEstado(str(tmp_path), fsync="sempre")
+    original, versao = _gerar_deltas(diario, 50)
+    diario.fechar()
+
+    recuperado = _novo_estado()
+    assert DiarioEstado(str(tmp_path)).restaurar(recuperado) == versao
+    assert recuperado["fila"] == original["fila"]
+
+def test_compactacao_gera_snapshot_e_zera_o_diario(tmp_path):
+    diario = DiarioEstado(str(tmp_path), fsync="nunca", snapshot_a_cada=10)
+    original, versao = _gerar_deltas(diario, 25)
+    diario.fechar()
+
+    assert os.path.exists(tmp_path / "snapshot.json")
+    with open(tmp_path / "diario.ndjson", "rb") as arquivo:
+        assert len(arquivo.readlines()) == 5 # Só a cauda depois do último snapshot
+
+    recuperado = _novo_estado()
+    assert DiarioEstado(str(tmp_path)).restaurar(recuperado) == versao
+    assert recuperado["fila"] == original["fila"]
+
+def test_linha_incompleta_no_fim_e_descartada(tmp_path):
+    diario = DiarioEstado(str(tmp_path), fsync="nunca")
+    original, versao = _gerar_deltas(diario, 5)
+    diario.fechar()
+    with open(tmp_path / "diario.ndjson", "ab") as arquivo:
+        arquivo.write(b'{"versao": 6, "ops": [{"op": "fila.ent') # Queda no meio da escrita
+
+    recuperado = _novo_estado()
+    assert DiarioEstado(str(tmp_path)).restaurar(recuperado) == versao
+    assert recuperado["fila"] == original["fila"]
+
+def test_politica_de_fsync_invalida(tmp_path):
+    try:
+        DiarioEstado(str(tmp_path), fsync="talvez")
+        assert False, "Deveria ter recusado a política"
+    except ValueError:
+        pass
+
+def test_reinicio_recupera_fila_e_quadras(tmp_path):
+    ESTADO_MEMORIA["fila"] = []
+    ESTADO_MEMORIA["jogos"] = {1: None, 2: None}
+    estado.restaurar(DiarioEstado(str(tmp_path), fsync="sempre"))
+    try:
+        for i in range(8):
+            client.post("/fila/entrar", json={"jogador_id": f"reinicio-{i}"})
+        client.post("/quadras/2/iniciar")
+        client.post("/quadras/2/placar", json={"time": "A", "delta": 1})
+        client.post("/fila/entrar", json={"jogador_id": "reinicio-9"})
+    finally:
+        estado.desligar_diario()
+
+    # "Reinício": um processo novo só tem o que está no disco
+    recuperado = _novo_estado()
+    versao = DiarioEstado(str(tmp_path)).restaurar(recuperado)
+    foto = estado.snapshot()
+    assert versao == foto["versao"]
+    assert recuperado["fila"].como_lista() == foto["fila"] == ["reinicio-9"]
+    assert recuperado["jogos"] == foto["jogos"]
+    assert recuperado["jogos"][2]["placar"]["A"] == 1
+
+def test_disco_lento_nao_segura_as_travas_do_estado(tmp_path):
+    ESTADO_MEMORIA["fila"] = []
+    ESTADO_MEMORIA["jogos"] = {1: None, 2: None}
+    diario = DiarioEstado(str(tmp_path), fsync="sempre")
+    estado.restaurar(diario)
+    liberar = threading.Event()
+    escrever = diario._escrever
+
+    def disco_lento(linhas):
+        liberar.wait(5)
+        escrever(linhas)
+
+    diario._escrever = disco_lento
+    versao = estado.versao_atual()
+
+    def entrar():
+        with estado.transacao(quadras=[]) as t:
+            t.entrar_na_fila("disco-lento")
+
+    requisicao = threading.Thread(target=entrar)
+    try:
+        requisicao.start()
+        while estado.versao_atual() == versao:
+            time.sleep(0.001)
+        # O delta já foi publicado; outra leitura pega todas as travas sem esperar o disco
+        inicio = time.perf_counter()
+        assert estado.snapshot()["fila"] == ["disco-lento"]
+        assert time.perf_counter() - inicio < 0.5
+        # Com fsync="sempre" quem publicou continua esperando o disco (fora das travas)
+        assert requisicao.is_alive()
+        liberar.set()
+        requisicao.join(5)
+        assert not requisicao.is_alive()
+    finally:
+        liberar.set()
+        estado.desligar_diario()
+
+    recuperado = _novo_estado()
+    assert DiarioEstado(str(tmp_path)).restaurar(recuperado) == versao + 1
+    assert recuperado["fila"].como_lista() == ["disco-lento"]
+
+def test_intervalo_faz_fsync_mesmo_sem_escrita_nova(tmp_path, monkeypatch):
+    chamadas = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda descritor: (chamadas.append(descritor), fsync(descritor)))
+    diario = DiarioEstado(str(tmp_path), fsync="intervalo", intervalo_fsync=0.05)
+    try:
+        diario.registrar({"versao": 1, "ops": [{"op": "fila.entrar", "jogador_id": "j1"}]})
+        diario.descarregar()
+        diario.registrar({"versao": 2, "ops": [{"op": "fila.entrar", "jogador_id": "j2"}]})
+        diario.descarregar()
+        # A segunda escrita caiu dentro do intervalo; o fsync dela vem da thread quando o intervalo vence
+        limite = time.monotonic() + 2
+        while len(chamadas) < 2 and time.monotonic() < limite:
+            time.sleep(0.01)
+        assert len(chamadas) == 2
+    finally:
+        diario.fechar()
+
+def test_falha_na_gravacao_chega_em_quem_espera(tmp_path):
+    diario = DiarioEstado(str(tmp_path), fsync="sempre")
+    escrever = diario._escrever
+
+    def disco_cheio(linhas):
+        diario._escrever = escrever
+        raise OSError("disco cheio")
+
+    diario._escrever = disco_cheio
+    try:
+        assert not diario.registrar({"versao": 1, "ops": [{"op": "fila.entrar", "jogador_id": "j1"}]})
+        with pytest.raises(RuntimeError, match="disco cheio"):
+            diario.aguardar(1)
+        assert diario._versao_gravada == 0
+
+        # O diário ficou com um buraco: o próximo delta pede um snapshot, que volta a valer
+        assert diario.registrar({"versao": 2, "ops": [{"op": "fila.entrar", "jogador_id": "j2"}]})
+        diario.compactar({"versao": 2, "fila": ["j1", "j2"], "jogos": {1: None}})
+        diario.aguardar(2)
+        assert not diario.registrar({"versao": 3, "ops": [{"op": "fila.sair", "jogador_id": "j1"}]})
+        diario.aguardar(3)
+    finally:
+        diario.fechar()
+
+    recuperado = _novo_estado()
+    assert DiarioEstado(str(tmp_path)).restaurar(recuperado) == 3
+    assert recuperado["fila"].como_lista() == ["j2"]
@@ -0,0 +1,85 @@
+import base64
+import hashlib
+from fastapi.testclient import TestClient
+from main import app
+import avatares
+
+client = TestClient(app)
+
+# PNG de 1x1 pixel
+PNG = base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII=")
+
+
+def _elenco(**cabecalhos):
+    return client.get("/jogadores/elenco", headers=cabecalhos)
+
+
+def test_elenco_em_colunas_com_projecao():
+    jogador = client.post("/jogadores", json={"nome": "Elenco Ana", "sexo": "F", "whatsapp": "85900000000"}).json()
+
+    corpo = _elenco().json()
+    assert corpo["campos"] == ["id", "nome", "sexo", "avatar", "is_presente"]
+    assert [jogador["id"], "Elenco Ana", "F", None, False] in corpo["jogadores"]
+
+    corpo = client.get("/jogadores/elenco", params={"campos": "nome"}).json()
+    assert corpo["campos"] == ["id", "nome"] # O id sempre vem
+    assert [jogador["id"], "Elenco Ana"] in corpo["jogadores"]
+
+    resp = client.get("/jogadores/elenco", params={"campos": "nome,senha"})
+    assert resp.status_code == 400
+    assert "senha" in resp.json()["detail"]
+
+
+def test_etag_do_elenco_so_muda_quando_um_jogador_muda():
+    jogador_id = client.post("/jogadores", json={"nome": "Elenco Bia", "sexo": "F"}).json()["id"]
+    resp = _elenco()
+    etag = resp.headers["etag"]
+    assert _elenco(**{"If-None-Match": etag}).status_code == 304
+
+    # Fila e placar não mexem no cadastro
+    client.post("/fila/entrar", json={"jogador_id": jogador_id})
+    assert _elenco(**{"If-None-Match": etag}).status_code == 304
+
+    for alterar in (
+        lambda: client.patch(f"/jogadores/{jogador_id}/status", json={"is_presente": True}),
+        lambda: client.put(f"/jogadores/{jogador_id}", json={"nome": "Elenco Bia Souza"}),
+        lambda: client.patch("/jogadores/presenca", json={"ids": [jogador_id], "is_presente": False}),
+        lambda: client.post("/fila/lote", json={"operacoes": [{"op": "presenca", "jogador_id": jogador_id, "presente": True}]}),
+        lambda: client.post("/jogadores", json={"nome": "Elenco Caio", "sexo": "M"}),
+    ):
+        alterar()
+        resp = _elenco(**{"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert int(resp.headers["x-elenco-versao"]) == resp.json()["versao"]
+        etag = resp.headers["etag"]
+    assert ["Elenco Bia Souza", True] in [linha[1:5:3] for linha in resp.json()["jogadores"]]
+
+
+def test_avatar_em_data_url_vira_endereco_pelo_conteudo():
+    data_url = "data:image/png;base64," + base64.b64encode(PNG).decode()
+    primeiro = client.post("/jogadores", json={"nome": "Elenco Dani", "sexo": "F", "avatar": data_url}).json()
+    segundo = client.post("/jogadores", json={"nome": "Elenco Edu", "sexo": "M", "avatar": data_url}).json()
+    # A mesma imagem, o mesmo endereço (guardada uma vez só)
+    assert primeiro["avatar"] == segundo["avatar"] == "/avatares/" + hashlib.sha256(PNG).hexdigest()
+
+    resp = client.get(primeiro["avatar"])
+    assert resp.content == PNG
+    assert resp.headers["content-type"] == "image/png"
+    assert resp.headers["cache-control"] == avatares.CACHE_CONTROL
+    assert client.get(primeiro["avatar"], headers={"If-None-Match": resp.headers["etag"]}).status_code == 304
+
+    # Emoji continua como sempre foi; o elenco só leva a URL, nunca a imagem
+    client.put(f"/jogadores/{segundo['id']}", json={"avatar": "🏐"})
+    avatares_no_elenco = {linha[0]: linha[3] for linha in _elenco().json()["jogadores"]}
+    assert avatares_no_elenco[primeiro["id"]] == primeiro["avatar"]
+    assert avatares_no_elenco[segundo["id"]] == "🏐"
+
+    # Envio direto da imagem crua
+    resp = client.post("/avatares", content=PNG, headers={"Content-Type": "image/png"})
+    assert resp.status_code == 201
+    assert resp.json()["url"] == primeiro["avatar"]
+
+    assert client.post("/avatares", content=b"x" * (avatares.LIMITE_BYTES + 1), headers={"Content-Type": "image/png"}).status_code == 400
+    assert client.post("/avatares", content=b"<svg/>", headers={"Content-Type": "image/svg+xml"}).status_code == 400
+    assert client.post("/jogadores", json={"nome": "X", "sexo": "M", "avatar": "data:image/png;base64,@@"}).status_code == 400
+    assert client.get("/avatares/" + "0" * 64).status_code == 404
@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+from main import app, ESTADO_MEMORIA, stream_estado
+import estado
+
+client = TestClient(app)
+
+def test_mutacoes_geram_deltas_versionados():
+    ESTADO_MEMORIA["fila"] = []
+    loop = asyncio.new_event_loop()
+    assinante, inicial = estado.assinar(loop)
+    try:
+        client.post("/fila/entrar", json={"jogador_id": "delta-1"})
+        client.post("/fila/entrar", json={"jogador_id": "delta-2"})
+        client.post("/fila/final", json={"jogador_id": "delta-1"})
+
+        deltas = list(assinante.pendentes)
+        assert len(deltas) == 3
+        # Versões consecutivas, começando logo depois do snapshot inicial
+        assert [d["versao"] for d in deltas] == [inicial["versao"] + 1, inicial["versao"] + 2, inicial["versao"] + 3]
+        assert deltas[2]["ops"] == [{"op": "fila.final", "jogador_id": "delta-1"}]
+    finally:
+        estado.cancelar_assinatura(assinante)
+        loop.close()
+
+def test_snapshot_mais_deltas_reproduz_o_estado():
+    ESTADO_MEMORIA["fila"] = [f"j{i}" for i in range(10)]
+    ESTADO_MEMORIA["jogos"] = {1: None, 2: None}
+    loop = asyncio.new_event_loop()
+    assinante, inicial = estado.assinar(loop)
+    try:
+        # Um "cliente" que só conhece o snapshot inicial
+        replica = estado.EstadoMemoria()
+        replica["fila"] = inicial["fila"]
+        replica["jogos"] = inicial["jogos"]
+
+        client.post("/fila/embaralhar")
+        client.post("/quadras/1/iniciar")
+        client.post("/quadras/1/placar", json={"time": "B", "delta": 1})
+        client.post("/quadras/1/vitoria", json={"time_vencedor": "B"})
+
+        for delta in assinante.pendentes:
+            for op in delta["ops"]:
+                estado.aplicar_operacao(replica, op)
+
+        final = estado.snapshot()
+        assert replica["fila"].como_lista() == final["fila"]
+        assert replica["jogos"] == final["jogos"]
+    finally:
+        estado.cancelar_assinatura(assinante)
+        loop.close()
+
+def test_cliente_lento_recebe_snapshot_em_vez_de_travar_os_outros():
+    ESTADO_MEMORIA["fila"] = []
+    loop = asyncio.new_event_loop()
+    lento, _ = estado.assinar(loop, limite=2)
+    rapido, _ = estado.assinar(loop)
+    try:
+        for i in range(5):
+            client.post("/fila/entrar", json={"jogador_id": f"lento-{i}"})
+
+        # O lento estourou o limite: perdeu os deltas e vai ser ressincronizado
+        assert lento.precisa_snapshot == True
+        assert len(lento.pendentes) == 0
+        # O rápido continua recebendo tudo normalmente
+        assert len(rapido.pendentes) == 5
+
+        foto = lento.ressincronizar()
+        assert lento.precisa_snapshot == False
+        assert foto["versao"] == estado.versao_atual()
+        assert foto["fila"] == [f"lento-{i}" for i in range(5)]
+    finally:
+        estado.cancelar_assinatura(lento)
+        estado.cancelar_assinatura(rapido)
+        loop.close()
+
+def test_estado_com_etag_responde_304_quando_nada_mudou():
+    ESTADO_MEMORIA["fila"] = ["etag-1"]
+    primeira = client.get("/estado")
+    etag = primeira.headers["etag"]
+    assert primeira.json()["fila"] == ["etag-1"]
+
+    # Nada mudou: o celular recebe 304 sem corpo
+    resp = client.get("/estado", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.content == b""
+
+    # Depois de uma alteração o ETag muda e o corpo volta
+    client.post("/fila/entrar", json={"jogador_id": "etag-2"})
+    resp = client.get("/estado", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["etag"] != etag
+    assert resp.json()["fila"] == ["etag-1", "etag-2"]
+
+def test_estado_desde_devolve_apenas_as_operacoes_novas():
+    ESTADO_MEMORIA["fila"] = []
+    versao = client.get("/estado").json()["versao"]
+
+    client.post("/fila/entrar", json={"jogador_id": "desde-1"})
+    client.post("/fila/sair", json={"jogador_id": "desde-1"})
+
+    resp = client.get(f"/estado?desde={versao}").json()
+    assert resp["versao"] == versao + 2
+    assert [d["ops"][0]["op"] for d in resp["deltas"]] == ["fila.entrar", "fila.sair"]
+
+    # Quem já está atualizado recebe uma lista vazia
+    assert client.get(f"/estado?desde={versao + 2}").json()["deltas"] == []
+
+def test_estado_desde_volta_ao_snapshot_quando_o_historico_ja_rodou(monkeypatch):
+    monkeypatch.setattr(estado, "_historico", estado.deque(maxlen=2))
+    ESTADO_MEMORIA["fila"] = []
+    versao = client.get("/estado").json()["versao"]
+
+    for i in range(3):
+        client.post("/fila/entrar", json={"jogador_id": f"rodou-{i}"})
+
+    resp = client.get(f"/estado?desde={versao}").json()
+    assert "deltas" not in resp
+    assert resp["fila"] == ["rodou-0", "rodou-1", "rodou-2"]
+    assert resp["versao"] == versao + 3
+
+def test_abrir_o_stream_nao_para_o_event_loop():
+    # Uma transação segurando a fila (ex.: esperando o armazém compartilhado) enquanto um celular conecta
+    segurando, soltar = threading.Event(), threading.Event()
+
+    def segurar_fila():
+        with estado._trava_fila:
+            segurando.set()
+            soltar.wait(3)
+
+    threading.Thread(target=segurar_fila).start()
+    segurando.wait(5)
+    antes = set(estado._assinantes)
+
+    async def cenario():
+        inicio = time.perf_counter()
+        duracao = {}
+
+        async def relogio():
+            for _ in range(10):
+                await asyncio.sleep(0.01)
+            duracao["relogio"] = time.perf_counter() - inicio
+            soltar.set()
+
+        tarefa = asyncio.create_task(relogio())
+        requisicao = Request({"type": "http", "method": "GET", "path": "/estado/stream", "headers": [], "query_string": b""})
+        await stream_estado(requisicao)
+        await tarefa
+        return duracao["relogio"]
+
+    try:
+        duracao = asyncio.run(cenario())
+    finally:
+        soltar.set()
+        for assinante in set(estado._assinantes) - antes:
+            estado.cancelar_assinatura(assinante)
+    # O relógio andou enquanto a assinatura esperava a trava (com o loop parado, só depois dos 3 s)
+    assert duracao < 1.0
@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+from main import app
+from database import SessionLocal
+import models
+import persistencia
+import estatisticas
+from tests.conftest import jogo_rodando
+
+client = TestClient(app)
+
+def _estatistica(jogador_id):
+    with SessionLocal() as db:
+        linha = db.get(models.EstatisticaJogador, jogador_id)
+        return {campo: getattr(linha, campo) for campo in estatisticas.CAMPOS_SOMADOS + ("ultima_partida",)}
+
+def test_estatisticas_sao_somadas_na_mesma_gravacao():
+    a, b = models.generate_uuid(), models.generate_uuid()
+    primeira = datetime(2026, 3, 1, 21, 0, tzinfo=timezone.utc)
+    segunda = datetime(2026, 3, 1, 21, 30, tzinfo=timezone.utc)
+    with SessionLocal() as db:
+        # Duas partidas no mesmo lote (como o gravador em segundo plano faz) e uma depois
+        persistencia.gravar_resultados(db, [
+            persistencia.montar_resultado(1, jogo_rodando([a], [b], placar=(21, 15)), "A", "Pontuacao", fim=primeira),
+            persistencia.montar_resultado(2, jogo_rodando([b], [a], placar=(21, 19)), "A", "Pontuacao", fim=segunda),
+        ])
+        persistencia.gravar_resultados(db, [
+            persistencia.montar_resultado(1, jogo_rodando([a], [b], placar=(7, 7)), None, "Cancelada", fim=primeira),
+        ])
+
+    assert _estatistica(a) == {"partidas": 3, "vitorias": 1, "derrotas": 1, "empates": 1,
+                               "pontos_pro": 21 + 19 + 7, "pontos_contra": 15 + 21 + 7,
+                               "ultima_partida": segunda.replace(tzinfo=None)}
+    assert _estatistica(b)["vitorias"] == 1
+    assert _estatistica(b)["pontos_pro"] == 15 + 21 + 7
+
+def test_recalcular_chega_no_mesmo_agregado():
+    a, b = models.generate_uuid(), models.generate_uuid()
+    with SessionLocal() as db:
+        for i in range(5):
+            persistencia.registrar_resultado(db, 1, jogo_rodando([a], [b], placar=(21, i)), "A" if i % 2 else "B", "Pontuacao")
+    incremental = (_estatistica(a), _estatistica(b))
+
+    with SessionLocal() as db:
+        assert estatisticas.recalcular(db, lote=2) >= 2
+    assert (_estatistica(a), _estatistica(b)) == incremental
+
+def test_endpoints_de_estatisticas():
+    jogador = client.post("/jogadores", json={"nome": "Estatística", "sexo": "F"}).json()
+
+    # Cadastrado mas sem partidas: tudo zerado
+    resp = client.get(f"/jogadores/{jogador['id']}/estatisticas")
+    assert resp.status_code == 200
+    assert resp.json()["partidas"] == 0
+    assert resp.json()["taxa_vitoria"] == 0.0
+
+    outro = models.generate_uuid()
+    with SessionLocal() as db:
+        persistencia.registrar_resultado(db, 1, jogo_rodando([jogador["id"]], [outro], placar=(21, 10)), "A", "Pontuacao")
+        persistencia.registrar_resultado(db, 1, jogo_rodando([jogador["id"]], [outro], placar=(18, 21)), "B", "Pontuacao")
+
+    dados = client.get(f"/jogadores/{jogador['id']}/estatisticas").json()
+    assert (dados["partidas"], dados["vitorias"], dados["derrotas"]) == (2, 1, 1)
+    assert dados["taxa_vitoria"] == 0.5
+    assert dados["pontos_pro"] == 39
+
+    lista = client.get("/jogadores/estatisticas", params={"ids": [jogador["id"], outro]}).json()
+    assert {linha["jogador_id"] for linha in lista} == {jogador["id"], outro}
+
+    assert client.get(f"/jogadores/{models.generate_uuid()}/estatisticas").status_code == 404
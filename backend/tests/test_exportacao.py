@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+import subprocess
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+from main import app
+from database import SessionLocal
+import persistencia
+
+client = TestClient(app)
+
+PASTA_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Bem no passado, para não misturar com as partidas que os outros testes gravam agora
+# (nem entrar na janela da matriz de convivência)
+BASE = datetime(2001, 1, 1, tzinfo=timezone.utc)
+
+
+def _gravar_partidas(quantidade):
+    resultados = []
+    for n in range(quantidade):
+        fim = BASE + timedelta(hours=n)
+        jogo = {"inicio": (fim - timedelta(minutes=20)).isoformat(), "placar": {"A": 21, "B": 10 + n},
+                "timeA": [f"exp-a{n}", f"exp-b{n}"], "timeB": [f"exp-c{n}", f"exp-d{n}"]}
+        resultados.append(persistencia.montar_resultado(1, jogo, "A", "Pontuacao", fim=fim))
+    with SessionLocal() as db:
+        persistencia.gravar_resultados(db, resultados)
+    return [r.partida["id"] for r in resultados]
+
+
+def test_exportar_partidas_incremental_em_ndjson():
+    ids = _gravar_partidas(3)
+
+    resp = client.get("/partidas/exportar", params={"desde": (BASE - timedelta(seconds=1)).isoformat()})
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    linhas = [json.loads(linha) for linha in resp.text.splitlines()]
+    linhas = [linha for linha in linhas if linha["partida_id"] in ids] # Ignora as de rodadas anteriores da suíte
+    # Uma linha por participante, na ordem em que as partidas terminaram
+    assert [linha["partida_id"] for linha in linhas][::4] == ids
+    assert len(linhas) == 12
+    primeira = next(linha for linha in linhas if linha["jogador_id"] == "exp-a0")
+    assert primeira["time"] == "A" and primeira["resultado"] == "Vitoria" and primeira["placar_b"] == 10
+
+    # A próxima exportação começa no `fim` da última linha: nada repetido
+    resp = client.get("/partidas/exportar", params={"desde": linhas[3]["fim"]})
+    assert {json.loads(linha)["partida_id"] for linha in resp.text.splitlines()} & set(ids) == set(ids[1:])
+    resp = client.get("/partidas/exportar", params={"desde": linhas[-1]["fim"]})
+    assert not {json.loads(linha)["partida_id"] for linha in resp.text.splitlines()} & set(ids)
+
+
+def test_exportar_partidas_em_csv_pela_api_e_pela_linha_de_comando():
+    ids = _gravar_partidas(2)
+    desde = (BASE + timedelta(minutes=30)).isoformat() # Só a segunda partida
+
+    resp = client.get("/partidas/exportar", params={"formato": "csv", "desde": desde})
+    linhas = list(csv.DictReader(io.StringIO(resp.text)))
+    assert [linha["jogador_id"] for linha in linhas if linha["partida_id"] == ids[1]]
+    assert all(linha["partida_id"] != ids[0] for linha in linhas)
+
+    saida = subprocess.run([sys.executable, "exportar_partidas.py", "--formato", "csv", "--desde", desde],
+                           cwd=PASTA_BACKEND, capture_output=True, text=True, check=True).stdout
+    assert list(csv.DictReader(io.StringIO(saida))) == linhas
+
+
+def test_exportacao_por_sequencia_nao_perde_gravacao_atrasada():
+    # Partida que termina antes mas chega no banco depois (gravador atrasado): o ?desde= pelo fim pularia
+    persistencia.GRAVADOR.descarregar() # Nada de outros testes chegando no meio
+    primeira = _gravar_partidas(1)[0]
+    linhas = [json.loads(linha) for linha in client.get("/partidas/exportar").text.splitlines()]
+    cursor = linhas[-1]["sequencia"]
+    assert linhas[-1]["partida_id"] == primeira
+
+    jogo = {"inicio": (BASE - timedelta(minutes=20)).isoformat(), "placar": {"A": 21, "B": 5},
+            "timeA": ["atr-a", "atr-b"], "timeB": ["atr-c", "atr-d"]}
+    atrasada = persistencia.montar_resultado(1, jogo, "B", "Pontuacao", fim=BASE - timedelta(minutes=1))
+    with SessionLocal() as db:
+        persistencia.gravar_resultados(db, [atrasada])
+
+    novas = [json.loads(linha) for linha in client.get("/partidas/exportar", params={"apos": cursor}).text.splitlines()]
+    assert {linha["partida_id"] for linha in novas} == {atrasada.partida["id"]}
+    assert len(novas) == 4 and all(linha["sequencia"] == cursor + 1 for linha in novas)
+
+    saida = subprocess.run([sys.executable, "exportar_partidas.py", "--apos", str(cursor)],
+                           cwd=PASTA_BACKEND, capture_output=True, text=True, check=True).stdout
+    assert [json.loads(linha) for linha in saida.splitlines()] == novas
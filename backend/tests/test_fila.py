@@ -0,0 +1,56 @@
+from fila import FilaIndexada
+
+def test_entrar_sem_duplicar_e_manter_ordem():
+    fila = FilaIndexada(["a", "b"])
+    assert fila.entrar("c") == True
+    assert fila.entrar("a") == False # Já estava na fila
+    assert fila == ["a", "b", "c"]
+    assert fila.como_lista() == ["a", "b", "c"]
+
+def test_sair_e_mover_para_final():
+    fila = FilaIndexada(["a", "b", "c", "d"])
+    fila.sair("b")
+    fila.mover_para_final("a")
+    assert fila == ["c", "d", "a"]
+    assert "b" not in fila
+    assert fila.sair("inexistente") == False
+
+def test_posicao_acompanha_as_alteracoes():
+    fila = FilaIndexada(["a", "b", "c", "d"])
+    assert fila.posicao("c") == 2
+    fila.sair("a")
+    assert fila.posicao("c") == 1
+    fila.mover_para_final("b")
+    assert fila.posicao("b") == 2
+    assert fila.posicao("inexistente") is None
+
+def test_retirar_primeiros():
+    fila = FilaIndexada(["a", "b", "c", "d", "e"])
+    assert fila.retirar_primeiros(3) == ["a", "b", "c"]
+    assert fila == ["d", "e"]
+    assert fila.posicao("e") == 1
+    # Pedir mais do que existe devolve apenas quem está na fila
+    assert fila.retirar_primeiros(10) == ["d", "e"]
+    assert len(fila) == 0
+
+def test_posicao_continua_correta_apos_renumeracao():
+    # Muitos "vai pro final" esgotam os números de sequência e forçam a compactação
+    ids = [f"j{i}" for i in range(10)]
+    fila = FilaIndexada(ids)
+    esperado = list(ids)
+    for i in range(500):
+        jogador_id = esperado[i % 3]
+        fila.mover_para_final(jogador_id)
+        esperado.remove(jogador_id)
+        esperado.append(jogador_id)
+    assert fila == esperado
+    for posicao, jogador_id in enumerate(esperado):
+        assert fila.posicao(jogador_id) == posicao
+
+def test_embaralhar_mantem_os_jogadores():
+    ids = [f"j{i}" for i in range(20)]
+    fila = FilaIndexada(ids)
+    fila.embaralhar()
+    assert sorted(fila) == sorted(ids)
+    for posicao, jogador_id in enumerate(fila.como_lista()):
+        assert fila.posicao(jogador_id) == posicao
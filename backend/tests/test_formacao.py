@@ -0,0 +1,81 @@
+import random
+import time
+import pytest
+from itertools import combinations
+from fastapi.testclient import TestClient
+from main import app, ESTADO_MEMORIA
+from database import SessionLocal
+import models
+import formacao
+
+client = TestClient(app)
+
+def _diferenca(time_a, time_b, ratings):
+    return abs(sum(ratings[j] for j in time_a) - sum(ratings[j] for j in time_b))
+
+def _mulheres(time_, sexos):
+    return sum(1 for j in time_ if sexos.get(j) == "F")
+
+def _melhor_possivel(ids, ratings, sexos, tamanho_time):
+    total_mulheres = _mulheres(ids, sexos)
+    melhor = None
+    for time_a in combinations(ids, tamanho_time):
+        if abs(2 * _mulheres(time_a, sexos) - total_mulheres) > 1:
+            continue
+        time_b = [j for j in ids if j not in time_a]
+        diferenca = _diferenca(time_a, time_b, ratings)
+        melhor = diferenca if melhor is None else min(melhor, diferenca)
+    return melhor
+
+def _sorteio_de_jogadores(sorteio, tamanho_time):
+    ids = [f"f{i}" for i in range(tamanho_time * 2)]
+    ratings = {j: sorteio.uniform(1200, 1800) for j in ids}
+    sexos = {j: sorteio.choice("MF") for j in ids}
+    return ids, ratings, sexos
+
+def test_busca_exata_encontra_a_divisao_mais_equilibrada():
+    sorteio = random.Random(11)
+    for tamanho_time in range(1, formacao.TAMANHO_BUSCA_EXATA + 1):
+        for _ in range(20):
+            ids, ratings, sexos = _sorteio_de_jogadores(sorteio, tamanho_time)
+            time_a, time_b = formacao.montar_times(ids, ratings, sexos, tamanho_time, orcamento=1.0)
+            assert sorted(time_a + time_b) == sorted(ids)
+            assert len(time_a) == len(time_b) == tamanho_time
+            assert abs(_mulheres(time_a, sexos) - _mulheres(time_b, sexos)) <= 1
+            assert _diferenca(time_a, time_b, ratings) == pytest.approx(_melhor_possivel(ids, ratings, sexos, tamanho_time))
+
+def test_times_grandes_usam_a_heuristica_dentro_do_orcamento():
+    sorteio = random.Random(5)
+    for tamanho_time in (7, 9, 12):
+        ids, ratings, sexos = _sorteio_de_jogadores(sorteio, tamanho_time)
+        inicio = time.perf_counter()
+        time_a, time_b = formacao.montar_times(ids, ratings, sexos, tamanho_time, orcamento=0.003)
+        # Orçamento + a última rodada de trocas (folga larga para máquinas de CI lentas)
+        assert time.perf_counter() - inicio < 0.05
+        assert sorted(time_a + time_b) == sorted(ids)
+        assert abs(_mulheres(time_a, sexos) - _mulheres(time_b, sexos)) <= 1
+        # Bem mais equilibrado que uma divisão qualquer
+        assert _diferenca(time_a, time_b, ratings) < 100
+
+def test_iniciar_partida_separa_os_mais_fortes():
+    ESTADO_MEMORIA["fila"] = []
+    ESTADO_MEMORIA["jogos"] = {1: None, 2: None}
+    ids = []
+    for i in range(8):
+        jogador = client.post("/jogadores", json={"nome": f"Formação {i}", "sexo": "F" if i < 2 else "M"}).json()
+        ids.append(jogador["id"])
+        client.post("/fila/entrar", json={"jogador_id": jogador["id"]})
+
+    # Dois craques (um deles mulher) e o resto na média
+    with SessionLocal() as db:
+        for i, jogador_id in enumerate(ids):
+            db.add(models.RatingJogador(jogador_id=jogador_id, rating=1900.0 if i in (0, 2) else 1500.0, partidas=10))
+        db.commit()
+
+    for _ in range(5):
+        jogo = client.post("/quadras/1/iniciar").json()["estado_quadra"]
+        # Os dois craques nunca caem juntos, e as duas mulheres ficam uma em cada time
+        assert (ids[0] in jogo["timeA"]) != (ids[2] in jogo["timeA"])
+        assert (ids[0] in jogo["timeA"]) != (ids[1] in jogo["timeA"])
+        # Encerrar devolve os 8 para a fila em outra ordem
+        client.post("/quadras/1/encerrar")
@@ -0,0 +1,81 @@
+import random
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event
+from fastapi.testclient import TestClient
+from main import app
+from database import SessionLocal, engine_async
+import models
+import persistencia
+from tests.conftest import jogo_rodando
+
+client = TestClient(app)
+
+def _criar_partidas(quadra_id, quantidade, jogador_fixo=None):
+    # Partidas com vários inícios repetidos, para o desempate pelo id entrar em jogo
+    base = datetime(2026, 4, 1, 20, 0, tzinfo=timezone.utc)
+    resultados = []
+    for i in range(quantidade):
+        time_a = [jogador_fixo if jogador_fixo and i % 3 == 0 else models.generate_uuid(), models.generate_uuid()]
+        inicio = base + timedelta(minutes=(i // 2) * 15)
+        resultados.append(persistencia.montar_resultado(quadra_id, jogo_rodando(time_a, [models.generate_uuid(), models.generate_uuid()], placar=(21, 12), inicio=inicio), "A", "Pontuacao"))
+    with SessionLocal() as db:
+        persistencia.gravar_resultados(db, resultados)
+    return resultados
+
+def _todas_as_paginas(url, limite, **params):
+    vistas, cursor = [], None
+    while True:
+        resp = client.get(url, params={"limite": limite, **params, **({"cursor": cursor} if cursor else {})})
+        assert resp.status_code == 200
+        dados = resp.json()
+        vistas.append(dados["partidas"])
+        cursor = dados["proximo_cursor"]
+        if cursor is None:
+            return vistas
+
+def test_paginacao_por_cursor_percorre_tudo_uma_vez():
+    quadra_id = random.randint(10**6, 10**7)
+    resultados = _criar_partidas(quadra_id, 25)
+
+    paginas = _todas_as_paginas("/partidas", 10, quadra_id=quadra_id)
+    assert [len(p) for p in paginas] == [10, 10, 5]
+    partidas = [partida for pagina in paginas for partida in pagina]
+    assert sorted(p["id"] for p in partidas) == sorted(r.partida["id"] for r in resultados)
+    # Mais recentes primeiro, com o id desempatando quem começou no mesmo instante
+    chaves = [(p["inicio"], p["id"]) for p in partidas]
+    assert chaves == sorted(chaves, reverse=True)
+    assert all(len(p["participantes"]) == 4 for p in partidas)
+
+def test_partidas_do_jogador():
+    jogador = client.post("/jogadores", json={"nome": "Histórico", "sexo": "M"}).json()
+    _criar_partidas(random.randint(10**6, 10**7), 12, jogador_fixo=jogador["id"])
+
+    paginas = _todas_as_paginas(f"/jogadores/{jogador['id']}/partidas", 3)
+    partidas = [partida for pagina in paginas for partida in pagina]
+    assert len(partidas) == 4
+    for partida in partidas:
+        participante = next(p for p in partida["participantes"] if p["jogador_id"] == jogador["id"])
+        assert participante["nome"] == "Histórico"
+        assert participante["resultado"] == "Vitoria"
+
+    assert client.get(f"/jogadores/{models.generate_uuid()}/partidas").status_code == 404
+    assert client.get("/partidas", params={"cursor": "nada-disso"}).status_code == 400
+
+def test_participantes_vem_numa_consulta_so():
+    quadra_id = random.randint(10**6, 10**7)
+    _criar_partidas(quadra_id, 40)
+    consultas = []
+
+    def contar(conn, cursor, sql, parametros, contexto, executemany):
+        consultas.append(sql)
+
+    event.listen(engine_async.sync_engine, "before_cursor_execute", contar)
+    try:
+        for limite in (5, 40):
+            consultas.clear()
+            resp = client.get("/partidas", params={"limite": limite, "quadra_id": quadra_id})
+            assert len(resp.json()["partidas"]) == limite
+            # Uma consulta para a página e outra para os participantes, seja qual for o tamanho da página
+            assert len([sql for sql in consultas if sql.lstrip().upper().startswith("SELECT")]) == 2
+    finally:
+        event.remove(engine_async.sync_engine, "before_cursor_execute", contar)
@@ -0,0 +1,157 @@
+import base64
+import csv
+import hashlib
+import io
+import json
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from database import SessionLocal
+import importacao
+import models
+
+client = TestClient(app)
+
+
+def test_importar_csv_grava_validas_e_relata_erros_por_linha(monkeypatch):
+    monkeypatch.setattr(importacao, "LOTE", 2) # Vários blocos, para passar pelo commit de cada um
+    prefixo = uuid.uuid4().hex[:8]
+    corpo = "\n".join([
+        "nome,sexo,whatsapp,avatar",
+        f"{prefixo} Ana,F,85911111111,🏐",
+        f"{prefixo} Bia,F,,",
+        "só o nome", # Linha 4: colunas faltando
+        f"{prefixo} Caio,M,85922222222,",
+        ",M,,", # Linha 6: sem nome
+        f'"{prefixo} Silva, Davi",M,,', # Vírgula dentro de aspas
+    ]).encode()
+
+    resp = client.post("/jogadores/importar", content=corpo, headers={"Content-Type": "text/csv"})
+    assert resp.status_code == 200
+    relatorio = resp.json()
+    assert relatorio["importados"] == 4
+    assert [erro["linha"] for erro in relatorio["erros"]] == [4, 6]
+    assert "nome" in relatorio["erros"][1]["erro"]
+
+    nomes = {j["nome"]: j for j in client.get("/jogadores").json() if j["nome"].startswith(prefixo)}
+    assert set(nomes) == {f"{prefixo} Ana", f"{prefixo} Bia", f"{prefixo} Caio", f"{prefixo} Silva, Davi"}
+    assert nomes[f"{prefixo} Bia"]["whatsapp"] is None
+    assert nomes[f"{prefixo} Ana"]["avatar"] == "🏐"
+
+
+def test_importar_csv_com_quebra_de_linha_dentro_das_aspas():
+    prefixo = uuid.uuid4().hex[:8]
+    corpo = "\n".join([
+        "nome,sexo,whatsapp,avatar",
+        f'"{prefixo} Ana',
+        'de ""Souza""",F,,', # Linhas 2 e 3: um registro só
+        "só o nome", # Linha 4: o número continua sendo o da linha física
+        f'"{prefixo} Bia\n\nLima",F,,',
+        f"{prefixo} Caio,M,,",
+    ]).encode()
+
+    resp = client.post("/jogadores/importar", content=corpo, headers={"Content-Type": "text/csv"})
+    relatorio = resp.json()
+    assert relatorio["importados"] == 3
+    assert [erro["linha"] for erro in relatorio["erros"]] == [4]
+
+    nomes = {j["nome"] for j in client.get("/jogadores").json() if j["nome"].startswith(prefixo)}
+    assert nomes == {f'{prefixo} Ana\nde "Souza"', f"{prefixo} Bia\n\nLima", f"{prefixo} Caio"}
+
+    # Aspas que nunca fecham viram erro na linha em que o registro começou
+    resp = client.post("/jogadores/importar", content=b'nome,sexo\n"sem fim,M\nmais,F', headers={"Content-Type": "text/csv"})
+    assert resp.json()["importados"] == 0
+    assert [erro["linha"] for erro in resp.json()["erros"]] == [2]
+
+
+def test_importar_ndjson_com_id_nao_duplica():
+    jogador_id = str(uuid.uuid4())
+    linhas = [
+        json.dumps({"id": jogador_id, "nome": "Backup Edu", "sexo": "M"}),
+        "{quebrado",
+        json.dumps({"id": jogador_id, "nome": "Backup Edu de novo", "sexo": "M"}), # Mesmo id no arquivo
+        json.dumps(["não", "é", "objeto"]),
+    ]
+    resp = client.post("/jogadores/importar?formato=ndjson", content="\n".join(linhas).encode())
+    relatorio = resp.json()
+    assert relatorio["importados"] == 1
+    assert [erro["linha"] for erro in relatorio["erros"]] == [2, 3, 4]
+
+    # Importar o mesmo backup de novo não cria ninguém
+    resp = client.post("/jogadores/importar?formato=ndjson", content=linhas[0].encode())
+    assert resp.json()["importados"] == 0
+
+
+def test_exportar_em_fluxo_volta_pela_importacao():
+    prefixo = uuid.uuid4().hex[:8]
+    client.post("/jogadores", json={"nome": f"{prefixo} Exportada", "sexo": "F", "whatsapp": "85933333333"})
+
+    with client.stream("GET", "/jogadores/exportar?formato=csv") as resp:
+        assert resp.headers["content-type"].startswith("text/csv")
+        texto = "".join(resp.iter_text())
+    linhas = list(csv.DictReader(io.StringIO(texto)))
+    exportada = next(linha for linha in linhas if linha["nome"] == f"{prefixo} Exportada")
+    assert exportada["whatsapp"] == "85933333333"
+    assert exportada["is_ativo"] == "true"
+
+    resp = client.get("/jogadores/exportar?formato=ndjson")
+    registros = [json.loads(linha) for linha in resp.text.splitlines()]
+    assert len(registros) == len(linhas)
+    assert any(r["nome"] == f"{prefixo} Exportada" and r["is_presente"] is False for r in registros)
+
+    # O próprio arquivo exportado é um backup válido: todos os ids já existem, nada é duplicado
+    resp = client.post("/jogadores/importar", content=texto.encode(), headers={"Content-Type": "text/csv"})
+    assert resp.json()["importados"] == 0
+    assert resp.json()["total_erros"] == len(linhas)
+
+
+def _apagar(ids):
+    with SessionLocal() as db:
+        db.query(models.Jogador).filter(models.Jogador.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+
+
+def _linhas_do_backup(formato, ids):
+    # Linhas do GET /jogadores/exportar desses jogadores (com o cabeçalho, no CSV)
+    linhas = client.get(f"/jogadores/exportar?formato={formato}").text.splitlines()
+    cabecalho = [linhas.pop(0)] if formato == "csv" else []
+    return cabecalho + [linha for linha in linhas if any(i in linha for i in ids)]
+
+
+@pytest.mark.parametrize("formato", ["csv", "ndjson"])
+def test_backup_exportado_volta_com_status_e_data_de_cadastro(formato):
+    prefixo = uuid.uuid4().hex[:8]
+    ids = [client.post("/jogadores", json={"nome": f"{prefixo} {nome}", "sexo": "F"}).json()["id"]
+           for nome in ("Inativa", "Presente", "Comum")]
+    client.patch(f"/jogadores/{ids[0]}/status", json={"is_ativo": False})
+    client.patch(f"/jogadores/{ids[1]}/status", json={"is_presente": True})
+    backup = _linhas_do_backup(formato, ids)
+
+    # Restaura o backup num banco sem esses jogadores: exportar de novo dá exatamente o mesmo arquivo
+    _apagar(ids)
+    resp = client.post(f"/jogadores/importar?formato={formato}", content="\n".join(backup).encode())
+    assert resp.json()["importados"] == 3
+    assert _linhas_do_backup(formato, ids) == backup
+
+    presentes = {j["id"]: j["is_presente"] for j in client.get("/jogadores").json()}
+    assert ids[0] not in presentes # Continua inativa
+    assert presentes[ids[1]] is True
+    assert presentes[ids[2]] is False
+
+
+def test_avatar_em_data_url_vira_url_de_avatares():
+    prefixo = uuid.uuid4().hex[:8]
+    png = base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII=")
+    linhas = [
+        json.dumps({"nome": f"{prefixo} Foto", "sexo": "F", "avatar": "data:image/png;base64," + base64.b64encode(png).decode()}),
+        json.dumps({"nome": f"{prefixo} Quebrada", "sexo": "M", "avatar": "data:image/png;base64,@@"}),
+        json.dumps({"nome": f"{prefixo} Emoji", "sexo": "M", "avatar": "🏐"}),
+    ]
+    relatorio = client.post("/jogadores/importar?formato=ndjson", content="\n".join(linhas).encode()).json()
+    assert relatorio["importados"] == 2
+    assert [erro["linha"] for erro in relatorio["erros"]] == [2]
+
+    avatares = {j["nome"]: j["avatar"] for j in client.get("/jogadores").json() if j["nome"].startswith(prefixo)}
+    assert avatares == {f"{prefixo} Foto": "/avatares/" + hashlib.sha256(png).hexdigest(), f"{prefixo} Emoji": "🏐"}
+    assert client.get(avatares[f"{prefixo} Foto"]).content == png
@@ -0,0 +1,136 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from main import app, ESTADO_MEMORIA, get_db
+from database import SessionLocal, engine, engine_async
+import estado
+
+client = TestClient(app)
+
+
+def _updates(engine_sync):
+    # Conta os UPDATEs que chegam no banco por este engine
+    comandos_sql = []
+
+    def contar(_conexao, _cursor, sql, *_args):
+        if sql.lstrip().upper().startswith("UPDATE"):
+            comandos_sql.append(sql)
+
+    event.listen(engine_sync, "before_cursor_execute", contar)
+    return comandos_sql, lambda: event.remove(engine_sync, "before_cursor_execute", contar)
+
+
+def _novo_jogador(nome):
+    return client.post("/jogadores", json={"nome": nome, "sexo": "F"}).json()["id"]
+
+
+def test_lote_aplica_as_operacoes_em_ordem_com_uma_versao_so():
+    ESTADO_MEMORIA["fila"] = ["lote-0"]
+    loop = asyncio.new_event_loop()
+    assinante, inicial = estado.assinar(loop)
+    try:
+        resp = client.post("/fila/lote", json={"operacoes": [
+            {"op": "entrar", "jogador_id": "lote-1"},
+            {"op": "entrar", "jogador_id": "lote-2"},
+            {"op": "entrar", "jogador_id": "lote-1"}, # Duplicado: ignorado, como no /fila/entrar
+            {"op": "final", "jogador_id": "lote-0"},
+            {"op": "sair", "jogador_id": "lote-2"},
+        ]})
+        assert resp.status_code == 200
+        corpo = resp.json()
+        assert corpo == {"versao": inicial["versao"] + 1, "operacoes": 5, "presencas_atualizadas": 0, "tamanho_fila": 2}
+        assert "fila" not in corpo # Resposta enxuta: a fila vem pelo stream
+
+        deltas = list(assinante.pendentes)
+        assert len(deltas) == 1
+        assert [op["op"] for op in deltas[0]["ops"]] == ["fila.entrar", "fila.entrar", "fila.final", "fila.sair"]
+        assert ESTADO_MEMORIA["fila"].como_lista() == ["lote-1", "lote-0"]
+    finally:
+        estado.cancelar_assinatura(assinante)
+        loop.close()
+
+
+def test_presencas_do_lote_viram_um_unico_update():
+    ids = [_novo_jogador(f"Presença {i}") for i in range(4)]
+    ESTADO_MEMORIA["fila"] = []
+    updates, parar = _updates(engine)
+    try:
+        resp = client.post("/fila/lote", json={"operacoes": [
+            {"op": "presenca", "jogador_id": ids[0], "presente": True},
+            {"op": "entrar", "jogador_id": ids[0]},
+            {"op": "presenca", "jogador_id": ids[1], "presente": True},
+            {"op": "entrar", "jogador_id": ids[1]},
+            {"op": "presenca", "jogador_id": ids[2], "presente": True},
+            {"op": "presenca", "jogador_id": ids[2], "presente": False}, # A última vale
+        ]})
+    finally:
+        parar()
+    assert resp.status_code == 200
+    assert resp.json()["presencas_atualizadas"] == 3
+    assert len(updates) == 1
+    assert ESTADO_MEMORIA["fila"].como_lista() == ids[:2]
+
+    presentes = {j["id"]: j["is_presente"] for j in client.get("/jogadores").json()}
+    assert [presentes[i] for i in ids] == [True, True, False, False]
+
+    # O mesmo no endpoint de presença em lote: todos de uma vez, um UPDATE
+    updates, parar = _updates(engine_async.sync_engine)
+    try:
+        resp = client.patch("/jogadores/presenca", json={"ids": ids, "is_presente": False})
+    finally:
+        parar()
+    assert resp.json() == {"atualizados": 4}
+    assert len(updates) == 1
+    presentes = {j["id"]: j["is_presente"] for j in client.get("/jogadores").json()}
+    assert not any(presentes[i] for i in ids)
+
+
+def test_lote_invalido_nao_aplica_nada():
+    ESTADO_MEMORIA["fila"] = ["inv-0"]
+    versao = estado.versao_atual()
+    resp = client.post("/fila/lote", json={"operacoes": [
+        {"op": "entrar", "jogador_id": "inv-1"},
+        {"op": "presenca", "jogador_id": "inv-1"}, # Falta o 'presente'
+    ]})
+    assert resp.status_code == 400
+    resp = client.post("/fila/lote", json={"operacoes": [
+        {"op": "entrar", "jogador_id": "inv-1"},
+        {"op": "pular", "jogador_id": "inv-1"},
+    ]})
+    assert resp.status_code == 422
+    assert ESTADO_MEMORIA["fila"].como_lista() == ["inv-0"]
+    assert estado.versao_atual() == versao
+
+
+def test_falha_ao_gravar_presencas_nao_publica_a_fila():
+    jogador_id = _novo_jogador("Presença sem banco")
+    ESTADO_MEMORIA["fila"] = ["falha-0"]
+    versao = estado.versao_atual()
+
+    def sessao_que_falha():
+        db = SessionLocal()
+        def commit():
+            raise OperationalError("COMMIT", {}, Exception("banco fora do ar"))
+        db.commit = commit
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = sessao_que_falha
+    try:
+        with pytest.raises(OperationalError):
+            client.post("/fila/lote", json={"operacoes": [
+                {"op": "presenca", "jogador_id": jogador_id, "presente": True},
+                {"op": "entrar", "jogador_id": jogador_id},
+            ]})
+    finally:
+        app.dependency_overrides.pop(get_db)
+
+    # Nem a fila nem a versão andaram, e a presença não ficou gravada pela metade
+    assert ESTADO_MEMORIA["fila"].como_lista() == ["falha-0"]
+    assert estado.versao_atual() == versao
+    presentes = {j["id"]: j["is_presente"] for j in client.get("/jogadores").json()}
+    assert presentes[jogador_id] is False
@@ -188,4 +188,10 @@ def test_substituir_jogador():
     
     # A fila foi atualizada corretamente
     assert "substituto_novo" not in fila
-    assert fila[-1] == "jogador_cansado" # Foi para o final da fila
\ No newline at end of file
+    assert fila[-1] == "jogador_cansado" # Foi para o final da fila
+
+
+def test_saude_mostra_gravacoes_pendentes():
+    response = client.get("/saude")
+    assert response.status_code == 200
+    assert "gravacoes_pendentes" in response.json()["gravacao"]
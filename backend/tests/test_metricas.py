@@ -0,0 +1,60 @@
+from fastapi.testclient import TestClient
+from main import app, ESTADO_MEMORIA
+import estado
+import metricas
+
+client = TestClient(app)
+
+
+def _valor(texto, serie):
+    for linha in texto.splitlines():
+        if linha.startswith(serie + " "):
+            return float(linha.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_latencia_por_molde_da_rota_e_medidores():
+    ESTADO_MEMORIA["fila"] = [f"met-{i}" for i in range(9)]
+    ESTADO_MEMORIA["jogos"] = {1: None, 2: None}
+    client.post("/quadras/1/iniciar")
+    antes = client.get("/metrics").text
+    serie = 'voleiflow_http_duracao_segundos_count{metodo="POST",rota="/quadras/{quadra_id}/placar"}'
+    client.post("/quadras/1/placar", json={"time": "A", "delta": 1})
+    client.post("/quadras/2/placar", json={"time": "A", "delta": 1}) # 400: quadra sem jogo
+
+    resp = client.get("/metrics")
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    texto = resp.text
+    # Uma série só para as duas quadras (o molde, não o caminho), com o status separado
+    assert _valor(texto, serie) == _valor(antes, serie) + 2
+    assert 'rota="/quadras/1/placar"' not in texto
+    assert 'voleiflow_http_requisicoes_total{metodo="POST",rota="/quadras/{quadra_id}/placar",status="400"}' in texto
+    assert 'voleiflow_http_duracao_segundos_bucket{metodo="POST",rota="/quadras/{quadra_id}/placar",le="+Inf"}' in texto
+
+    assert _valor(texto, "voleiflow_fila_tamanho") == len(ESTADO_MEMORIA["fila"])
+    assert _valor(texto, "voleiflow_quadras_ativas") == 1
+    assert _valor(texto, "voleiflow_estado_versao") == estado.versao_atual()
+
+    client.get("/caminho/que/nao/existe")
+    assert f'rota="{metricas.ROTA_DESCONHECIDA}",status="404"' in client.get("/metrics").text
+
+
+def test_consultas_contadas_por_requisicao(monkeypatch):
+    monkeypatch.setattr(metricas, "DEBUG_CONSULTAS", True)
+    # O /estado sai da memória: nenhuma consulta
+    assert client.get("/estado").headers["x-consultas-banco"] == "0"
+
+    for i in range(3):
+        client.post("/jogadores", json={"nome": f"Métrica {i}", "sexo": "M"})
+    poucos = int(client.get("/jogadores").headers["x-consultas-banco"])
+    for i in range(10):
+        client.post("/jogadores", json={"nome": f"Métrica extra {i}", "sexo": "F"})
+    # Mais jogadores não podem virar mais consultas (um N+1 apareceria aqui)
+    assert int(client.get("/jogadores").headers["x-consultas-banco"]) == poucos >= 1
+
+    texto = client.get("/metrics").text
+    assert _valor(texto, 'voleiflow_http_consultas_total{metodo="GET",rota="/jogadores"}') >= 2 * poucos
+    assert _valor(texto, "voleiflow_banco_consulta_segundos_count") > 0
+
+    monkeypatch.setattr(metricas, "DEBUG_CONSULTAS", False)
+    assert "x-consultas-banco" not in client.get("/jogadores").headers
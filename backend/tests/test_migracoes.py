@@ -0,0 +1,136 @@
+import threading
+from sqlalchemy import create_engine, event, insert, inspect, select
+import migracoes
+import models
+
+
+def _engine(tmp_path, nome="esquema.db"):
+    return create_engine(f"sqlite:///{tmp_path / nome}", connect_args={"timeout": 30})
+
+
+def _indices(engine):
+    inspetor = inspect(engine)
+    return {indice["name"] for tabela in inspetor.get_table_names() for indice in inspetor.get_indexes(tabela)}
+
+
+def _esquema(engine):
+    # Colunas (nome, tipo, nulo, chave primária), índices e chaves estrangeiras de cada tabela
+    inspetor = inspect(engine)
+    esquema = {}
+    for tabela in inspetor.get_table_names():
+        chave = set(inspetor.get_pk_constraint(tabela)["constrained_columns"])
+        esquema[tabela] = (
+            [(c["name"], str(c["type"]), c["nullable"], c["name"] in chave) for c in inspetor.get_columns(tabela)],
+            sorted((i["name"], tuple(i["column_names"]), bool(i["unique"])) for i in inspetor.get_indexes(tabela)),
+            sorted((tuple(f["constrained_columns"]), f["referred_table"]) for f in inspetor.get_foreign_keys(tabela)),
+        )
+    return esquema
+
+
+def _esquema_dos_models(tmp_path):
+    engine = _engine(tmp_path, "models.db")
+    models.Base.metadata.create_all(engine)
+    return _esquema(engine)
+
+
+def test_banco_novo_recebe_todos_os_passos_e_o_carimbo(tmp_path):
+    engine = _engine(tmp_path)
+    assert migracoes.versao_do_banco(engine) == 0
+    assert migracoes.migrar(engine) == len(migracoes.MIGRACOES)
+    assert migracoes.versao_do_banco(engine) == migracoes.VERSAO_ATUAL
+
+    assert set(inspect(engine).get_table_names()) == set(models.Base.metadata.tables)
+    esperados = {indice.name for tabela in models.Base.metadata.sorted_tables for indice in tabela.indexes}
+    assert esperados <= _indices(engine)
+
+
+def test_carimbo_em_dia_custa_uma_consulta(tmp_path):
+    engine = _engine(tmp_path)
+    migracoes.migrar(engine)
+    consultas = []
+    event.listen(engine, "before_cursor_execute", lambda *args: consultas.append(args[2]))
+    assert migracoes.migrar(engine) == 0
+    assert len(consultas) == 1 and "esquema_versao" in consultas[0]
+
+
+def test_banco_anterior_ao_carimbo_ganha_so_o_que_falta(tmp_path):
+    # Como o voleiflow.db da primeira versão: quatro tabelas, sem índices novos e sem carimbo
+    engine = _engine(tmp_path)
+    antigas = [models.Jogador.__table__, models.Partida.__table__, models.PartidaHistorico.__table__, models.Configuracao.__table__]
+    with engine.begin() as conexao:
+        for tabela in antigas:
+            conexao.exec_driver_sql(f"CREATE TABLE {tabela.name} ({', '.join(c.name for c in tabela.columns)})")
+        conexao.execute(insert(models.Jogador.__table__).values(id="j1", nome="Antigo"))
+
+    assert migracoes.migrar(engine) == len(migracoes.MIGRACOES)
+    with engine.connect() as conexao:
+        assert conexao.execute(select(models.Jogador.nome)).scalars().all() == ["Antigo"]
+    assert {"avatares", "versoes_tabelas", "ratings_jogadores", "estatisticas_jogadores"} <= set(inspect(engine).get_table_names())
+    assert {"ix_partidas_fim_id", "ix_partidas_historico_jogador_partida"} <= _indices(engine)
+
+
+def test_passo_novo_roda_so_ele(tmp_path, monkeypatch):
+    engine = _engine(tmp_path)
+    migracoes.migrar(engine)
+    rodou = []
+    numero = migracoes.VERSAO_ATUAL + 1
+    monkeypatch.setattr(migracoes, "MIGRACOES", migracoes.MIGRACOES + [(numero, "teste", rodou.append)])
+    monkeypatch.setattr(migracoes, "VERSAO_ATUAL", numero)
+    assert migracoes.migrar(engine) == 1
+    assert len(rodou) == 1
+    assert migracoes.versao_do_banco(engine) == numero
+
+
+def test_workers_subindo_juntos_migram_uma_vez(tmp_path):
+    engines = [_engine(tmp_path) for _ in range(4)]
+    passos = []
+    largada = threading.Barrier(len(engines))
+
+    def subir(engine):
+        largada.wait()
+        passos.append(migracoes.migrar(engine))
+
+    threads = [threading.Thread(target=subir, args=(engine,)) for engine in engines]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(passos) == [0, 0, 0, len(migracoes.MIGRACOES)]
+    assert migracoes.versao_do_banco(engines[0]) == migracoes.VERSAO_ATUAL
+
+
+def test_banco_novo_chega_no_esquema_dos_models(tmp_path):
+    engine = _engine(tmp_path)
+    migracoes.migrar(engine)
+    assert _esquema(engine) == _esquema_dos_models(tmp_path)
+
+
+def test_banco_parado_no_passo_1_chega_no_mesmo_esquema(tmp_path, monkeypatch):
+    engine = _engine(tmp_path)
+    with monkeypatch.context() as m:
+        m.setattr(migracoes, "MIGRACOES", migracoes.MIGRACOES[:1])
+        m.setattr(migracoes, "VERSAO_ATUAL", 1)
+        assert migracoes.migrar(engine) == 1
+    assert set(inspect(engine).get_table_names()) == {"jogadores", "partidas", "partidas_historico", "configuracoes", "esquema_versao"}
+    assert "ix_partidas_fim_id" not in _indices(engine)
+
+    assert migracoes.migrar(engine) == len(migracoes.MIGRACOES) - 1
+    assert migracoes.versao_do_banco(engine) == migracoes.VERSAO_ATUAL
+    assert _esquema(engine) == _esquema_dos_models(tmp_path)
+
+
+def test_partidas_antigas_ganham_sequencia_na_ordem_em_que_terminaram(tmp_path, monkeypatch):
+    engine = _engine(tmp_path)
+    with monkeypatch.context() as m:
+        m.setattr(migracoes, "MIGRACOES", migracoes.MIGRACOES[:6])
+        m.setattr(migracoes, "VERSAO_ATUAL", 6)
+        migracoes.migrar(engine)
+    with engine.begin() as conexao:
+        for partida_id, fim in [("p-b", "2026-03-01 21:00:00"), ("p-a", "2026-03-01 20:00:00"), ("p-c", "2026-03-01 21:00:00")]:
+            conexao.exec_driver_sql("INSERT INTO partidas (id, fim) VALUES (?, ?)", (partida_id, fim))
+
+    assert migracoes.migrar(engine) == 1
+    with engine.connect() as conexao:
+        assert conexao.exec_driver_sql("SELECT id, sequencia FROM partidas ORDER BY sequencia").all() == [
+            ("p-a", 1), ("p-b", 2), ("p-c", 3)]
+        assert conexao.execute(select(models.VersaoTabela.versao).where(models.VersaoTabela.nome == "partidas")).scalar() == 3
@@ -0,0 +1,140 @@
+import json
+import threading
+import time
+from database import SessionLocal
+import models
+import persistencia
+from tests.conftest import jogo_rodando
+
+def test_registrar_resultado_grava_partida_e_historico_juntos():
+    jogo = jogo_rodando(["pers_a1", "pers_a2"], ["pers_b1", "pers_b2"])
+    with SessionLocal() as db:
+        resultado = persistencia.registrar_resultado(db, 1, jogo, vencedor="A", motivo_fim="Pontuacao")
+
+    with SessionLocal() as db:
+        partida = db.query(models.Partida).filter(models.Partida.id == resultado.partida["id"]).one()
+        assert partida.vencedor == "A"
+        assert partida.placar_a == 21
+        linhas = {h.jogador_id: h.resultado for h in partida.detalhes}
+        assert linhas == {"pers_a1": "Vitoria", "pers_a2": "Vitoria", "pers_b1": "Derrota", "pers_b2": "Derrota"}
+
+def test_encerramento_manual_e_empate_para_todos():
+    resultado = persistencia.montar_resultado(2, jogo_rodando(["x"], ["y"]), vencedor=None, motivo_fim="Cancelada")
+    assert resultado.partida["vencedor"] is None
+    assert [h["resultado"] for h in resultado.historico] == ["Empate", "Empate"]
+    # O id da partida nasce no Python, sem precisar de flush
+    assert all(h["partida_id"] == resultado.partida["id"] for h in resultado.historico)
+
+def test_gravador_grava_em_segundo_plano():
+    gravador = persistencia.GravadorResultados()
+    resultados = [persistencia.montar_resultado(1, jogo_rodando([f"wb_a{i}"], [f"wb_b{i}"]), "B", "Pontuacao") for i in range(3)]
+    try:
+        for resultado in resultados:
+            gravador.enfileirar(resultado)
+        assert gravador.descarregar(timeout=5) == True
+        assert gravador.pendentes() == 0
+        assert gravador.gravados == 3
+    finally:
+        gravador.parar()
+
+    ids = [r.partida["id"] for r in resultados]
+    with SessionLocal() as db:
+        assert db.query(models.Partida).filter(models.Partida.id.in_(ids)).count() == 3
+
+def test_gravador_repete_lote_que_falhou(monkeypatch):
+    gravar_de_verdade = persistencia.gravar_resultados
+    chamadas = {"n": 0}
+
+    def gravar_instavel(db, lote):
+        chamadas["n"] += 1
+        if chamadas["n"] <= 2:
+            raise RuntimeError("database is locked")
+        gravar_de_verdade(db, lote)
+
+    monkeypatch.setattr(persistencia, "gravar_resultados", gravar_instavel)
+    gravador = persistencia.GravadorResultados(tentativas=3)
+    resultado = persistencia.montar_resultado(1, jogo_rodando(["retry_a"], ["retry_b"]), "A", "Pontuacao")
+    try:
+        gravador.enfileirar(resultado)
+        assert gravador.descarregar(timeout=5) == True
+    finally:
+        gravador.parar()
+
+    assert chamadas["n"] == 3
+    assert gravador.falhas == []
+    assert gravador.saude()["ultimo_erro"] is None
+
+def test_gravador_isola_resultado_que_nunca_grava(monkeypatch, tmp_path):
+    def gravar_sempre_falha(db, lote):
+        raise RuntimeError("disco cheio")
+
+    monkeypatch.setattr(persistencia, "gravar_resultados", gravar_sempre_falha)
+    arquivo = tmp_path / "nao_gravados.ndjson"
+    gravador = persistencia.GravadorResultados(tentativas=1, arquivo_falhas=str(arquivo))
+    resultado = persistencia.montar_resultado(1, jogo_rodando(["f_a"], ["f_b"]), "A", "Pontuacao")
+    try:
+        gravador.enfileirar(resultado)
+        assert gravador.descarregar(timeout=5) == True
+        saude = gravador.saude()
+        assert saude["falhas"] == 1
+        assert "disco cheio" in saude["ultimo_erro"]
+    finally:
+        gravador.parar()
+
+    # No encerramento o que nunca gravou vai para o arquivo, em vez de sumir com o processo
+    assert gravador.saude()["falhas"] == 0
+    assert gravador.saude()["arquivados"] == 1
+    linha = json.loads(arquivo.read_text(encoding="utf-8"))
+    assert linha["partida"]["id"] == resultado.partida["id"]
+    assert [h["jogador_id"] for h in linha["historico"]] == ["f_a", "f_b"]
+
+def test_gravador_repesca_resultado_que_falhou(monkeypatch):
+    gravar_de_verdade = persistencia.gravar_resultados
+    banco_fora = threading.Event()
+    banco_fora.set()
+
+    def gravar_com_banco_fora(db, lote):
+        if banco_fora.is_set():
+            raise RuntimeError("banco fora do ar")
+        gravar_de_verdade(db, lote)
+
+    monkeypatch.setattr(persistencia, "gravar_resultados", gravar_com_banco_fora)
+    gravador = persistencia.GravadorResultados(tentativas=1, repescagem=0.05)
+    resultado = persistencia.montar_resultado(1, jogo_rodando(["rep_a"], ["rep_b"]), "A", "Pontuacao")
+    try:
+        gravador.enfileirar(resultado)
+        assert gravador.descarregar(timeout=5) == True
+        assert gravador.saude()["falhas"] == 1
+
+        banco_fora.clear()
+        limite = time.monotonic() + 5
+        while gravador.falhas and time.monotonic() < limite:
+            time.sleep(0.01)
+        assert gravador.falhas == []
+        assert gravador.saude()["ultimo_erro"] is None
+    finally:
+        gravador.parar()
+
+    with SessionLocal() as db:
+        assert db.query(models.Partida).filter(models.Partida.id == resultado.partida["id"]).count() == 1
+
+def test_gravador_limita_falhas_em_memoria(monkeypatch, tmp_path):
+    def gravar_sempre_falha(db, lote):
+        raise RuntimeError("disco cheio")
+
+    monkeypatch.setattr(persistencia, "gravar_resultados", gravar_sempre_falha)
+    arquivo = tmp_path / "nao_gravados.ndjson"
+    gravador = persistencia.GravadorResultados(tentativas=1, limite_falhas=2, arquivo_falhas=str(arquivo))
+    resultados = [persistencia.montar_resultado(1, jogo_rodando([f"lim_a{i}"], [f"lim_b{i}"]), "A", "Pontuacao") for i in range(5)]
+    try:
+        for resultado in resultados:
+            gravador.enfileirar(resultado)
+        assert gravador.descarregar(timeout=5) == True
+        # Os mais recentes ficam para a repescagem; os mais antigos já foram para o arquivo
+        assert gravador.falhas == resultados[-2:]
+        assert gravador.saude()["arquivados"] == 3
+    finally:
+        gravador.parar()
+
+    ids = [json.loads(linha)["partida"]["id"] for linha in arquivo.read_text(encoding="utf-8").splitlines()]
+    assert ids == [resultado.partida["id"] for resultado in resultados]
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from main import app, ESTADO_MEMORIA, atualizar_placar, PlacarRequest
+import estado
+from tests.conftest import jogo_rodando
+
+client = TestClient(app)
+
+def test_quantidade_de_quadras_vem_da_configuracao():
+    ESTADO_MEMORIA["jogos"] = {1: None, 2: None}
+    ESTADO_MEMORIA["fila"] = [f"quadra4-{i}" for i in range(8)]
+    try:
+        client.post("/configuracoes", json={"chave": "QuantidadeQuadras", "valor": 4})
+        assert client.get("/quadras").json()["quadras"] == [1, 2, 3, 4]
+        assert client.post("/quadras/4/iniciar").status_code == 200
+        assert client.post("/quadras/5/iniciar").status_code == 400
+
+        # Reduzindo para 2: a quadra 3 (vazia) fecha, a 4 continua até o jogo acabar
+        client.post("/configuracoes", json={"chave": "QuantidadeQuadras", "valor": 2})
+        assert client.get("/quadras").json()["quadras"] == [1, 2, 4]
+        client.post("/quadras/4/encerrar")
+        estado.ajustar_quadras(2)
+        assert client.get("/quadras").json()["quadras"] == [1, 2]
+    finally:
+        client.post("/configuracoes", json={"chave": "QuantidadeQuadras", "valor": 2})
+        estado.ajustar_quadras(2)
+
+def test_quadra_acima_da_quantidade_fecha_quando_o_jogo_acaba():
+    ESTADO_MEMORIA["jogos"] = {1: None, 2: None}
+    ESTADO_MEMORIA["fila"] = [f"fecha-{i}" for i in range(16)]
+    try:
+        client.post("/configuracoes", json={"chave": "QuantidadeQuadras", "valor": 3})
+        assert client.post("/quadras/2/iniciar").status_code == 200
+        assert client.post("/quadras/3/iniciar").status_code == 200
+
+        # Diminui com as duas quadras jogando: a 3 continua até o jogo acabar
+        client.post("/configuracoes", json={"chave": "QuantidadeQuadras", "valor": 1})
+        assert client.get("/quadras").json()["quadras"] == [1, 2, 3]
+
+        loop = asyncio.new_event_loop()
+        assinante, _ = estado.assinar(loop)
+        try:
+            client.post("/quadras/3/encerrar")
+            delta = assinante.pendentes.popleft()
+        finally:
+            estado.cancelar_assinatura(assinante)
+            loop.close()
+        assert client.get("/quadras").json()["quadras"] == [1, 2]
+        # O fechamento vai no delta, que é o que o frontend espelha
+        assert {"op": "quadra.remover", "quadra_id": 3} in delta["ops"]
+        assert client.post("/quadras/3/iniciar").status_code == 400
+
+        # Pela vitória também: limite de vitórias atingido esvazia a quadra 2, que fecha
+        client.post("/configuracoes", json={"chave": "MaxVitorias", "valor": 1})
+        client.post("/quadras/2/vitoria", json={"time_vencedor": "A"})
+        assert client.get("/quadras").json()["quadras"] == [1]
+    finally:
+        client.post("/configuracoes", json={"chave": "MaxVitorias", "valor": 3})
+        client.post("/configuracoes", json={"chave": "QuantidadeQuadras", "valor": 2})
+        estado.ajustar_quadras(2)
+
+def test_pontos_simultaneos_nao_se_perdem():
+    ESTADO_MEMORIA["jogos"] = {1: jogo_rodando(["qa1", "qa2"], ["qb1", "qb2"], placar=(0, 0)), 2: jogo_rodando(["qa1", "qa2"], ["qb1", "qb2"], placar=(0, 0))}
+    toques_por_thread = 200
+
+    def marcar(quadra_id, time):
+        for _ in range(toques_por_thread):
+            atualizar_placar(quadra_id, PlacarRequest(time=time, delta=1))
+
+    threads = [threading.Thread(target=marcar, args=(quadra_id, time))
+               for quadra_id in (1, 2) for time in ("A", "A", "B")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for quadra_id in (1, 2):
+        assert ESTADO_MEMORIA["jogos"][quadra_id]["placar"] == {"A": 2 * toques_por_thread, "B": toques_por_thread}
+
+def test_transacao_nao_mexe_no_que_nao_travou():
+    ESTADO_MEMORIA["jogos"] = {1: jogo_rodando(["qa1", "qa2"], ["qb1", "qb2"], placar=(0, 0)), 2: jogo_rodando(["qa1", "qa2"], ["qb1", "qb2"], placar=(0, 0))}
+    with pytest.raises(RuntimeError):
+        with estado.transacao(quadras=[1], fila=False) as t:
+            t.definir_placar(2, {"A": 1, "B": 0})
+    with pytest.raises(RuntimeError):
+        with estado.transacao(quadras=[1], fila=False) as t:
+            t.entrar_na_fila("intruso")
@@ -0,0 +1,78 @@
+import random
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from database import SessionLocal
+import models
+import persistencia
+import ranking
+from tests.conftest import jogo_rodando
+
+client = TestClient(app)
+
+def _rating(jogador_id):
+    with SessionLocal() as db:
+        return db.get(models.RatingJogador, jogador_id)
+
+def test_calculo_vetorizado_igual_ao_partida_a_partida():
+    sorteio = random.Random(7)
+    partidas = []
+    for _ in range(400):
+        # Times de tamanhos diferentes, com as linhas do time B antes das do time A
+        tamanho_a, tamanho_b = sorteio.randint(1, 4), sorteio.randint(1, 4)
+        elenco = sorteio.sample(range(30), tamanho_a + tamanho_b)
+        partidas.append({"vencedor": sorteio.choice("AB"), "A": elenco[:tamanho_a], "B": elenco[tamanho_a:]})
+
+    variacao, _ = ranking.variacoes(partidas, {})
+    esperado = np.array([ranking.RATING_INICIAL + variacao.get(j, 0.0) for j in range(30)])
+
+    partida_da_linha = np.array([i for i, p in enumerate(partidas) for _ in p["B"] + p["A"]])
+    jogador_da_linha = np.array([j for p in partidas for j in p["B"] + p["A"]])
+    lado_da_linha = np.array([lado for p in partidas for lado in [1] * len(p["B"]) + [0] * len(p["A"])])
+    vitoria_a = np.array([1.0 if p["vencedor"] == "A" else 0.0 for p in partidas])
+
+    # Os dois caminhos (ondas em NumPy e partida a partida) chegam no mesmo Elo do cálculo de referência
+    for largura_minima_onda in (0, 10**9):
+        calculado = ranking.calcular_ratings(partida_da_linha, jogador_da_linha, lado_da_linha, vitoria_a, 30,
+                                             largura_minima_onda=largura_minima_onda)
+        assert np.allclose(calculado, esperado)
+
+def test_vitoria_gravada_atualiza_o_rating():
+    a1, a2, b1, b2 = (models.generate_uuid() for _ in range(4))
+    with SessionLocal() as db:
+        persistencia.registrar_resultado(db, 1, jogo_rodando([a1, a2], [b1, b2], placar=(21, 17)), "A", "Pontuacao")
+        # Encerramento manual (sem vencedor) não mexe no rating
+        persistencia.registrar_resultado(db, 1, jogo_rodando([a1, a2], [b1, b2], placar=(21, 17)), None, "Cancelada")
+
+    # Times iguais: o esperado é 50%, então o vencedor ganha K/2
+    assert _rating(a1).rating == pytest.approx(ranking.RATING_INICIAL + ranking.FATOR_K / 2)
+    assert _rating(b2).rating == pytest.approx(ranking.RATING_INICIAL - ranking.FATOR_K / 2)
+    assert _rating(a2).partidas == 1
+
+def test_recalculo_em_segundo_plano_reproduz_o_incremental():
+    jogadores = [models.generate_uuid() for _ in range(6)]
+    sorteio = random.Random(3)
+    fim = datetime(2026, 3, 1, 20, 0, tzinfo=timezone.utc)
+    with SessionLocal() as db:
+        for i in range(20):
+            elenco = sorteio.sample(jogadores, 4)
+            fim += timedelta(minutes=15)
+            resultado = persistencia.montar_resultado(1, jogo_rodando(elenco[:2], elenco[2:], placar=(21, 17)), sorteio.choice("AB"), "Pontuacao", fim=fim)
+            persistencia.gravar_resultados(db, [resultado])
+    incremental = {j: _rating(j).rating for j in jogadores}
+
+    resp = client.post("/ranking/recalcular")
+    assert resp.status_code == 202
+    ranking.RECALCULO.aguardar(30)
+    situacao = client.get("/ranking/recalcular").json()
+    assert situacao["rodando"] == False
+    assert situacao["erro"] is None
+
+    for jogador_id in jogadores:
+        assert _rating(jogador_id).rating == pytest.approx(incremental[jogador_id])
+
+    lideres = client.get("/ranking", params={"limite": 500}).json()
+    notas = [linha["rating"] for linha in lideres]
+    assert notas == sorted(notas, reverse=True)
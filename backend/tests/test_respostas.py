@@ -0,0 +1,58 @@
+import asyncio
+from fastapi.testclient import TestClient
+from main import app, ESTADO_MEMORIA, _evento_sse
+import estado
+
+client = TestClient(app)
+
+MINIMA = {"Prefer": "return=minimal"}
+
+
+def test_mutacoes_com_prefer_minimal_devolvem_so_a_versao():
+    ESTADO_MEMORIA["fila"] = [f"ack-{i}" for i in range(50)]
+    resp = client.post("/fila/entrar", json={"jogador_id": "ack-novo"}, headers=MINIMA)
+    assert resp.status_code == 200
+    assert resp.headers["preference-applied"] == "return=minimal"
+    assert resp.json() == {"ok": True, "versao": estado.versao_atual()}
+    assert ESTADO_MEMORIA["fila"].como_lista()[-1] == "ack-novo"
+
+    # Nada mudou (já está na fila): a versão continua a mesma
+    versao = resp.json()["versao"]
+    assert client.post("/fila/entrar", json={"jogador_id": "ack-novo"}, headers=MINIMA).json()["versao"] == versao
+
+    # Sem o cabeçalho, a resposta de sempre
+    resp = client.post("/fila/final", json={"jogador_id": "ack-0"})
+    assert resp.json() == {"mensagem": "Movido para o final", "fila": ESTADO_MEMORIA["fila"].como_lista()}
+
+
+def test_quadras_respondem_compacto_ou_completo():
+    ESTADO_MEMORIA["fila"] = [f"ackq-{i}" for i in range(12)]
+    ESTADO_MEMORIA["jogos"] = {1: None, 2: None}
+    resp = client.post("/quadras/1/iniciar", headers={"Prefer": "respond-async, return=minimal"})
+    assert resp.json() == {"ok": True, "versao": estado.versao_atual()}
+
+    resp = client.post("/quadras/1/placar", json={"time": "A", "delta": 1})
+    assert resp.json() == {"mensagem": "Placar atualizado", "placar": {"A": 1, "B": 0}}
+    assert client.post("/quadras/1/placar", json={"time": "A", "delta": 1}, headers=MINIMA).json()["ok"] is True
+
+    # As chaves das quadras (int na memória) saem como texto no JSON, igual ao encoder padrão
+    corpo = client.get("/estado").json()
+    assert set(corpo["jogos"]) == {"1", "2"}
+    assert corpo["jogos"]["1"]["placar"] == {"A": 2, "B": 0}
+    assert client.get("/quadras").json() == {"quadras": [1, 2]}
+
+
+def test_delta_do_stream_e_serializado_uma_vez_so():
+    ESTADO_MEMORIA["fila"] = []
+    loop = asyncio.new_event_loop()
+    assinante, _ = estado.assinar(loop)
+    try:
+        client.post("/fila/entrar", json={"jogador_id": "sse-1"})
+        delta = assinante.pendentes.popleft()
+        primeiro = _evento_sse("delta", delta)
+        # Outro assinante recebendo o mesmo delta reaproveita o texto já pronto
+        assert _evento_sse("delta", dict(delta)) is primeiro
+        assert primeiro.startswith(f"id: {delta['versao']}\nevent: delta\ndata: {{")
+    finally:
+        estado.cancelar_assinatura(assinante)
+        loop.close()
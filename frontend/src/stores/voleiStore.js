@@ -10,6 +10,8 @@ export const useVoleiStore = defineStore('volei', {
     jogadores: [],
     filaIds: [],
     jogos: {},
+    versaoEstado: 0,
+    streamEstado: null,
     config: {},
     // -- Variáveis de Interface (Novas) --
     viewAtual: 'jogadores',
@@ -20,7 +22,7 @@ export const useVoleiStore = defineStore('volei', {
   // 1.5 GETTERS: Variáveis calculadas automaticamente (O antigo "computed")
   getters: {
     statusClass: (state) => state.statusSistema === 'Online' ? 'bg-green-500' : (state.statusSistema === 'Erro' ? 'bg-red-500' : 'bg-yellow-500 animate-pulse'),
-    algumaQuadraAtiva: (state) => (state.jogos[1] && state.jogos[1].status === 'JOGANDO') || (state.jogos[2] && state.jogos[2].status === 'JOGANDO'),
+    algumaQuadraAtiva: (state) => Object.values(state.jogos).some(jogo => jogo && jogo.status === 'JOGANDO'),
   },
 
   // 2. ACTIONS: As funções que alteram o state (Os antigos methods)
@@ -36,6 +38,8 @@ export const useVoleiStore = defineStore('volei', {
           this.carregarConfig()
         ]);
         this.statusSistema = 'Online';
+        // A partir daqui a fila e as quadras chegam sozinhas pelo stream (sem ficar consultando o /estado)
+        this.conectarTempoReal();
       } catch (error) {
         console.error("Erro ao comunicar com o Python:", error);
         this.statusSistema = 'Erro';
@@ -55,6 +59,74 @@ export const useVoleiStore = defineStore('volei', {
       this.jogos = response.data.jogos || {};
     },
 
+    conectarTempoReal() {
+      if (this.streamEstado) this.streamEstado.close();
+
+      // O EventSource reconecta sozinho se a rede cair; a cada conexão chega um snapshot novo
+      const stream = new EventSource(`${api.defaults.baseURL}/estado/stream`);
+
+      stream.addEventListener('snapshot', (evento) => {
+        const snapshot = JSON.parse(evento.data);
+        this.versaoEstado = snapshot.versao;
+        this.filaIds = snapshot.fila || [];
+        this.jogos = snapshot.jogos || {};
+        this.statusSistema = 'Online';
+      });
+
+      stream.addEventListener('delta', (evento) => {
+        const delta = JSON.parse(evento.data);
+        if (delta.versao <= this.versaoEstado) return; // Já aplicado
+        if (delta.versao !== this.versaoEstado + 1) {
+          // Perdemos alguma versão no caminho: reconecta para receber um snapshot completo
+          this.conectarTempoReal();
+          return;
+        }
+        delta.ops.forEach(op => this.aplicarOperacao(op));
+        this.versaoEstado = delta.versao;
+      });
+
+      stream.onerror = () => {
+        this.statusSistema = 'A ligar...';
+      };
+
+      this.streamEstado = stream;
+    },
+
+    // Espelho do estado.aplicar_operacao() do Python
+    aplicarOperacao(op) {
+      switch (op.op) {
+        case 'fila.entrar':
+          if (!this.filaIds.includes(op.jogador_id)) this.filaIds.push(op.jogador_id);
+          break;
+        case 'fila.sair':
+          this.filaIds = this.filaIds.filter(id => id !== op.jogador_id);
+          break;
+        case 'fila.final':
+          this.filaIds = [...this.filaIds.filter(id => id !== op.jogador_id), op.jogador_id];
+          break;
+        case 'fila.estender':
+          op.ids.forEach(id => { if (!this.filaIds.includes(id)) this.filaIds.push(id); });
+          break;
+        case 'fila.retirar':
+          this.filaIds = this.filaIds.slice(op.quantidade);
+          break;
+        case 'fila.definir':
+          this.filaIds = op.fila;
+          break;
+        case 'quadra.definir':
+          this.jogos = { ...this.jogos, [op.quadra_id]: op.jogo };
+          break;
+        case 'quadra.placar':
+          if (this.jogos[op.quadra_id]) this.jogos[op.quadra_id].placar = op.placar;
+          break;
+        case 'quadra.remover': {
+          const { [op.quadra_id]: _, ...restantes } = this.jogos;
+          this.jogos = restantes;
+          break;
+        }
+      }
+    },
+
     async carregarConfig() {
       const response = await api.get('/configuracoes');
       // O Python devolve uma lista [{chave: 'TamanhoTime', valor: 4}, ...]